@@ -0,0 +1 @@
+"""Offline benchmarks and the performance regression gate (see benchmarks.run)."""
@@ -0,0 +1,298 @@
+"""Benchmark suite and performance regression gate for the valuation engine.
+
+    python -m benchmarks.run                      # run, check equality, compare to baselines
+    python -m benchmarks.run --quick              # skip the 1M-scenario throughput run
+    python -m benchmarks.run --update-baselines   # record this machine's numbers
+
+Every engine path is first checked against the original per-year loop in
+valuation.reference over all toggle combinations, both horizons and with and without
+the 5th-year override. Tracked metrics are then compared to benchmarks/baselines.json
+and the run fails (exit code 1) when any is more than --threshold worse, or when any
+engine path disagrees with the reference.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from valuation import ValuationResult, evaluate, reevaluate, run_valuation, select_batch, to_yearly_results
+from valuation import reference
+from valuation.defaults import DEFAULT_PRODUCTS, DEFAULT_TOGGLES, default_user_inputs
+from valuation.backtest import backtest, synthetic_history
+from valuation.formatting import human_format, human_format_array
+from valuation.universe import evaluate_universe, select_company, synthetic_universe
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+HORIZONS = {'5y': list(range(2025, 2030)), '10y': list(range(2025, 2036))}
+BATCH_SIZES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+CHUNK_SIZE = 50_000
+# 5th-year override per product: units for unit-based products, $M of revenue otherwise
+OVERRIDE_VALUES = {product: 123456 if 'units_sold' in data else 4321 for product, data in DEFAULT_PRODUCTS.items()}
+
+
+# Scenarios
+
+def toggle_combinations():
+    """Every on/off combination of the default_toggles keys."""
+    for combo in itertools.product((False, True), repeat=len(DEFAULT_TOGGLES)):
+        yield dict(zip(DEFAULT_TOGGLES, combo))
+
+
+def scenarios():
+    """(label, user_inputs) over all toggle combinations, both horizons and with and without the override."""
+    for horizon, years in HORIZONS.items():
+        for toggles in toggle_combinations():
+            for override in (False, True):
+                user_inputs = default_user_inputs(years)
+                user_inputs['toggles'] = toggles
+                if override:
+                    user_inputs['override_flags'] = {product: True for product in DEFAULT_PRODUCTS}
+                    user_inputs['override_values'] = dict(OVERRIDE_VALUES)
+                label = f"{horizon} {''.join('1' if on else '0' for on in toggles.values())}{' override' if override else ''}"
+                yield label, override, user_inputs
+
+
+# Reference equality
+
+def _same(x, y):
+    if isinstance(x, dict):
+        return list(x) == list(y) and all(_same(x[key], y[key]) for key in x)
+    if isinstance(x, list):
+        return len(x) == len(y) and all(_same(u, v) for u, v in zip(x, y))
+    if isinstance(x, float) and isinstance(y, float):
+        return x == y or (math.isnan(x) and math.isnan(y)) or math.isclose(x, y, rel_tol=1e-12, abs_tol=1e-9)
+    return type(x) is type(y) and x == y
+
+
+def check_reference():
+    """Names of the scenario/path pairs whose results differ from valuation.reference."""
+    failures = []
+    for label, override, user_inputs in scenarios():
+        expected = reference.run_valuation_with_override(user_inputs)
+        if not override and not _same(reference.run_valuation(user_inputs), expected):
+            failures.append(f"{label}: reference loops disagree")
+        arrays = evaluate(user_inputs)
+        # A batch of two differing margins, whose first element is this scenario
+        batched = evaluate(user_inputs, {'net_profit_margin': np.array([user_inputs['net_profit_margin'], 0.2])})
+        base = default_user_inputs(user_inputs['years'])
+        base['toggles'], base['override_flags'], base['override_values'] = user_inputs['toggles'], user_inputs['override_flags'], user_inputs['override_values']
+        base['overrides'] = {'Cars': {'values': {user_inputs['years'][1]: 2e6}, 'growth_rates': {}}}
+        paths = {
+            'run_valuation': lambda: run_valuation(user_inputs),
+            'evaluate batch': lambda: to_yearly_results(user_inputs, select_batch(batched, 0)),
+            'ValuationResult': lambda: ValuationResult(user_inputs, arrays).to_dict(),
+            'reevaluate': lambda: to_yearly_results(user_inputs, reevaluate(base, evaluate(base), user_inputs)),
+        }
+        if not override:
+            # The universe batch, next to a company with more segments so this one is padded
+            wider = dict(user_inputs, products={**user_inputs['products'], 'Extra': {'revenue': 1000, 'gross_margin': 0.2, 'op_expense_ratio': 0.1, 'growth_rate': 0.1}})
+            wider['toggles'] = {**user_inputs['toggles'], 'Extra': True}
+            paths['universe'] = lambda: to_yearly_results(user_inputs, select_company(evaluate_universe([user_inputs, wider]), 0))
+        for name, compute in paths.items():
+            if not _same(expected, compute()):
+                failures.append(f"{label}: {name}")
+    return failures
+
+
+# Timing
+
+def measure(fn, repeat=7, min_time=0.1):
+    """Seconds per call of fn in the fastest of repeat rounds, each long enough to time reliably.
+
+    The fastest round is the least disturbed by other work on the machine, which makes
+    it the most repeatable figure to gate on.
+    """
+    fn()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    rounds = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return min(rounds)
+
+
+def _throughput(user_inputs, size):
+    """Scenarios per second through the engine in chunks, keeping only the final-year prices."""
+    rng = np.random.default_rng(0)
+    started = time.perf_counter()
+    for start in range(0, size, CHUNK_SIZE):
+        n = min(CHUNK_SIZE, size - start)
+        params = {
+            'net_profit_margin': rng.uniform(0.05, 0.2, n),
+            'robotaxi_network.vehicle_growth_rate': rng.uniform(0.2, 0.8, n),
+        }
+        evaluate(user_inputs, params)['stock_price'][:, -1, :].copy()
+    return size / (time.perf_counter() - started)
+
+
+def _import_seconds():
+    """Wall time of a fresh interpreter importing the valuation package, minus a bare interpreter."""
+    def run(code):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(BASELINES)))
+        return time.perf_counter() - started
+    return min(run('import valuation') for _ in range(5)) - min(run('pass') for _ in range(5))
+
+
+def benchmarks(quick=False):
+    """{group: (fn, unit, better)}: each fn() measures and returns {metric: value}, lower or higher being better."""
+    user_inputs = default_user_inputs()
+    arrays = evaluate(user_inputs)
+    override = dict(user_inputs, override_flags={product: True for product in DEFAULT_PRODUCTS}, override_values=dict(OVERRIDE_VALUES))
+    values = np.random.default_rng(0).lognormal(10, 4, 100_000)
+    universe = synthetic_universe(500)
+    history = synthetic_history(user_inputs)
+    monthly = dict(default_user_inputs(list(range(2025, 2056))), periods_per_year=12)
+    margins = {'net_profit_margin': np.linspace(0.05, 0.3, 1000)}
+
+    def single(horizon):
+        latencies = []
+        for toggles in toggle_combinations():
+            scenario = default_user_inputs(HORIZONS[horizon])
+            scenario['toggles'] = toggles
+            latencies.append(measure(lambda: run_valuation(scenario), repeat=5, min_time=0.02))
+        return {f'single_{horizon}_median_ms': float(np.median(latencies)) * 1e3, f'single_{horizon}_max_ms': max(latencies) * 1e3}
+
+    def throughput(label, size):
+        return {f'batch_{label}_per_s': max(_throughput(user_inputs, size) for _ in range(3 if size <= 100_000 else 1))}
+
+    def format_tables():
+        result = ValuationResult(user_inputs, arrays)
+        for y in (0, -1):
+            for name in ('product', 'robotaxi', 'revenue', 'market'):
+                result.formatted_table(name, y)
+
+    groups = {horizon: (lambda horizon=horizon: single(horizon), 'ms', 'lower') for horizon in HORIZONS}
+    groups['override'] = (lambda: {'single_override_ms': measure(lambda: run_valuation(override)) * 1e3}, 'ms', 'lower')
+    groups['evaluate'] = (lambda: {'evaluate_ms': measure(lambda: evaluate(user_inputs)) * 1e3}, 'ms', 'lower')
+    groups['jacobian'] = (lambda: {'jacobian_ms': measure(lambda: evaluate(user_inputs, jacobian=True)) * 1e3}, 'ms', 'lower')
+    groups['universe'] = (lambda: {'universe_500_ms': measure(lambda: evaluate_universe(universe)) * 1e3}, 'ms', 'lower')
+    groups['monthly'] = (lambda: {'monthly_30y_1k_ms': measure(lambda: evaluate(monthly, margins)) * 1e3}, 'ms', 'lower')
+    groups['backtest'] = (lambda: {'backtest_30y_daily_ms': measure(lambda: backtest(user_inputs, history)) * 1e3}, 'ms', 'lower')
+    for label, size in BATCH_SIZES.items():
+        if not quick or size <= 100_000:
+            groups[label] = (lambda label=label, size=size: throughput(label, size), 'scenarios/s', 'higher')
+    groups['format_tables'] = (lambda: {'format_tables_ms': measure(format_tables) * 1e3}, 'ms', 'lower')
+    groups['human_format_array'] = (lambda: {'human_format_array_100k_ms': measure(lambda: human_format_array(values)) * 1e3}, 'ms', 'lower')
+    groups['human_format'] = (lambda: {'human_format_us': measure(lambda: human_format(123456789.0)) * 1e6}, 'us', 'lower')
+    groups['json'] = (lambda: {'yearly_results_json_ms': measure(lambda: json.dumps(to_yearly_results(user_inputs, arrays))) * 1e3}, 'ms', 'lower')
+    groups['import'] = (lambda: {'import_ms': _import_seconds() * 1e3}, 'ms', 'lower')
+    return groups
+
+
+def run_benchmarks(groups, names=None, owners=None):
+    """{metric: (value, unit, better)} from running the given groups (default: all).
+
+    owners, if given, is filled with each metric's group.
+    """
+    metrics = {}
+    for name, (fn, unit, better) in groups.items():
+        if names is None or name in names:
+            for metric, value in fn().items():
+                metrics[metric] = (value, unit, better)
+                if owners is not None:
+                    owners[metric] = name
+    return metrics
+
+
+# Baselines
+
+def machine():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+
+def compare(metrics, baselines, threshold):
+    """(report lines, regressed metric names) against the stored baselines."""
+    lines, regressions = [], []
+    for name, (value, unit, better) in metrics.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            lines.append(f"{name:<28} {value:>14,.3f} {unit:<12} (no baseline)")
+            continue
+        change = value / baseline['value'] - 1 if baseline['value'] else 0.0
+        # Noisy metrics (e.g. interpreter start-up) may carry their own threshold in the baselines file
+        limit = baseline.get('threshold', threshold)
+        worse = change > limit if better == 'lower' else change < -limit
+        if worse:
+            regressions.append(name)
+        lines.append(f"{name:<28} {value:>14,.3f} {unit:<12} baseline {baseline['value']:>14,.3f}  {change:+7.1%}{'  REGRESSION' if worse else ''}")
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description="Benchmark the valuation engine and gate regressions.")
+    parser.add_argument('--quick', action='store_true', help="skip the 1M-scenario throughput run")
+    parser.add_argument('--threshold', type=float, default=0.25, help="relative change that counts as a regression (default 0.25)")
+    parser.add_argument('--retries', type=int, default=2, help="times a regressed metric is re-measured before it fails the run (default 2)")
+    parser.add_argument('--update-baselines', action='store_true', help="write this run's metrics to benchmarks/baselines.json")
+    parser.add_argument('--skip-reference', action='store_true', help="skip the equality check against valuation.reference")
+    args = parser.parse_args(argv)
+
+    failed = False
+    if not args.skip_reference:
+        started = time.perf_counter()
+        failures = check_reference()
+        count = len(list(scenarios()))
+        print(f"Reference equality: {count - len({f.split(':')[0] for f in failures})}/{count} scenarios identical on every engine path ({time.perf_counter() - started:.1f}s)")
+        for failure in failures:
+            print(f"  MISMATCH {failure}")
+        failed = bool(failures)
+
+    groups = benchmarks(quick=args.quick)
+    owners = {}
+    metrics = run_benchmarks(groups, owners=owners)
+    if args.update_baselines:
+        # Baselines are the median of three runs, so one lucky run does not set the bar
+        runs = [metrics] + [run_benchmarks(groups) for _ in range(2)]
+        metrics = {name: (float(np.median([run[name][0] for run in runs])), unit, better) for name, (_, unit, better) in metrics.items()}
+        with open(BASELINES) as f:
+            previous = json.load(f) if os.path.getsize(BASELINES) else {}
+        kept = previous.get('metrics', {})
+        stored = {
+            name: {**kept.get(name, {}), 'value': float(f'{value:.4g}'), 'unit': unit, 'better': better}
+            for name, (value, unit, better) in metrics.items()
+        }
+        with open(BASELINES, 'w') as f:
+            json.dump({'machine': machine(), 'metrics': {**kept, **stored}}, f, indent=2)
+            f.write('\n')
+        print(f"Wrote {len(metrics)} baselines to {BASELINES}")
+        return 1 if failed else 0
+
+    with open(BASELINES) as f:
+        baselines = json.load(f)
+    if baselines.get('machine') != machine():
+        print(f"Note: baselines were recorded on {baselines.get('machine')}; this is {machine()}")
+    lines, regressions = compare(metrics, baselines['metrics'], args.threshold)
+    for _ in range(args.retries):
+        if not regressions:
+            break
+        # A regression has to persist: re-measure the groups that regressed and keep each metric's better value
+        rerun = {owners[metric] for metric in regressions}
+        for metric, (value, unit, better) in run_benchmarks(groups, rerun).items():
+            metrics[metric] = (min(value, metrics[metric][0]) if better == 'lower' else max(value, metrics[metric][0]), unit, better)
+        lines, regressions = compare(metrics, baselines['metrics'], args.threshold)
+    print('\n'.join(lines))
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+    return 1 if failed or regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
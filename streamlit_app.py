@@ -1,213 +1,164 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import json
+import os
+import time
+import uuid
 
 import plotly.graph_objects as go
 
-def human_format(num, precision=2):
-    """Convert a number to a human-readable string (e.g., 1.2M, 3.4B). For $ amounts < 1M, use commas."""
-    if num is None or num == '-' or pd.isnull(num):
-        return num
+from valuation import GRANULARITIES, ValuationResult, compute_valuation, evaluate_periods, flatten_inputs, reevaluate, segment_kind
+from valuation.defaults import (
+    DEFAULT_BASE_SHARES_OUTSTANDING,
+    DEFAULT_FLEET_COHORTS,
+    DEFAULT_NET_PROFIT_MARGIN,
+    DEFAULT_PE_RATIOS,
+    DEFAULT_PRODUCTS,
+    DEFAULT_ROBOTAXI_NETWORK,
+    DEFAULT_SHARES_GROWTH_RATE,
+    DEFAULT_TOGGLES,
+)
+from valuation.export import EXPORT_FORMATS, simulation_arrow, sweep_arrow, table_bytes
+from valuation.formatting import human_format, human_format_array, input_label
+from valuation.cache import ResultCache, canonical_hash
+from valuation.monte_carlo import DISTRIBUTIONS, merge_sketches, simulate_sketches, split_draws, spread_distribution, summarize_sketches
+from valuation.sensitivity import elasticities, one_at_a_time, sobol_indices
+from valuation.surface import ResponseSurface, fixed_inputs, timed_evaluate
+from valuation.store import ScenarioStore
+from valuation.sweep import merge_sweeps, sweep_2d, sweep_table
+from valuation.goal_seek import goal_seek
+from valuation.jobs import JobCancelled, JobLimitError, JobPool
+from valuation.timing import StageMetrics, StageTimer, TimingLog, serve_metrics
+
+timer = StageTimer()
+
+@st.cache_resource
+def get_result_cache():
+    """One result cache per server process, shared by every session."""
+    return ResultCache(maxsize=512, ttl=6 * 3600)
+
+@st.cache_resource
+def get_sobol_cache():
+    """Sobol results per (inputs, range, sample size) configuration, shared by every session."""
+    return ResultCache(maxsize=64, ttl=6 * 3600)
+
+@st.cache_resource
+def get_job_pool():
+    """One worker pool per server process, sized by VALUATION_WORKERS and VALUATION_JOBS_PER_SESSION."""
+    workers = int(os.environ.get('VALUATION_WORKERS', 0)) or None
+    return JobPool(workers, max_jobs_per_session=int(os.environ.get('VALUATION_JOBS_PER_SESSION', 2)))
+
+@st.cache_resource
+def get_scenario_store():
+    """The scenario library, a SQLite file at VALUATION_STORE (default scenarios.db)."""
+    return ScenarioStore(os.environ.get('VALUATION_STORE', 'scenarios.db'))
+
+@st.cache_resource
+def get_timing_sinks():
+    """Optional per-process timing outputs, enabled with VALUATION_TIMING_LOG and VALUATION_METRICS_PORT."""
+    log_path = os.environ.get('VALUATION_TIMING_LOG')
+    metrics_port = os.environ.get('VALUATION_METRICS_PORT')
+    metrics = StageMetrics()
+    if metrics_port:
+        serve_metrics(metrics, int(metrics_port))
+    return (TimingLog(log_path) if log_path else None), metrics
+
+def styled_table(table, display):
+    """A numeric DataFrame (so columns sort by value) shown with precomputed display strings."""
+    df = pd.DataFrame(table)
+    formatters = {col: dict(zip(df[col], strings)).get for col, strings in display.items()}
+    return df.style.format(formatters, precision=2, na_rep='-')
+
+def arrow_downloads(make_bytes, file_stem, columns):
+    """Parquet and Arrow IPC download buttons, one per column, for the files make_bytes(file_format) builds."""
     try:
-        num = float(num)
-    except Exception:
-        return num
-    abs_num = abs(num)
-    if abs_num >= 1_000_000_000:
-        return f"{num/1_000_000_000:.{precision}f}B"
-    elif abs_num >= 1_000_000:
-        return f"{num/1_000_000:.{precision}f}M"
-    elif abs_num >= 1_000:
-        return f"{num/1_000:.{precision}f}K"
-    else:
-        return f"{int(round(num)):,}"
-
-def run_valuation(user_inputs):
-    # Unpack user inputs
-    products = user_inputs['products']
-    robotaxi_network = user_inputs['robotaxi_network']
-    toggles = user_inputs['toggles']
-    net_profit_margin = user_inputs['net_profit_margin']
-    base_shares_outstanding = user_inputs['base_shares_outstanding']
-    shares_growth_rate = user_inputs['shares_growth_rate']
-    pe_ratios = user_inputs['pe_ratios']
-    years = user_inputs['years']
-
-    yearly_results = []
-    for year in years:
-        shares_outstanding = base_shares_outstanding * (1 + shares_growth_rate) ** (year - years[0])
-        product_results = []
-        total_product_revenue = 0
-        revenue_breakdown = []
-        for product, data in products.items():
-            if product in ['Cars', 'Robotaxi', 'Optimus']:
-                units_sold = data['units_sold'] * (1 + data['growth_rate']) ** (year - years[0])
-                revenue = units_sold * data['sale_price']
-            else:
-                revenue = data['revenue'] * (1 + data['growth_rate']) ** (year - years[0]) * 1e6
-            if toggles[product]:
-                op_expenses = revenue * data['op_expense_ratio']
-                net_revenue = revenue - op_expenses
-                gross_profit = net_revenue * data['gross_margin']
-            else:
-                net_revenue = revenue
-                gross_profit = revenue * data['gross_margin']
-            total_product_revenue += net_revenue
-            product_results.append({
-                'Product': product,
-                'Units Sold': units_sold if product in ['Cars', 'Robotaxi', 'Optimus'] else '-',
-                'Sale Price ($)': data['sale_price'] if product in ['Cars', 'Robotaxi', 'Optimus'] else '-',
-                'Gross Margin (%)': data['gross_margin'] * 100,
-                'Revenue ($M)': net_revenue / 1e6,
-                'Gross Profit ($M)': gross_profit / 1e6,
-                'Operating Expenses ($M)' if toggles[product] else None: op_expenses / 1e6 if toggles[product] else None
-            })
-            revenue_breakdown.append({
-                'Category': product,
-                'Revenue ($M)': net_revenue / 1e6
-            })
-
-        # Robotaxi Network
-        network_vehicles = robotaxi_network['network_vehicles'] * (1 + robotaxi_network['vehicle_growth_rate']) ** (year - years[0])
-        operating_cost_per_mile = robotaxi_network['operating_cost_per_mile'] * (1 - robotaxi_network['cost_reduction_rate']) ** (year - years[0])
-        utilization_rate = min(0.70, robotaxi_network['utilization_rate'] * (1 + robotaxi_network['utilization_growth_rate']) ** (year - years[0]))
-        if toggles['Robotaxi Network']:
-            utilized_miles_per_car = robotaxi_network['miles_per_car'] * utilization_rate
-            total_miles = network_vehicles * utilized_miles_per_car
-            gross_revenue = total_miles * robotaxi_network['rider_pays_per_mile']
-            car_owner_earnings = total_miles * robotaxi_network['car_owner_cut_per_mile']
-            tesla_gross_earnings = total_miles * robotaxi_network['tesla_cut_per_mile']
-            operating_costs = total_miles * operating_cost_per_mile
-            tesla_net_earnings = tesla_gross_earnings - operating_costs
-            robotaxi_results = {
-                'Network Vehicles': network_vehicles,
-                'Miles per Car (Utilized)': utilized_miles_per_car,
-                'Utilization Rate (%)': utilization_rate * 100,
-                'Rider Pays per Mile ($)': robotaxi_network['rider_pays_per_mile'],
-                'Car Owner Cut per Mile ($)': robotaxi_network['car_owner_cut_per_mile'],
-                'Tesla Cut per Mile ($)': robotaxi_network['tesla_cut_per_mile'],
-                'Operating Cost per Mile ($)': operating_cost_per_mile,
-                'Gross Revenue ($M)': gross_revenue / 1e6,
-                'Car Owner Earnings ($M)': car_owner_earnings / 1e6,
-                'Tesla Gross Earnings ($M)': tesla_gross_earnings / 1e6,
-                'Operating Costs ($M)': operating_costs / 1e6,
-                'Tesla Net Earnings ($M)': tesla_net_earnings / 1e6
-            }
-            tesla_earnings = tesla_net_earnings
-        else:
-            total_miles = network_vehicles * robotaxi_network['miles_per_car']
-            tesla_earnings = total_miles * robotaxi_network['tesla_cut_per_mile']
-            robotaxi_results = {
-                'Network Vehicles': network_vehicles,
-                'Miles per Car': robotaxi_network['miles_per_car'],
-                'Rider Pays per Mile ($)': robotaxi_network['rider_pays_per_mile'],
-                'Car Owner Cut per Mile ($)': robotaxi_network['car_owner_cut_per_mile'],
-                'Tesla Cut per Mile ($)': robotaxi_network['tesla_cut_per_mile'],
-                'Tesla Earnings per Year ($M)': tesla_earnings / 1e6
-            }
-
-        revenue_breakdown.append({
-            'Category': 'Robotaxi Network',
-            'Revenue ($M)': tesla_earnings / 1e6
-        })
-
-        total_company_revenue = total_product_revenue + tesla_earnings
-        net_income = total_company_revenue * net_profit_margin
-        market_cap_results = []
-        for scenario, pe_ratio in pe_ratios.items():
-            market_cap = net_income * pe_ratio
-            market_cap_results.append({
-                'Scenario': scenario,
-                'P/E Ratio': pe_ratio,
-                'Net Income ($M)': net_income / 1e6,
-                'Market Cap ($B)': market_cap / 1e9,
-                'Stock Price ($)': market_cap / (shares_outstanding * 1e6)
-            })
-
-        yearly_results.append({
-            'Year': year,
-            'product_valuation': product_results,
-            'robotaxi_network': robotaxi_results,
-            'revenue_breakdown': revenue_breakdown,
-            'total_revenue_million': total_company_revenue / 1e6,
-            'market_cap': market_cap_results
-        })
-    return {'yearly_results': yearly_results}
+        files = {file_format: make_bytes(file_format) for file_format in EXPORT_FORMATS}
+    except ImportError:
+        columns[0].caption("Install pyarrow to download Parquet or Arrow files.")
+        return
+    for column, (file_format, data) in zip(columns, files.items()):
+        column.download_button(
+            f"Download {file_format.title()}", data, file_name=f"{file_stem}.{file_format}",
+            mime=EXPORT_FORMATS[file_format], key=f"download_{file_stem}_{file_format}"
+        )
+
+def session_id():
+    return st.session_state.setdefault('session_id', uuid.uuid4().hex)
+
+def run_job(name, tasks, combine, label):
+    """Run tasks on the shared worker pool behind a progress bar; returns None if the job could not finish.
+
+    Starting the same job again (a rerun from this session) cancels the previous one.
+    """
+    try:
+        job = get_job_pool().submit(session_id(), name, tasks, combine)
+    except JobLimitError as exc:
+        st.warning(f"{exc}; try again when one finishes.")
+        return None
+    bar = st.progress(0.0, text=label)
+    try:
+        result = job.result(progress=lambda fraction: bar.progress(fraction, text=label))
+    except JobCancelled:
+        return None
+    finally:
+        # Stops the remaining tasks when a rerun interrupts this one; a no-op once finished
+        job.cancel()
+    bar.empty()
+    return result
+
+def preview_surface(user_inputs):
+    """This session's preview surface if it covers user_inputs, else None.
+
+    Surfaces are built on the shared worker pool without waiting: a finished build is
+    picked up on a later rerun, and a new one starts when neither the current surface
+    nor the pending build can preview user_inputs.
+    """
+    pending = st.session_state.get('surface_job')
+    if pending is not None and pending[0].done():
+        del st.session_state['surface_job']
+        try:
+            st.session_state['surface'] = pending[0].result()
+        except Exception:
+            # Cancelled or failed builds are retried below if they are still needed
+            pass
+        pending = None
+    surface = st.session_state.get('surface')
+    if surface is not None and surface.covers(user_inputs):
+        return surface
+    if pending is None or fixed_inputs(pending[1]) != fixed_inputs(user_inputs):
+        try:
+            job = get_job_pool().submit(session_id(), 'surface', [(ResponseSurface, (user_inputs,))], lambda parts: parts[0])
+        except JobLimitError:
+            return None
+        st.session_state['surface_job'] = (job, user_inputs)
+    return None
+
+def exact_on_pool(user_inputs):
+    """timed_evaluate(user_inputs) on the shared worker pool, or None if the pool cannot take it now."""
+    try:
+        job = get_job_pool().submit(session_id(), 'valuation', [(timed_evaluate, (user_inputs,))], lambda parts: parts[0])
+    except JobLimitError:
+        return None
+    try:
+        return job.result()
+    except JobCancelled:
+        return None
+    finally:
+        job.cancel()
 
 # --- Streamlit UI ---
 st.set_page_config(page_title="Tesla Stock Valuation Simulator", layout="wide")
 st.title("Tesla Stock Valuation Simulator")
 
+timer.start('widgets')
 st.sidebar.header("Adjust Assumptions")
 
-# Default values (from your script)
-default_products = {
-    'Cars': {
-        'units_sold': 2000000,
-        'sale_price': 50000,
-        'gross_margin': 0.18,
-        'op_expense_ratio': 0.80,
-        'growth_rate': 0.05
-    },
-    'Robotaxi': {
-        'units_sold': 100,
-        'sale_price': 30000,
-        'gross_margin': 0.25,
-        'op_expense_ratio': 0.70,
-        'growth_rate': 0.50
-    },
-    'Optimus': {
-        'units_sold': 1,
-        'sale_price': 20000,
-        'gross_margin': 0.30,
-        'op_expense_ratio': 0.70,
-        'growth_rate': 1.00
-    },
-    'Energy': {
-        'revenue': 15000,
-        'gross_margin': 0.30,
-        'op_expense_ratio': 0.20,
-        'growth_rate': 0.20
-    },
-    'Services': {
-        'revenue': 10000,
-        'gross_margin': 0.15,
-        'op_expense_ratio': 0.30,
-        'growth_rate': 0.10
-    }
-}
-default_robotaxi_network = {
-    'network_vehicles': 100,
-    'miles_per_car': 50000,
-    'rider_pays_per_mile': 1.00,
-    'car_owner_cut_per_mile': 0.60,
-    'tesla_cut_per_mile': 0.40,
-    'operating_cost_per_mile': 0.42,
-    'utilization_rate': 0.50,
-    'vehicle_growth_rate': 1.00,
-    'cost_reduction_rate': 0.05,
-    'utilization_growth_rate': 0.0234
-}
-default_toggles = {
-    'Cars': False,
-    'Robotaxi': False,
-    'Optimus': False,
-    'Energy': False,
-    'Services': False,
-    'Robotaxi Network': True
-}
-default_pe_ratios = {
-    'Conservative': 100,
-    'Current': 191.60,
-    'Optimistic': 250,
-    'Bullish': 350
-}
-
 # Sidebar inputs for each product
 products = {}
-for product, vals in default_products.items():
+for product, vals in DEFAULT_PRODUCTS.items():
     st.sidebar.subheader(product)
-    if product in ['Cars', 'Robotaxi', 'Optimus']:
+    if segment_kind(vals) == 'units':
         units_sold = st.sidebar.number_input(f"{product} Units Sold (2025)", min_value=0, value=vals['units_sold'], step=1000)
         sale_price = st.sidebar.number_input(f"{product} Sale Price ($)", min_value=0, value=vals['sale_price'], step=1000)
         gross_margin = st.sidebar.slider(f"{product} Gross Margin (%)", min_value=0.0, max_value=1.0, value=vals['gross_margin'])
@@ -234,16 +185,16 @@ for product, vals in default_products.items():
 
 # Robotaxi Network inputs
 st.sidebar.subheader("Robotaxi Network")
-network_vehicles = st.sidebar.number_input("Network Vehicles (2025)", min_value=0, value=default_robotaxi_network['network_vehicles'], step=1000)
-miles_per_car = st.sidebar.number_input("Miles per Car (2025)", min_value=0, value=default_robotaxi_network['miles_per_car'], step=1000)
-rider_pays_per_mile = st.sidebar.number_input("Rider Pays per Mile ($)", min_value=0.0, value=default_robotaxi_network['rider_pays_per_mile'], step=0.01)
-car_owner_cut_per_mile = st.sidebar.number_input("Car Owner Cut per Mile ($)", min_value=0.0, value=default_robotaxi_network['car_owner_cut_per_mile'], step=0.01)
-tesla_cut_per_mile = st.sidebar.number_input("Tesla Cut per Mile ($)", min_value=0.0, value=default_robotaxi_network['tesla_cut_per_mile'], step=0.01)
-operating_cost_per_mile = st.sidebar.number_input("Operating Cost per Mile ($)", min_value=0.0, value=default_robotaxi_network['operating_cost_per_mile'], step=0.01)
-utilization_rate = st.sidebar.slider("Utilization Rate (2025)", min_value=0.0, max_value=1.0, value=default_robotaxi_network['utilization_rate'])
-vehicle_growth_rate = st.sidebar.slider("Vehicle Growth Rate", min_value=0.0, max_value=2.0, value=default_robotaxi_network['vehicle_growth_rate'])
-cost_reduction_rate = st.sidebar.slider("Cost Reduction Rate", min_value=0.0, max_value=0.2, value=default_robotaxi_network['cost_reduction_rate'])
-utilization_growth_rate = st.sidebar.slider("Utilization Growth Rate", min_value=0.0, max_value=0.1, value=default_robotaxi_network['utilization_growth_rate'])
+network_vehicles = st.sidebar.number_input("Network Vehicles (2025)", min_value=0, value=DEFAULT_ROBOTAXI_NETWORK['network_vehicles'], step=1000)
+miles_per_car = st.sidebar.number_input("Miles per Car (2025)", min_value=0, value=DEFAULT_ROBOTAXI_NETWORK['miles_per_car'], step=1000)
+rider_pays_per_mile = st.sidebar.number_input("Rider Pays per Mile ($)", min_value=0.0, value=DEFAULT_ROBOTAXI_NETWORK['rider_pays_per_mile'], step=0.01)
+car_owner_cut_per_mile = st.sidebar.number_input("Car Owner Cut per Mile ($)", min_value=0.0, value=DEFAULT_ROBOTAXI_NETWORK['car_owner_cut_per_mile'], step=0.01)
+tesla_cut_per_mile = st.sidebar.number_input("Tesla Cut per Mile ($)", min_value=0.0, value=DEFAULT_ROBOTAXI_NETWORK['tesla_cut_per_mile'], step=0.01)
+operating_cost_per_mile = st.sidebar.number_input("Operating Cost per Mile ($)", min_value=0.0, value=DEFAULT_ROBOTAXI_NETWORK['operating_cost_per_mile'], step=0.01)
+utilization_rate = st.sidebar.slider("Utilization Rate (2025)", min_value=0.0, max_value=1.0, value=DEFAULT_ROBOTAXI_NETWORK['utilization_rate'])
+vehicle_growth_rate = st.sidebar.slider("Vehicle Growth Rate", min_value=0.0, max_value=2.0, value=DEFAULT_ROBOTAXI_NETWORK['vehicle_growth_rate'])
+cost_reduction_rate = st.sidebar.slider("Cost Reduction Rate", min_value=0.0, max_value=0.2, value=DEFAULT_ROBOTAXI_NETWORK['cost_reduction_rate'])
+utilization_growth_rate = st.sidebar.slider("Utilization Growth Rate", min_value=0.0, max_value=0.1, value=DEFAULT_ROBOTAXI_NETWORK['utilization_growth_rate'])
 
 robotaxi_network = {
     'network_vehicles': network_vehicles,
@@ -258,43 +209,71 @@ robotaxi_network = {
     'utilization_growth_rate': utilization_growth_rate
 }
 
+# Cohort fleet model: track Robotaxi Network vehicles by the year they joined
+fleet_cohorts = None
+if st.sidebar.checkbox("Cohort fleet model (by vintage)", value=False):
+    fleet_cohorts = {
+        'lifetime_years': st.sidebar.slider("Vehicle Lifetime (years)", min_value=1, max_value=20, value=DEFAULT_FLEET_COHORTS['lifetime_years']),
+        'attrition_rate': st.sidebar.slider("Annual Attrition Rate", min_value=0.0, max_value=0.2, value=DEFAULT_FLEET_COHORTS['attrition_rate']),
+        'ramp_years': st.sidebar.slider("Utilization Ramp (years)", min_value=1, max_value=5, value=DEFAULT_FLEET_COHORTS['ramp_years']),
+        'age_mileage_decline': st.sidebar.slider("Miles per Car Decline per Year of Age", min_value=0.0, max_value=0.2, value=DEFAULT_FLEET_COHORTS['age_mileage_decline']),
+        'age_cost_growth': st.sidebar.slider("Cost per Mile Growth per Year of Age", min_value=0.0, max_value=0.2, value=DEFAULT_FLEET_COHORTS['age_cost_growth'])
+    }
+
 # Toggles
 st.sidebar.subheader("Advanced Calculation Toggles")
 toggles = {}
-for key in default_toggles:
-    toggles[key] = st.sidebar.checkbox(f"Advanced for {key}", value=default_toggles[key])
+for key in DEFAULT_TOGGLES:
+    toggles[key] = st.sidebar.checkbox(f"Advanced for {key}", value=DEFAULT_TOGGLES[key])
 
 # Other assumptions
 st.sidebar.subheader("Other Assumptions")
-net_profit_margin = st.sidebar.slider("Net Profit Margin", min_value=0.0, max_value=0.5, value=0.08)
-base_shares_outstanding = st.sidebar.number_input("Shares Outstanding (2025, millions)", min_value=0, value=3220, step=10)
-shares_growth_rate = st.sidebar.slider("Shares Growth Rate", min_value=0.0, max_value=0.05, value=0.01)
+net_profit_margin = st.sidebar.slider("Net Profit Margin", min_value=0.0, max_value=0.5, value=DEFAULT_NET_PROFIT_MARGIN)
+base_shares_outstanding = st.sidebar.number_input("Shares Outstanding (2025, millions)", min_value=0, value=DEFAULT_BASE_SHARES_OUTSTANDING, step=10)
+shares_growth_rate = st.sidebar.slider("Shares Growth Rate", min_value=0.0, max_value=0.05, value=DEFAULT_SHARES_GROWTH_RATE)
 
 # P/E Ratios
 st.sidebar.subheader("P/E Ratios")
 pe_ratios = {}
-for scenario, val in default_pe_ratios.items():
+for scenario, val in DEFAULT_PE_RATIOS.items():
     pe_ratios[scenario] = st.sidebar.number_input(f"{scenario} P/E", min_value=1, value=int(val), step=1)
 
 # Years
 st.sidebar.subheader("Projection Period")
-projection_period = st.sidebar.radio("Projection Period", ["5 Years", "10 Years"], index=1)
-if projection_period == "5 Years":
-    years = list(range(2025, 2030))
-else:
-    years = list(range(2025, 2036))
-
-# 5-year override flags and values
-st.sidebar.subheader("5-Year Override (Year 2029)")
-override_flags = {}
-override_values = {}
-for product in default_products:
-    override_flags[product] = st.sidebar.checkbox(f"Override 5-Year for {product}", value=False)
-    if override_flags[product]:
-        if product in ['Cars', 'Robotaxi', 'Optimus']:
-            override_values[product] = st.sidebar.number_input(f"{product} Units Sold (2029 Override)", min_value=0, value=default_products[product]['units_sold'], step=1000)
-        else:
-            override_values[product] = st.sidebar.number_input(f"{product} Revenue (2029 Override, $M)", min_value=0, value=default_products[product]['revenue'], step=1000)
+projection_periods = {
+    "5 Years": range(2025, 2030),
+    "10 Years": range(2025, 2036),
+    "20 Years": range(2025, 2046),
+    "30 Years": range(2025, 2056),
+}
+projection_period = st.sidebar.radio("Projection Period", list(projection_periods), index=1)
+years = list(projection_periods[projection_period])
+granularity = st.sidebar.radio("Granularity", list(GRANULARITIES), horizontal=True)
+
+# Override points: pin a line's level in a year (later years compound from it) and/or
+# switch its growth rate from a year on
+st.sidebar.subheader("Overrides")
+overrides = {}
+for target in list(DEFAULT_PRODUCTS) + ['Robotaxi Network']:
+    if not st.sidebar.checkbox(f"Override {target}", value=False):
+        continue
+    if target == 'Robotaxi Network':
+        level_column, level_default = "Network Vehicles", DEFAULT_ROBOTAXI_NETWORK['network_vehicles']
+    elif segment_kind(DEFAULT_PRODUCTS[target]) == 'units':
+        level_column, level_default = "Units Sold", DEFAULT_PRODUCTS[target]['units_sold']
+    else:
+        level_column, level_default = "Revenue ($M)", DEFAULT_PRODUCTS[target]['revenue']
+    points = st.sidebar.data_editor(
+        pd.DataFrame({'Year': [years[min(4, len(years) - 1)]], level_column: [float(level_default)], 'Growth Rate From Year': [np.nan]}),
+        num_rows='dynamic',
+        hide_index=True,
+        key=f"overrides_{target}",
+        column_config={'Year': st.column_config.NumberColumn(min_value=years[0], max_value=years[-1], step=1)},
+    )
+    overrides[target] = {
+        'values': {int(row['Year']): float(row[level_column]) for _, row in points.iterrows() if pd.notnull(row['Year']) and pd.notnull(row[level_column])},
+        'growth_rates': {int(row['Year']): float(row['Growth Rate From Year']) for _, row in points.iterrows() if pd.notnull(row['Year']) and pd.notnull(row['Growth Rate From Year'])},
+    }
 
 user_inputs = {
     'products': products,
@@ -305,191 +284,175 @@ user_inputs = {
     'shares_growth_rate': shares_growth_rate,
     'pe_ratios': pe_ratios,
     'years': years,
-    'override_flags': override_flags,
-    'override_values': override_values
+    'overrides': overrides
 }
-
-# Run valuation
-def run_valuation_with_override(user_inputs):
-    # Unpack user inputs
-    products = user_inputs['products']
-    robotaxi_network = user_inputs['robotaxi_network']
-    toggles = user_inputs['toggles']
-    net_profit_margin = user_inputs['net_profit_margin']
-    base_shares_outstanding = user_inputs['base_shares_outstanding']
-    shares_growth_rate = user_inputs['shares_growth_rate']
-    pe_ratios = user_inputs['pe_ratios']
-    years = user_inputs['years']
-    override_flags = user_inputs.get('override_flags', {})
-    override_values = user_inputs.get('override_values', {})
-
-    yearly_results = []
-    for year in years:
-        shares_outstanding = base_shares_outstanding * (1 + shares_growth_rate) ** (year - years[0])
-        product_results = []
-        total_product_revenue = 0
-        revenue_breakdown = []
-        for product, data in products.items():
-            # Apply override for 5th year if flag is set
-            if year == years[4] and override_flags.get(product, False):
-                if product in ['Cars', 'Robotaxi', 'Optimus']:
-                    units_sold = override_values[product]
-                    revenue = units_sold * data['sale_price']
-                else:
-                    revenue = override_values[product] * 1e6
-            else:
-                if product in ['Cars', 'Robotaxi', 'Optimus']:
-                    units_sold = data['units_sold'] * (1 + data['growth_rate']) ** (year - years[0])
-                    revenue = units_sold * data['sale_price']
-                else:
-                    revenue = data['revenue'] * (1 + data['growth_rate']) ** (year - years[0]) * 1e6
-            if toggles[product]:
-                op_expenses = revenue * data['op_expense_ratio']
-                net_revenue = revenue - op_expenses
-                gross_profit = net_revenue * data['gross_margin']
-            else:
-                net_revenue = revenue
-                gross_profit = revenue * data['gross_margin']
-            total_product_revenue += net_revenue
-            product_results.append({
-                'Product': product,
-                'Units Sold': units_sold if product in ['Cars', 'Robotaxi', 'Optimus'] else '-',
-                'Sale Price ($)': data['sale_price'] if product in ['Cars', 'Robotaxi', 'Optimus'] else '-',
-                'Gross Margin (%)': data['gross_margin'] * 100,
-                'Revenue ($M)': net_revenue / 1e6,
-                'Gross Profit ($M)': gross_profit / 1e6,
-                'Operating Expenses ($M)' if toggles[product] else None: op_expenses / 1e6 if toggles[product] else None
-            })
-            revenue_breakdown.append({
-                'Category': product,
-                'Revenue ($M)': net_revenue / 1e6
-            })
-
-        # Robotaxi Network (no override for network)
-        network_vehicles = robotaxi_network['network_vehicles'] * (1 + robotaxi_network['vehicle_growth_rate']) ** (year - years[0])
-        operating_cost_per_mile = robotaxi_network['operating_cost_per_mile'] * (1 - robotaxi_network['cost_reduction_rate']) ** (year - years[0])
-        utilization_rate = min(0.70, robotaxi_network['utilization_rate'] * (1 + robotaxi_network['utilization_growth_rate']) ** (year - years[0]))
-        if toggles['Robotaxi Network']:
-            utilized_miles_per_car = robotaxi_network['miles_per_car'] * utilization_rate
-            total_miles = network_vehicles * utilized_miles_per_car
-            gross_revenue = total_miles * robotaxi_network['rider_pays_per_mile']
-            car_owner_earnings = total_miles * robotaxi_network['car_owner_cut_per_mile']
-            tesla_gross_earnings = total_miles * robotaxi_network['tesla_cut_per_mile']
-            operating_costs = total_miles * operating_cost_per_mile
-            tesla_net_earnings = tesla_gross_earnings - operating_costs
-            robotaxi_results = {
-                'Network Vehicles': network_vehicles,
-                'Miles per Car (Utilized)': utilized_miles_per_car,
-                'Utilization Rate (%)': utilization_rate * 100,
-                'Rider Pays per Mile ($)': robotaxi_network['rider_pays_per_mile'],
-                'Car Owner Cut per Mile ($)': robotaxi_network['car_owner_cut_per_mile'],
-                'Tesla Cut per Mile ($)': robotaxi_network['tesla_cut_per_mile'],
-                'Operating Cost per Mile ($)': operating_cost_per_mile,
-                'Gross Revenue ($M)': gross_revenue / 1e6,
-                'Car Owner Earnings ($M)': car_owner_earnings / 1e6,
-                'Tesla Gross Earnings ($M)': tesla_gross_earnings / 1e6,
-                'Operating Costs ($M)': operating_costs / 1e6,
-                'Tesla Net Earnings ($M)': tesla_net_earnings / 1e6
-            }
-            tesla_earnings = tesla_net_earnings
-        else:
-            total_miles = network_vehicles * robotaxi_network['miles_per_car']
-            tesla_earnings = total_miles * robotaxi_network['tesla_cut_per_mile']
-            robotaxi_results = {
-                'Network Vehicles': network_vehicles,
-                'Miles per Car': robotaxi_network['miles_per_car'],
-                'Rider Pays per Mile ($)': robotaxi_network['rider_pays_per_mile'],
-                'Car Owner Cut per Mile ($)': robotaxi_network['car_owner_cut_per_mile'],
-                'Tesla Cut per Mile ($)': robotaxi_network['tesla_cut_per_mile'],
-                'Tesla Earnings per Year ($M)': tesla_earnings / 1e6
-            }
-
-        revenue_breakdown.append({
-            'Category': 'Robotaxi Network',
-            'Revenue ($M)': tesla_earnings / 1e6
-        })
-
-        total_company_revenue = total_product_revenue + tesla_earnings
-        net_income = total_company_revenue * net_profit_margin
-        market_cap_results = []
-        for scenario, pe_ratio in pe_ratios.items():
-            market_cap = net_income * pe_ratio
-            market_cap_results.append({
-                'Scenario': scenario,
-                'P/E Ratio': pe_ratio,
-                'Net Income ($M)': net_income / 1e6,
-                'Market Cap ($B)': market_cap / 1e9,
-                'Stock Price ($)': market_cap / (shares_outstanding * 1e6)
-            })
-
-        yearly_results.append({
-            'Year': year,
-            'product_valuation': product_results,
-            'robotaxi_network': robotaxi_results,
-            'revenue_breakdown': revenue_breakdown,
-            'total_revenue_million': total_company_revenue / 1e6,
-            'market_cap': market_cap_results
-        })
-    return {'yearly_results': yearly_results}
-
-output = run_valuation_with_override(user_inputs)
-
-# Display results for 2025 and 2035
-for result in output['yearly_results']:
-    if result['Year'] in [2025, 2035]:
-        st.header(f"Year {result['Year']}")
+if fleet_cohorts:
+    user_inputs['fleet_cohorts'] = fleet_cohorts
+if GRANULARITIES[granularity] > 1:
+    user_inputs['periods_per_year'] = GRANULARITIES[granularity]
+
+# Scenario library: save the shown inputs under a name, or show a saved scenario instead
+# of the sidebar assumptions
+st.sidebar.subheader("Scenario Library")
+scenario_store = get_scenario_store()
+scenario_name = st.sidebar.text_input("Scenario Name")
+scenario_tags = st.sidebar.text_input("Tags (comma-separated)")
+save_scenario = st.sidebar.button("Save Scenario", disabled=not scenario_name.strip())
+if 'loaded_scenario' in st.session_state:
+    user_inputs = st.session_state['loaded_scenario'][1]
+if save_scenario:
+    # Named now so the list below includes it; the results are stored once computed
+    scenario_store.put(user_inputs, name=scenario_name.strip(), tags=[tag.strip() for tag in scenario_tags.split(',') if tag.strip()])
+    st.sidebar.success(f"Saved '{scenario_name.strip()}'")
+saved_scenarios = scenario_store.saved()
+if saved_scenarios:
+    load_name = st.sidebar.selectbox("Saved Scenarios", [saved['name'] for saved in saved_scenarios], key='saved_scenario')
+    if st.sidebar.button("Load Scenario"):
+        st.session_state['loaded_scenario'] = (load_name, scenario_store.load(load_name))
+        user_inputs = st.session_state['loaded_scenario'][1]
+if 'loaded_scenario' in st.session_state:
+    st.sidebar.info(f"Showing saved scenario '{st.session_state['loaded_scenario'][0]}'; the assumptions above are not applied.")
+    if st.sidebar.button("Back to Sidebar Assumptions"):
+        del st.session_state['loaded_scenario']
+        st.rerun()
+
+# Instant preview: interpolate the final-year price on a precomputed grid over the growth rates and margin.
+# A lookup costs about as much as an annual evaluation, so the preview is only used once
+# an exact valuation of this session has taken longer than this
+PREVIEW_MIN_EXACT_SECONDS = 0.01
+st.sidebar.subheader("Preview")
+preview_enabled = st.sidebar.checkbox("Instant interpolated preview", value=False)
+
+# Sensitivity analysis
+st.sidebar.subheader("Sensitivity")
+sensitivity_pct = st.sidebar.slider("Perturbation (±%)", min_value=1, max_value=50, value=10)
+sensitivity_top = st.sidebar.slider("Inputs Shown in Tornado", min_value=5, max_value=40, value=15)
+
+# Monte Carlo mode: put a distribution on any assumption
+st.sidebar.subheader("Monte Carlo Simulation")
+monte_carlo_enabled = st.sidebar.checkbox("Enable Monte Carlo mode", value=False)
+if monte_carlo_enabled:
+    flat_inputs = flatten_inputs(user_inputs)
+    uncertain_options = [path for path in flat_inputs if path != 'base_shares_outstanding' and not path.startswith('override_values.')]
+    monte_carlo_draws = st.sidebar.select_slider("Draws", options=[10_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000], value=100_000)
+    monte_carlo_seed = st.sidebar.number_input("Random Seed", min_value=0, value=42, step=1)
+    default_distribution = st.sidebar.selectbox("Default Distribution", DISTRIBUTIONS, index=DISTRIBUTIONS.index('lognormal'))
+    default_spread = st.sidebar.slider("Default Spread (±%)", min_value=0, max_value=100, value=10)
+    uncertain_inputs = st.sidebar.multiselect(
+        "Uncertain Assumptions",
+        options=uncertain_options,
+        default=[path for path in uncertain_options if path.endswith('growth_rate') or path == 'net_profit_margin'],
+        format_func=input_label
+    )
+    monte_carlo_distributions = {}
+    with st.sidebar.expander("Per-Assumption Distributions"):
+        for path in uncertain_inputs:
+            dist = st.selectbox(f"{input_label(path)} Distribution", DISTRIBUTIONS, index=DISTRIBUTIONS.index(default_distribution), key=f"mc_dist_{path}")
+            spread = st.slider(f"{input_label(path)} Spread (±%)", min_value=0, max_value=100, value=default_spread, key=f"mc_spread_{path}")
+            monte_carlo_distributions[path] = spread_distribution(dist, flat_inputs[path], spread / 100)
+
+timer.stop('widgets')
+
+# Run valuation (vectorized engine; valuation.reference keeps the original per-year loop),
+# reusing results any session already computed for identical inputs. The columnar
+# result feeds the tables and charts directly.
+preview = None
+if preview_enabled:
+    exact_seconds = st.session_state.get('exact_seconds')
+    if exact_seconds is not None and exact_seconds >= PREVIEW_MIN_EXACT_SECONDS:
+        with timer.stage('preview'):
+            surface = preview_surface(user_inputs)
+            if surface is not None:
+                preview = surface.predict(user_inputs)
+    if preview is not None:
+        st.header(f"⚡ {surface.year} Stock Price Preview")
+        preview_columns = st.columns(len(surface.scenarios))
+        for column, scenario, price, market_cap in zip(preview_columns, surface.scenarios, preview['stock_price'], preview['market_cap']):
+            column.metric(f"{scenario} (interpolated)", f"${human_format(price)}")
+            column.caption(f"Market cap ${human_format(market_cap)}")
+        preview_caption = st.empty()
+    elif exact_seconds is not None and exact_seconds < PREVIEW_MIN_EXACT_SECONDS:
+        st.caption(f"Preview skipped: the exact valuation takes {exact_seconds * 1000:.2f} ms, as quick as an interpolated one.")
+    elif exact_seconds is not None:
+        st.caption("Building the preview grid around this scenario on the worker pool; it is used from the next change on.")
+
+result_cache = get_result_cache()
+cache_hits_before = result_cache.hits
+def compute_or_update(inputs):
+    # Saved scenarios load their stored arrays; after an override edit only the edited
+    # lines are recomputed from the previous run
+    stored = scenario_store.arrays(inputs)
+    if stored is not None:
+        return ValuationResult(inputs, stored)
+    if preview is not None:
+        # The preview is on screen: the exact valuation runs on the worker pool, off the script thread
+        timed = exact_on_pool(inputs)
+        if timed is not None:
+            st.session_state['exact_seconds'] = timed[1]
+            return ValuationResult(inputs, timed[0])
+    started = time.perf_counter()
+    previous = st.session_state.get('last_valuation')
+    if previous is None:
+        result = compute_valuation(inputs)
+    else:
+        result = ValuationResult(inputs, reevaluate(previous.user_inputs, previous.arrays, inputs))
+    st.session_state['exact_seconds'] = time.perf_counter() - started
+    return result
+
+with timer.stage('valuation'):
+    output = result_cache.get_or_compute(user_inputs, compute_or_update)
+st.session_state['last_valuation'] = output
+valuation_cache_hit = result_cache.hits > cache_hits_before
+if save_scenario:
+    scenario_store.put(user_inputs, output.arrays)
+
+if preview is not None:
+    preview_error = {
+        metric: np.abs(preview[metric] - output[metric][-1]) / np.abs(output[metric][-1])
+        for metric in ('stock_price', 'market_cap')
+    }
+    preview_errors = st.session_state.setdefault('preview_errors', [])
+    preview_errors.append(float(np.max(preview_error['stock_price'])))
+    preview_caption.caption(
+        f"Interpolated on a {len(surface.axes[0])}^{len(surface.paths)} grid ({surface.evaluations:,} model runs) over the growth rates and net profit margin. "
+        f"Exact {surface.year} prices: {', '.join(f'${human_format(p)}' for p in output['stock_price'][-1])}; "
+        f"price error {np.max(preview_error['stock_price']):.2%} now, {np.mean(preview_errors):.2%} mean and {np.max(preview_errors):.2%} max over {len(preview_errors)} reruns; "
+        f"market cap error {np.max(preview_error['market_cap']):.2%} now."
+    )
+
+# Display results for 2025 and 2035, and for the final year of longer horizons
+for year in [2025, 2035] + [year for year in years[-1:] if year > 2035]:
+    if year in output.years:
+        y = output.year_index(year)
+        timer.start('formatting')
+        df_product = styled_table(*output.formatted_table('product', y))
+        df_robotaxi = styled_table(*output.formatted_table('robotaxi', y))
+        df_revenue = styled_table(*output.formatted_table('revenue', y))
+        df_market = styled_table(*output.formatted_table('market', y))
+        timer.stop('formatting')
+
+        timer.start('rendering')
+        st.header(f"Year {year}")
         st.subheader("Product Valuation Results")
-        df_product = pd.DataFrame(result['product_valuation'])
-        for col in ['Revenue ($M)', 'Gross Profit ($M)', 'Operating Expenses ($M)']:
-            if col in df_product.columns:
-                df_product[col] = df_product[col].apply(lambda x: human_format(x * 1e6) if x != '-' and pd.notnull(x) else x)
-        # Format Units Sold as integer with commas
-        if 'Units Sold' in df_product.columns:
-            df_product['Units Sold'] = df_product['Units Sold'].apply(lambda x: f"{int(round(x)):,}" if x != '-' and pd.notnull(x) else x)
-        # Ensure columns with possible '-' are all strings for Streamlit compatibility
-        for col in ['Sale Price ($)', 'Units Sold', 'Gross Margin (%)', 'Revenue ($M)', 'Gross Profit ($M)', 'Operating Expenses ($M)']:
-            if col in df_product.columns:
-                df_product[col] = df_product[col].astype(str)
         st.dataframe(df_product)
         st.subheader("Robotaxi Network Earnings")
-        df_robotaxi = pd.DataFrame([result['robotaxi_network']])
-        for col in df_robotaxi.columns:
-            if any(unit in col for unit in ['($M)', 'per Year', 'Earnings', 'Revenue', 'Costs']):
-                df_robotaxi[col] = df_robotaxi[col].apply(lambda x: human_format(x * 1e6) if pd.notnull(x) and isinstance(x, (int, float)) else x)
-        # Convert all columns to string for compatibility
-        df_robotaxi = df_robotaxi.astype(str)
         st.dataframe(df_robotaxi)
         st.subheader("Total Company Revenue Breakdown")
-        df_revenue = pd.DataFrame(result['revenue_breakdown'])
-        if 'Revenue ($M)' in df_revenue.columns:
-            df_revenue['Revenue ($M)'] = df_revenue['Revenue ($M)'].apply(lambda x: human_format(x * 1e6) if pd.notnull(x) else x)
-        # Convert all columns to string for compatibility
-        df_revenue = df_revenue.astype(str)
         st.dataframe(df_revenue)
-        st.markdown(f"**Total Company Revenue:** ${human_format(result['total_revenue_million'] * 1e6)}")
+        st.markdown(f"**Total Company Revenue:** ${human_format(output['total_revenue'][y])}")
         st.subheader("Market Capitalization Results")
-        df_market = pd.DataFrame(result['market_cap'])
-        for col in ['Net Income ($M)', 'Market Cap ($B)', 'Stock Price ($)']:
-            if col in df_market.columns:
-                if col == 'Market Cap ($B)':
-                    df_market[col] = df_market[col].apply(lambda x: human_format(x * 1e9) if pd.notnull(x) else x)
-                elif col == 'Net Income ($M)':
-                    df_market[col] = df_market[col].apply(lambda x: human_format(x * 1e6) if pd.notnull(x) else x)
-                else:
-                    df_market[col] = df_market[col].apply(lambda x: human_format(x) if pd.notnull(x) else x)
-        # Convert all columns to string for compatibility
-        df_market = df_market.astype(str)
         st.dataframe(df_market)
+        timer.stop('rendering')
 
 
 
 # --- Graphs Section ---
 st.header("📈 Key Financial Graphs")
 
-years = [r['Year'] for r in output['yearly_results']]
-total_revenue = [r['total_revenue_million'] for r in output['yearly_results']]
-net_income = [r['market_cap'][0]['Net Income ($M)'] for r in output['yearly_results']]  # Using first scenario (e.g., Conservative)
-market_caps = {mc['Scenario']: [r['market_cap'][i]['Market Cap ($B)'] for r in output['yearly_results']] for i, mc in enumerate(output['yearly_results'][0]['market_cap'])}
+years = output.years
+total_revenue = output['total_revenue'] / 1e6
+net_income = output['net_income'] / 1e6  # Net income is the same in every P/E scenario
+market_caps = {scenario: output['market_cap'][:, s] / 1e9 for s, scenario in enumerate(output.scenarios)}
 
 # 1. Total Company Revenue Over Time
 st.subheader("Total Company Revenue Over Time")
@@ -499,14 +462,294 @@ st.line_chart({"Year": years, "Total Revenue ($M)": total_revenue})
 st.subheader("Net Income Over Time (Conservative Scenario)")
 st.line_chart({"Year": years, "Net Income ($M)": net_income})
 
-# 3. Market Cap Over Time (All Scenarios)
-st.subheader("Market Cap Over Time (All Scenarios)")
-fig = go.Figure()
-for scenario, values in market_caps.items():
-    fig.add_trace(go.Scatter(x=years, y=values, mode='lines+markers', name=scenario))
-fig.update_layout(xaxis_title="Year", yaxis_title="Market Cap ($B)")
-st.plotly_chart(fig, use_container_width=True)
-
+# Stock price per period (sub-annual granularity only); the tables above are annual roll-ups
+if user_inputs.get('periods_per_year', 1) > 1:
+    st.subheader(f"Stock Price by Period ({granularity})")
+    with timer.stage('charts'):
+        period_output = evaluate_periods(user_inputs)
+        period_fig = go.Figure()
+        for s, scenario in enumerate(period_output['scenarios']):
+            period_fig.add_trace(go.Scatter(x=period_output['periods'], y=period_output['stock_price'][:, s], mode='lines', name=scenario))
+        period_fig.update_layout(xaxis_title="Year", yaxis_title="Stock Price ($)")
+    st.plotly_chart(period_fig, use_container_width=True)
+
+# Robotaxi Network fleet by vintage (cohort model only)
+if 'cohort_vehicles' in output.arrays:
+    st.subheader("Robotaxi Network Fleet by Vintage")
+    fleet_fig = go.Figure()
+    for v, vintage in enumerate(years):
+        fleet_fig.add_trace(go.Bar(x=years, y=output['cohort_vehicles'][v], name=str(vintage)))
+    fleet_fig.update_layout(barmode='stack', xaxis_title="Year", yaxis_title="Vehicles in Service", legend_title="Vintage")
+    st.plotly_chart(fleet_fig, use_container_width=True)
+
+# 3. Market Cap Over Time (All Scenarios) next to 4. Sensitivity tornado
+chart_col, tornado_col = st.columns(2)
+with chart_col:
+    st.subheader("Market Cap Over Time (All Scenarios)")
+    with timer.stage('charts'):
+        fig = go.Figure()
+        for scenario, values in market_caps.items():
+            fig.add_trace(go.Scatter(x=years, y=values, mode='lines+markers', name=scenario))
+        fig.update_layout(xaxis_title="Year", yaxis_title="Market Cap ($B)")
+    st.plotly_chart(fig, use_container_width=True)
+
+with tornado_col:
+    st.subheader(f"Sensitivity of {years[-1]} Stock Price (±{sensitivity_pct}%)")
+    with timer.stage('sensitivity'):
+        sensitivity = one_at_a_time(user_inputs, sensitivity_pct / 100)
+    tornado_scenario = st.selectbox("P/E Scenario", sensitivity['scenarios'], index=min(1, len(sensitivity['scenarios']) - 1), key="tornado_scenario")
+    s_idx = sensitivity['scenarios'].index(tornado_scenario)
+    base_price = sensitivity['base'][s_idx]
+    # Largest swing on top
+    ranked = sensitivity['ranking'][:sensitivity_top, s_idx][::-1]
+    labels = [input_label(sensitivity['paths'][i]) for i in ranked]
+    with timer.stage('charts'):
+        tornado = go.Figure()
+        tornado.add_trace(go.Bar(y=labels, x=sensitivity['low'][ranked, s_idx] - base_price, base=base_price, orientation='h', name=f"-{sensitivity_pct}%"))
+        tornado.add_trace(go.Bar(y=labels, x=sensitivity['high'][ranked, s_idx] - base_price, base=base_price, orientation='h', name=f"+{sensitivity_pct}%"))
+        tornado.update_layout(barmode='overlay', xaxis_title="Stock Price ($)", height=max(400, 25 * len(labels)))
+    st.plotly_chart(tornado, use_container_width=True)
+    st.caption("Every assumption is perturbed, the P/E ratios (each moves only its own scenario) and base shares outstanding included; per-year overrides are not.")
+    with timer.stage('elasticities'):
+        gradients = elasticities(user_inputs, sensitivity['paths'])
+    with st.expander("Elasticities (Exact Derivatives)"):
+        top = gradients['ranking'][:sensitivity_top, s_idx]
+        st.dataframe(
+            pd.DataFrame({
+                'Input': [input_label(gradients['paths'][i]) for i in top],
+                'd Price / d Input': gradients['gradient'][top, s_idx],
+                'Elasticity (% per %)': gradients['elasticity'][top, s_idx],
+            }),
+            hide_index=True
+        )
+        st.caption(f"Local derivatives of the {years[-1]} {tornado_scenario} stock price from one complex-step evaluation, no finite differences.")
+
+
+# --- Monte Carlo Section ---
+if monte_carlo_enabled:
+    st.header("🎲 Monte Carlo Valuation")
+    with timer.stage('monte_carlo'):
+        # Chunks of the draws are sketched on the worker pool and merged as they come back
+        monte_carlo_parts = split_draws(monte_carlo_draws, max(1, min(20, monte_carlo_draws // 25_000)), monte_carlo_seed)
+        simulation = run_job(
+            'monte_carlo',
+            [(simulate_sketches, (user_inputs, monte_carlo_distributions, share, seed)) for share, seed in monte_carlo_parts],
+            lambda parts: summarize_sketches(user_inputs, merge_sketches(parts), monte_carlo_draws),
+            f"Simulating {monte_carlo_draws:,} draws...",
+        )
+    if simulation is not None:
+        st.caption(f"{simulation['draws']:,} draws over {len(monte_carlo_distributions)} uncertain assumptions; bands show the 5th-95th and 25th-75th percentiles (from quantile sketches, within 1%).")
+        mc_metrics = {
+            'Stock Price ($)': ('stock_price', 1),
+            'Market Cap ($B)': ('market_cap', 1e9),
+            'Net Income ($M)': ('net_income', 1e6),
+            'Total Revenue ($M)': ('revenue', 1e6)
+        }
+        mc_col1, mc_col2 = st.columns(2)
+        mc_metric = mc_col1.selectbox("Metric", list(mc_metrics))
+        mc_scenario = mc_col2.selectbox("P/E Scenario", simulation['scenarios'], index=min(1, len(simulation['scenarios']) - 1))
+        key, scale = mc_metrics[mc_metric]
+        bands = simulation[key] / scale
+        if bands.ndim == 3:
+            bands = bands[:, :, simulation['scenarios'].index(mc_scenario)]
+        mc_fig = go.Figure()
+        for low, high, label in [(0, 4, '5th-95th'), (1, 3, '25th-75th')]:
+            mc_fig.add_trace(go.Scatter(x=simulation['years'], y=bands[high], mode='lines', line=dict(width=0), showlegend=False, hoverinfo='skip'))
+            mc_fig.add_trace(go.Scatter(x=simulation['years'], y=bands[low], mode='lines', line=dict(width=0), fill='tonexty', fillcolor='rgba(31, 119, 180, 0.2)', name=label))
+        mc_fig.add_trace(go.Scatter(x=simulation['years'], y=bands[2], mode='lines+markers', name='Median'))
+        mc_fig.update_layout(xaxis_title="Year", yaxis_title=mc_metric)
+        st.plotly_chart(mc_fig, use_container_width=True)
+        st.subheader(f"Stock Price Percentiles ({simulation['years'][-1]})")
+        df_mc = pd.DataFrame(
+            simulation['stock_price'][:, -1, :].T,
+            index=simulation['scenarios'],
+            columns=[f"P{q}" for q in simulation['percentiles']]
+        )
+        df_mc['Mean'] = simulation['mean_stock_price'][-1]
+        st.dataframe(styled_table(df_mc, {col: human_format_array(df_mc[col]) for col in df_mc.columns}))
+        st.caption("Percentile bands of every year, P/E scenario and metric:")
+        arrow_downloads(lambda file_format: table_bytes(simulation_arrow(simulation), file_format), "monte_carlo", st.columns(2))
+
+
+# --- Parameter Sweep Section ---
+st.header("🗺️ Parameter Sweep")
+sweep_options = [path for path in flatten_inputs(user_inputs) if not path.startswith('override_values.')]
+sweep_col1, sweep_col2 = st.columns(2)
+sweep_axes = []
+for col, axis, default_path in [
+    (sweep_col1, 'X', 'robotaxi_network.vehicle_growth_rate'),
+    (sweep_col2, 'Y', 'pe_ratios.Current')
+]:
+    with col:
+        path = st.selectbox(f"{axis} Input", sweep_options, index=sweep_options.index(default_path) if default_path in sweep_options else 0, format_func=input_label, key=f"sweep_{axis}_path")
+        current = float(flatten_inputs(user_inputs)[path])
+        low = st.number_input(f"{axis} From", value=current * 0.5, key=f"sweep_{axis}_low_{path}")
+        high = st.number_input(f"{axis} To", value=current * 1.5 if current else 1.0, key=f"sweep_{axis}_high_{path}")
+        steps = st.slider(f"{axis} Steps", min_value=2, max_value=500, value=100, key=f"sweep_{axis}_steps")
+        sweep_axes.append((path, np.linspace(low, high, steps)))
+sweep_metric = st.radio("Sweep Metric", ["Stock Price ($)", "Market Cap ($B)"], horizontal=True)
+if st.button("Run Sweep"):
+    (x_path, x_values), (y_path, y_values) = sweep_axes
+    if x_path == y_path:
+        st.error("Pick two different inputs to sweep.")
+    else:
+        with timer.stage('sweep'):
+            # Bands of grid rows run on the worker pool
+            metric = 'stock_price' if sweep_metric == "Stock Price ($)" else 'market_cap'
+            sweep = run_job(
+                'sweep',
+                [(sweep_2d, (user_inputs, x_path, x_values, y_path, rows, metric)) for rows in np.array_split(y_values, min(len(y_values), 20))],
+                merge_sweeps,
+                f"Sweeping {len(x_values) * len(y_values):,} grid points...",
+            )
+        if sweep is not None:
+            st.session_state['sweep'] = sweep
+if 'sweep' in st.session_state:
+    sweep = st.session_state['sweep']
+    sweep_scenario = st.selectbox("P/E Scenario", sweep['scenarios'], index=min(1, len(sweep['scenarios']) - 1), key="sweep_scenario")
+    scale = 1e9 if sweep['metric'] == 'market_cap' else 1
+    heatmap = go.Figure(go.Heatmap(
+        x=sweep['x_values'],
+        y=sweep['y_values'],
+        z=sweep['values'][:, :, sweep['scenarios'].index(sweep_scenario)] / scale,
+        colorbar=dict(title="Market Cap ($B)" if scale != 1 else "Stock Price ($)")
+    ))
+    heatmap.update_layout(xaxis_title=input_label(sweep['x_path']), yaxis_title=input_label(sweep['y_path']), title=f"{sweep_scenario} scenario, {sweep['year']}")
+    st.plotly_chart(heatmap, use_container_width=True)
+    df_sweep = pd.DataFrame(sweep_table(sweep))
+    download_cols = st.columns(3)
+    download_cols[0].download_button("Download CSV", df_sweep.to_csv(index=False), file_name="sweep.csv", mime="text/csv")
+    arrow_downloads(lambda file_format: table_bytes(sweep_arrow(sweep), file_format), "sweep", download_cols[1:])
+
+# --- Global Sensitivity Section ---
+st.header("🌐 Global Sensitivity (Sobol Indices)")
+st.caption(f"Share of the variance of the {years[-1]} stock price explained by each input on its own (first order) and including its interactions (total), with every input varying uniformly over ±the range at once. Inputs are those of the tornado chart.")
+sobol_col1, sobol_col2 = st.columns(2)
+sobol_pct = sobol_col1.slider("Input Range (±%)", min_value=1, max_value=50, value=20, key="sobol_pct")
+sobol_n = sobol_col2.select_slider("Base Samples", options=[256, 512, 1024, 2048, 4096, 8192], value=1024, key="sobol_n")
+if st.button("Compute Sobol Indices"):
+    with timer.stage('sobol'):
+        configuration = {'user_inputs': user_inputs, 'pct': sobol_pct / 100, 'n': sobol_n}
+        sobol = get_sobol_cache().get(canonical_hash(configuration))
+        if sobol is None:
+            # Fixed seed so a configuration always maps to the same cached result
+            sobol = run_job('sobol', [(sobol_indices, (user_inputs, None, sobol_pct / 100, sobol_n, None, 0))], lambda parts: parts[0], "Computing Sobol indices...")
+            if sobol is not None:
+                get_sobol_cache().put(canonical_hash(configuration), sobol)
+        if sobol is not None:
+            st.session_state['sobol'] = sobol
+if 'sobol' in st.session_state:
+    sobol = st.session_state['sobol']
+    sobol_scenario = st.selectbox("P/E Scenario", sobol['scenarios'], index=min(1, len(sobol['scenarios']) - 1), key="sobol_scenario")
+    s_idx = sobol['scenarios'].index(sobol_scenario)
+    ranked = sobol['ranking'][:sensitivity_top, s_idx][::-1]
+    labels = [input_label(sobol['paths'][i]) for i in ranked]
+    sobol_fig = go.Figure()
+    sobol_fig.add_trace(go.Bar(y=labels, x=sobol['total'][ranked, s_idx], orientation='h', name="Total"))
+    sobol_fig.add_trace(go.Bar(y=labels, x=sobol['first_order'][ranked, s_idx], orientation='h', name="First Order"))
+    sobol_fig.update_layout(barmode='group', xaxis_title="Sobol Index", height=max(400, 30 * len(labels)))
+    st.plotly_chart(sobol_fig, use_container_width=True)
+    st.caption(f"{sobol['evaluations']:,} model runs ({sobol['n']:,} {sobol['sampler']} base samples); a gap between total and first order means the input acts through interactions.")
+
+# --- Goal Seek Section ---
+st.header("🎯 Goal Seek")
+goal_metrics = {
+    'Stock Price ($)': ('stock_price', 1),
+    'Market Cap ($B)': ('market_cap', 1e9),
+    'Net Income ($M)': ('net_income', 1e6),
+    'Total Revenue ($M)': ('total_revenue', 1e6)
+}
+goal_col1, goal_col2, goal_col3 = st.columns(3)
+goal_path = goal_col1.selectbox("Solve For", sweep_options, index=sweep_options.index('robotaxi_network.vehicle_growth_rate') if 'robotaxi_network.vehicle_growth_rate' in sweep_options else 0, format_func=input_label, key="goal_path")
+goal_metric = goal_col2.selectbox("Target Metric", list(goal_metrics), key="goal_metric")
+goal_year = goal_col3.selectbox("Target Year", user_inputs['years'], index=len(user_inputs['years']) - 1, key="goal_year")
+goal_targets_text = st.text_input("Target Values (comma-separated)", value="500, 1000, 2000")
+goal_scenarios = st.multiselect("P/E Scenarios", list(user_inputs['pe_ratios']), default=list(user_inputs['pe_ratios']), key="goal_scenarios")
+if st.button("Solve"):
+    try:
+        goal_targets = [float(v) for v in goal_targets_text.split(',') if v.strip()]
+    except ValueError:
+        st.error("Target values must be numbers separated by commas.")
+        goal_targets = []
+    if goal_targets and goal_scenarios:
+        metric_key, scale = goal_metrics[goal_metric]
+        with timer.stage('goal_seek'):
+            started = time.perf_counter()
+            solution = goal_seek(user_inputs, goal_path, np.array(goal_targets) * scale, metric=metric_key, year=goal_year, scenarios=goal_scenarios)
+            solution['elapsed_ms'] = (time.perf_counter() - started) * 1000
+        solution['scale'] = scale
+        st.session_state['goal_seek'] = solution
+if 'goal_seek' in st.session_state:
+    solution = st.session_state['goal_seek']
+    df_goal = pd.DataFrame(
+        solution['values'],
+        index=[f"{t / solution['scale']:,.2f}" for t in solution['targets']],
+        columns=solution['scenarios']
+    )
+    df_goal.index.name = f"Target ({solution['year']})"
+    st.caption(
+        f"{input_label(solution['path'])} required per target and P/E scenario. "
+        f"Solved in {solution['iterations']} iterations ({solution['evaluations']} batched evaluations, "
+        f"{solution['elapsed_ms']:.1f} ms); blank cells have no solution."
+    )
+    st.dataframe(df_goal)
+
+# --- Scenario Library Section ---
+with st.expander("📚 Scenario Library"):
+    library_columns = st.columns(3)
+    library_scenario = library_columns[0].selectbox("Rank by P/E Scenario", output.scenarios, index=output.scenarios.index('Current') if 'Current' in output.scenarios else 0)
+    library_year = library_columns[1].selectbox("Rank by Year", output.years[::-1])
+    library_tag = library_columns[2].selectbox("Tag", ['All'] + sorted({tag for saved in saved_scenarios for tag in saved['tags']}))
+    with timer.stage('library'):
+        top_scenarios = scenario_store.top(library_scenario, library_year, limit=50, tag=None if library_tag == 'All' else library_tag)
+    if top_scenarios:
+        df_top = pd.DataFrame(top_scenarios)
+        df_top['hash'] = df_top['hash'].str[:12]
+        df_top['market_cap'] = [human_format(value) for value in df_top['market_cap']]
+        st.dataframe(
+            df_top[['name', 'stock_price', 'market_cap', 'hash']].rename(columns={
+                'name': 'Name', 'stock_price': f'{library_year} Stock Price ($)', 'market_cap': 'Market Cap ($)', 'hash': 'Hash'
+            }),
+            hide_index=True
+        )
+    store_stats = scenario_store.stats()
+    st.caption(
+        f"Top {len(top_scenarios)} stored scenarios by {library_year} {library_scenario} P/E stock price. "
+        f"{store_stats['names']} names over {store_stats['scenarios']} distinct scenarios "
+        f"({store_stats['results']} with stored results) in {scenario_store.path}."
+    )
+
+with st.expander("Result Cache"):
+    cache_stats = result_cache.stats()
+    st.caption(
+        f"{cache_stats['size']}/{cache_stats['maxsize']} entries, "
+        f"{cache_stats['hits']} hits, {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['evictions']} evictions, "
+        f"{cache_stats['expirations']} expirations"
+    )
 
 st.header("JSON Output for Website (first and last years for brevity):")
-st.code(json.dumps([output['yearly_results'][0], output['yearly_results'][-1]], indent=4), language='json') 
\ No newline at end of file
+with timer.stage('json'):
+    website_json = json.dumps([output.year_result(0), output.year_result(-1)], indent=4)
+st.code(website_json, language='json')
+st.subheader("Full Results Export")
+export_table = st.selectbox(
+    "Table", ['market', 'products', 'network'],
+    format_func={'market': "Market (year × P/E scenario)", 'products': "Products (year × product)", 'network': "Robotaxi Network and totals (year)"}.get
+)
+with timer.stage('export'):
+    arrow_downloads(lambda file_format: output.export_bytes(export_table, file_format), f"valuation_{export_table}", st.columns(2))
+st.caption("The full payload is served as JSON by `python -m valuation.server` (POST user_inputs to /valuation).")
+
+# Per-stage timings of this rerun
+timing_record = timer.record(cache_hit=valuation_cache_hit)
+timing_log, stage_metrics = get_timing_sinks()
+stage_metrics.observe({**timing_record['stages'], 'total': timing_record['total_seconds']})
+if timing_log is not None:
+    timing_log.write(timing_record)
+with st.expander("Performance"):
+    df_timing = pd.DataFrame(
+        [(stage, seconds * 1000) for stage, seconds in timing_record['stages'].items()] + [('total', timing_record['total_seconds'] * 1000)],
+        columns=['Stage', 'Time (ms)']
+    )
+    st.dataframe(df_timing.round(2), hide_index=True) 
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""The batch runner evaluates scenarios in groups without letting one bad scenario fail the rest."""
+import io
+import json
+
+import numpy as np
+
+from valuation import default_user_inputs, evaluate
+from valuation.batch import _evaluate_grouped, main, read_csv
+from valuation.defaults import DEFAULT_FLEET_COHORTS
+
+
+def cohort_scenario(attrition_rate):
+    user_inputs = default_user_inputs()
+    user_inputs['fleet_cohorts'] = dict(DEFAULT_FLEET_COHORTS, attrition_rate=attrition_rate)
+    return user_inputs
+
+
+def enumerate_items(scenarios):
+    return [(index, f's{index}', user_inputs) for index, user_inputs in enumerate(scenarios)]
+
+
+def test_grouped_results_match_evaluate():
+    scenarios = [dict(default_user_inputs(), net_profit_margin=margin) for margin in (0.1, 0.15, 0.2)]
+    results = list(_evaluate_grouped(enumerate_items(scenarios)))
+    assert [(index, scenario_id) for index, scenario_id, _, _ in results] == [(0, 's0'), (1, 's1'), (2, 's2')]
+    for (_, _, user_inputs, arrays) in results:
+        np.testing.assert_array_equal(arrays['stock_price'], evaluate(user_inputs)['stock_price'])
+
+
+def test_bad_scenario_does_not_fail_its_group():
+    scenarios = [
+        default_user_inputs(),
+        dict(default_user_inputs(), net_profit_margin='abc'),
+        cohort_scenario(0.05),
+        cohort_scenario(1.0),
+        cohort_scenario(0.1),
+    ]
+    results = {index: arrays for index, _, _, arrays in _evaluate_grouped(enumerate_items(scenarios))}
+    assert isinstance(results[1], ValueError)
+    assert isinstance(results[3], ValueError) and 'attrition_rate' in str(results[3])
+    for index in (0, 2, 4):
+        np.testing.assert_array_equal(results[index]['stock_price'], evaluate(scenarios[index])['stock_price'])
+
+
+def test_cli_writes_an_error_record_only_for_the_bad_scenario(tmp_path, capsys):
+    good = default_user_inputs()
+    bad = dict(default_user_inputs(), net_profit_margin='abc')
+    path = tmp_path / 'scenarios.jsonl'
+    path.write_text('\n'.join(json.dumps(dict(scenario, id=name)) for name, scenario in (('good', good), ('bad', bad), ('good2', good))))
+    output = tmp_path / 'results.jsonl'
+    main([str(path), '-o', str(output), '--workers', '0', '--ordered', '--progress-interval', '0'])
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [record['id'] for record in records] == ['good', 'bad', 'good2']
+    assert 'error' in records[1] and 'yearly_results' not in records[1]
+    for record in (records[0], records[2]):
+        assert 'error' not in record and len(record['yearly_results']) == len(good['years'])
+
+
+def test_csv_rows_apply_paths_and_flags_to_the_base():
+    stream = io.StringIO("id,net_profit_margin,toggles.Cars\na,0.3,yes\n")
+    [(scenario_id, user_inputs)] = list(read_csv(stream, default_user_inputs()))
+    assert scenario_id == 'a'
+    assert user_inputs['net_profit_margin'] == 0.3
+    assert user_inputs['toggles']['Cars'] is True
@@ -0,0 +1,53 @@
+"""ResultCache keys, LRU eviction and expiry."""
+import numpy as np
+
+from valuation import default_user_inputs
+from valuation import cache as cache_module
+from valuation.cache import ResultCache, canonical_hash
+
+
+def test_hash_ignores_key_order_and_numpy_types():
+    user_inputs = default_user_inputs()
+    reordered = dict(reversed(list(user_inputs.items())))
+    assert canonical_hash(reordered) == canonical_hash(user_inputs)
+    assert canonical_hash(dict(user_inputs, net_profit_margin=np.float64(user_inputs['net_profit_margin']))) == canonical_hash(user_inputs)
+    assert canonical_hash(dict(user_inputs, net_profit_margin=0.31)) != canonical_hash(user_inputs)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1 and len(cache) == 2
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: now[0])
+    cache = ResultCache(ttl=10)
+    cache.put('a', 1)
+    now[0] += 5
+    assert cache.get('a') == 1
+    now[0] += 6
+    assert cache.get('a', 'missing') == 'missing'
+    assert cache.stats()['expirations'] == 1 and len(cache) == 0
+
+
+def test_get_or_compute_computes_once():
+    calls = []
+
+    def compute(user_inputs):
+        calls.append(user_inputs)
+        return len(calls)
+
+    cache = ResultCache()
+    user_inputs = default_user_inputs()
+    assert cache.get_or_compute(user_inputs, compute) == 1
+    assert cache.get_or_compute(default_user_inputs(), compute) == 1
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
@@ -0,0 +1,44 @@
+"""The cohort fleet model: vehicles by vintage on the network_vehicles path."""
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs, evaluate
+from valuation.defaults import DEFAULT_FLEET_COHORTS
+
+
+def scenario(**cohorts):
+    user_inputs = default_user_inputs()
+    user_inputs['fleet_cohorts'] = dict(DEFAULT_FLEET_COHORTS, **cohorts)
+    return user_inputs
+
+
+def test_fleet_follows_network_vehicles():
+    fleet_path = evaluate(default_user_inputs())['network_vehicles']
+    arrays = evaluate(scenario())
+    vehicles = arrays['cohort_vehicles']
+    np.testing.assert_allclose(vehicles.sum(axis=-2), arrays['network_vehicles'], rtol=1e-12)
+    np.testing.assert_allclose(arrays['network_vehicles'], fleet_path, rtol=1e-9)
+    # No vintage is in service before it is bought
+    assert not np.any(np.tril(vehicles, -1))
+
+
+def test_vintages_survive_attrition_and_retire_at_lifetime():
+    vehicles = evaluate(scenario(lifetime_years=4, attrition_rate=0.1))['cohort_vehicles']
+    bought = np.diag(vehicles)
+    # Vintage 0 at ages 1..3 keeps (1 - attrition) ** age of its purchase, then retires
+    np.testing.assert_allclose(vehicles[0, 1:4], bought[0] * 0.9 ** np.arange(1, 4), rtol=1e-12)
+    assert not np.any(np.triu(vehicles, 4))
+
+
+def test_young_vintages_ramp_up_utilization():
+    # A new network-wide rate, so only the age ramp differs between vintages
+    ramped = evaluate(scenario(ramp_years=3))
+    immediate = evaluate(scenario(ramp_years=1))
+    assert np.all(ramped['utilization_rate'] <= immediate['utilization_rate'] + 1e-15)
+    assert ramped['utilization_rate'][0] < immediate['utilization_rate'][0]
+
+
+@pytest.mark.parametrize('field, bad', [('lifetime_years', 0), ('attrition_rate', 1.0)])
+def test_rejects_singular_survival(field, bad):
+    with pytest.raises(ValueError, match=f'fleet_cohorts.{field}'):
+        evaluate(scenario(), {f'fleet_cohorts.{field}': np.array([DEFAULT_FLEET_COHORTS[field], bad])})
@@ -0,0 +1,58 @@
+"""Result tables hold one row per year and label, and Parquet and Arrow files read back unchanged."""
+import io
+
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs, evaluate
+from valuation.export import EXPORT_FORMATS, LABEL_COLUMNS, TABLE_METRICS, result_table, table_bytes, table_columns
+
+
+def test_market_rows_follow_years_and_scenarios():
+    arrays = evaluate(default_user_inputs())
+    columns, labels = table_columns(arrays, 'market')
+    n_years, n_scenarios = arrays['stock_price'].shape
+    assert labels == {'scenario': tuple(arrays['scenarios'])}
+    row = 3 * n_scenarios + 2
+    assert columns['year'][row] == arrays['years'][3] and columns['scenario'][row] == 2
+    assert columns['stock_price'][row] == arrays['stock_price'][3, 2]
+    assert columns['net_income'][row] == arrays['net_income'][3]
+    assert all(len(values) == n_years * n_scenarios for values in columns.values())
+
+
+def test_batched_tables_carry_batch_index_and_inputs():
+    margins = np.array([0.1, 0.2, 0.3])
+    arrays = evaluate(default_user_inputs(), {'net_profit_margin': margins})
+    columns, _ = table_columns(arrays, 'products', {'net_profit_margin': margins})
+    rows = len(arrays['products']) * len(arrays['years'])
+    assert list(columns)[:2] == ['batch', 'net_profit_margin']
+    np.testing.assert_array_equal(columns['batch'], np.repeat(np.arange(3), rows))
+    np.testing.assert_array_equal(columns['net_profit_margin'], np.repeat(margins, rows))
+    np.testing.assert_array_equal(columns['revenue'], arrays['revenue'].reshape(-1))
+
+
+def test_unknown_table_is_rejected():
+    with pytest.raises(ValueError):
+        table_columns(evaluate(default_user_inputs()), 'balance_sheet')
+
+
+@pytest.mark.parametrize('format', list(EXPORT_FORMATS))
+@pytest.mark.parametrize('table', list(TABLE_METRICS))
+def test_files_round_trip(table, format):
+    pa = pytest.importorskip('pyarrow')
+    arrays = evaluate(default_user_inputs())
+    written = result_table(arrays, table)
+    assert written.column_names == ['year', *LABEL_COLUMNS[table], *TABLE_METRICS[table]]
+    data = table_bytes(written, format)
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+        read = pq.read_table(io.BytesIO(data))
+    else:
+        read = pa.ipc.open_file(pa.BufferReader(data)).read_all()
+    assert read.schema.equals(written.schema)
+    for name in LABEL_COLUMNS[table]:
+        assert pa.types.is_dictionary(read.schema.field(name).type)
+        assert read[name].to_pylist() == written[name].to_pylist()
+    # Revenue-based products hold NaN units, which Table.equals does not match
+    for name in ('year', *TABLE_METRICS[table]):
+        np.testing.assert_array_equal(read[name].to_numpy(), written[name].to_numpy(), err_msg=name)
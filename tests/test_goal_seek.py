@@ -0,0 +1,46 @@
+"""Goal seek solves an input for target metrics, checked by evaluating the solution."""
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs, evaluate, expand_inputs
+from valuation.goal_seek import goal_seek
+
+
+def evaluate_at(user_inputs, path, value):
+    return evaluate(expand_inputs(user_inputs, {path: value}))
+
+
+def test_solved_values_hit_each_target_and_scenario():
+    user_inputs = default_user_inputs()
+    base = evaluate(user_inputs)['stock_price'][-1]
+    targets = [0.5 * base.min(), 2 * base.max()]
+    result = goal_seek(user_inputs, 'net_profit_margin', targets)
+    assert result['converged'].all() and result['values'].shape == (2, len(user_inputs['pe_ratios']))
+    for t, target in enumerate(targets):
+        for s in range(len(result['scenarios'])):
+            price = evaluate_at(user_inputs, result['path'], result['values'][t, s])['stock_price'][-1, s]
+            assert price == pytest.approx(target, rel=1e-8)
+
+
+def test_other_metrics_years_and_scenarios():
+    user_inputs = default_user_inputs()
+    year = user_inputs['years'][3]
+    # Revenue compounds with the growth rate, so Newton takes several steps
+    target = 1.2 * evaluate(user_inputs)['total_revenue'][3]
+    result = goal_seek(user_inputs, 'products.Cars.growth_rate', target, metric='total_revenue', year=year, scenarios=['Current'])
+    assert result['converged'].all() and result['year'] == year and result['iterations'] > 1
+    arrays = evaluate_at(user_inputs, 'products.Cars.growth_rate', result['values'][0, 0])
+    assert arrays['total_revenue'][3] == pytest.approx(target, rel=1e-8)
+
+
+def test_unreachable_target_is_not_converged():
+    # No margin in the bracket makes net income negative enough
+    result = goal_seek(default_user_inputs(), 'net_profit_margin', -1e12, metric='net_income', bracket=(0, 1))
+    assert not result['converged'].any() and np.isnan(result['values']).all()
+
+
+def test_rejects_unknown_metric_and_path():
+    with pytest.raises(ValueError):
+        goal_seek(default_user_inputs(), 'net_profit_margin', 1, metric='dividends')
+    with pytest.raises(KeyError):
+        goal_seek(default_user_inputs(), 'no.such.path', 1)
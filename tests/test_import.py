@@ -0,0 +1,34 @@
+"""Importing the engine stays cheap and free of front-end dependencies."""
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_MS = 500
+FRONT_END_MODULES = ('streamlit', 'plotly', 'pandas')
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import valuation
+elapsed = time.perf_counter() - started
+print(json.dumps({'ms': elapsed * 1000, 'modules': sorted(name.split('.')[0] for name in sys.modules)}))
+"""
+
+
+def _import_valuation():
+    """Import time (ms) and top-level modules loaded by `import valuation` in a fresh interpreter."""
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def test_import_loads_no_front_end():
+    modules = set(_import_valuation()['modules'])
+    assert not modules & set(FRONT_END_MODULES)
+
+
+def test_import_time_budget():
+    # Best of three, so one slow start on a busy machine does not fail the run
+    fastest = min(_import_valuation()['ms'] for _ in range(3))
+    assert fastest < IMPORT_BUDGET_MS, f"import valuation took {fastest:.0f} ms, budget {IMPORT_BUDGET_MS} ms"
@@ -0,0 +1,85 @@
+"""Per-year override points and growth curves, and their incremental recomputation."""
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs, evaluate, reevaluate
+from valuation.defaults import DEFAULT_FLEET_COHORTS
+
+CURVES = {
+    'Cars': {'values': {2028: 3_000_000}, 'growth_rates': {2030: 0.12, 2033: 0.02}},
+    'Energy': {'values': {}, 'growth_rates': {2027: 0.4, 2031: 0.1}},
+    'Robotaxi Network': {'values': {2029: 2_000_000}, 'growth_rates': {2032: 0.15}},
+}
+
+
+def scenario(cohorts=False):
+    user_inputs = default_user_inputs()
+    user_inputs['toggles'] = {key: True for key in user_inputs['toggles']}
+    user_inputs['override_flags'] = {'Services': True}
+    user_inputs['override_values'] = {'Services': 25_000}
+    user_inputs['overrides'] = {target: {kind: dict(points) for kind, points in curve.items()} for target, curve in CURVES.items()}
+    if cohorts:
+        user_inputs['fleet_cohorts'] = dict(DEFAULT_FLEET_COHORTS)
+    return user_inputs
+
+
+def test_level_and_rate_points():
+    arrays = evaluate(scenario())
+    years = list(arrays['years'])
+    cars = arrays['units_sold'][arrays['products'].index('Cars')]
+    base = default_user_inputs()['products']['Cars']
+    # Before the level point the base rate applies; from it the level is pinned and compounds
+    assert cars[years.index(2027)] == pytest.approx(base['units_sold'] * (1 + base['growth_rate']) ** 2)
+    assert cars[years.index(2028)] == 3_000_000
+    assert cars[years.index(2029)] == pytest.approx(3_000_000 * (1 + base['growth_rate']))
+    # A rate point applies from the step into its year
+    assert cars[years.index(2030)] == pytest.approx(cars[years.index(2029)] * 1.12)
+    assert cars[years.index(2033)] == pytest.approx(cars[years.index(2032)] * 1.02)
+    assert arrays['network_vehicles'][years.index(2029)] == 2_000_000
+
+
+def test_override_points_are_batchable_inputs():
+    values = np.array([1_000_000, 2_000_000, 4_000_000])
+    batched = evaluate(scenario(), {'overrides.Cars.values.2028': values})
+    for i, value in enumerate(values):
+        user_inputs = scenario()
+        user_inputs['overrides']['Cars']['values'][2028] = value
+        np.testing.assert_array_equal(batched['stock_price'][i], evaluate(user_inputs)['stock_price'])
+
+
+def edited_curves(cohorts):
+    """Override edits reevaluate() handles incrementally: moved, added and removed points on several targets."""
+    edits = []
+    for target, kind, year, value in (
+        ('Cars', 'growth_rates', 2033, 0.08),
+        ('Cars', 'values', 2031, 4_000_000),
+        ('Energy', 'growth_rates', 2029, 0.25),
+        ('Robotaxi Network', 'values', 2029, 2_500_000),
+        ('Robotaxi Network', 'growth_rates', 2026, 0.9),
+    ):
+        user_inputs = scenario(cohorts)
+        user_inputs['overrides'][target][kind][year] = value
+        edits.append(user_inputs)
+    removed = scenario(cohorts)
+    del removed['overrides']['Cars']['growth_rates'][2030]
+    added = scenario(cohorts)
+    added['overrides']['Optimus'] = {'values': {2030: 5_000}, 'growth_rates': {2031: 0.3, 2034: 0.1}}
+    return edits + [removed, added]
+
+
+@pytest.mark.parametrize('cohorts', [False, True])
+def test_reevaluate_override_curves(cohorts):
+    base = scenario(cohorts)
+    arrays = evaluate(base)
+    for new_user_inputs in edited_curves(cohorts):
+        expected = evaluate(new_user_inputs)
+        # Recomputing from the first edited year repeats the full run's operations exactly
+        for key, value in reevaluate(base, arrays, new_user_inputs).items():
+            if isinstance(value, np.ndarray):
+                np.testing.assert_array_equal(value, expected[key], err_msg=key)
+
+
+def test_reevaluate_falls_back_for_other_changes():
+    base = scenario()
+    changed = dict(scenario(), net_profit_margin=0.3)
+    np.testing.assert_array_equal(reevaluate(base, evaluate(base), changed)['stock_price'], evaluate(changed)['stock_price'])
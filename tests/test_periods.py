@@ -0,0 +1,79 @@
+"""Quarterly and monthly periods: evaluate_periods() and its roll-up into the annual arrays."""
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs, evaluate, evaluate_periods, rollup
+from valuation.defaults import DEFAULT_FLEET_COHORTS
+
+CURVES = {
+    'Cars': {'values': {2028: 3_000_000}, 'growth_rates': {2030: 0.12, 2033: 0.02}},
+    'Energy': {'values': {}, 'growth_rates': {2027: 0.4, 2031: 0.1}},
+    'Robotaxi Network': {'values': {2029: 2_000_000}, 'growth_rates': {2032: 0.15}},
+}
+
+
+def scenario(cohorts=False, overrides=False, periods_per_year=1):
+    user_inputs = default_user_inputs()
+    user_inputs['toggles'] = {key: True for key in user_inputs['toggles']}
+    if cohorts:
+        user_inputs['fleet_cohorts'] = dict(DEFAULT_FLEET_COHORTS)
+    if overrides:
+        user_inputs['override_flags'] = {'Services': True}
+        user_inputs['override_values'] = {'Services': 25_000}
+        user_inputs['overrides'] = {target: {kind: dict(points) for kind, points in curve.items()} for target, curve in CURVES.items()}
+    if periods_per_year > 1:
+        user_inputs['periods_per_year'] = periods_per_year
+    return user_inputs
+
+
+def assert_arrays_close(actual, expected, rtol=1e-12):
+    for key, value in expected.items():
+        if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+            np.testing.assert_allclose(actual[key], value, rtol=rtol, atol=0, err_msg=key)
+
+
+@pytest.mark.parametrize('cohorts', [False, True])
+@pytest.mark.parametrize('overrides', [False, True])
+@pytest.mark.parametrize('periods_per_year', [1, 4, 12])
+def test_rollup_matches_evaluate(cohorts, overrides, periods_per_year):
+    user_inputs = scenario(cohorts, overrides, periods_per_year)
+    params = {'net_profit_margin': np.array([0.1, 0.2]), 'products.Cars.growth_rate': np.array([[0.05], [0.2]])}
+    periods = evaluate_periods(user_inputs, params)
+    assert periods['stock_price'].shape == (2, 2, 11 * periods_per_year, 4)
+    assert_arrays_close(rollup(periods), evaluate(user_inputs, params))
+
+
+@pytest.mark.parametrize('overrides', [False, True])
+def test_annual_periods_are_evaluate(overrides):
+    user_inputs = scenario(overrides=overrides)
+    periods = evaluate_periods(user_inputs)
+    np.testing.assert_array_equal(periods['periods'], user_inputs['years'])
+    for key, value in evaluate(user_inputs).items():
+        if isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(periods[key], value, err_msg=key)
+
+
+@pytest.mark.parametrize('periods_per_year', [4, 12])
+def test_period_levels_start_each_year_on_the_annual_path(periods_per_year):
+    annual = evaluate(scenario())
+    periods = evaluate_periods(scenario(periods_per_year=periods_per_year))
+    # Levels compound period by period, so allow for the rounding of a cumulative product
+    for key in ('network_vehicles', 'shares_outstanding'):
+        np.testing.assert_allclose(periods[key][..., ::periods_per_year], annual[key], rtol=1e-10, err_msg=key)
+    # units_sold is a flow: each period holds its share of the annual rate
+    np.testing.assert_allclose(periods['units_sold'][..., ::periods_per_year] * periods_per_year, annual['units_sold'], rtol=1e-10)
+
+
+@pytest.mark.parametrize('periods_per_year', [4, 12])
+def test_periods_start_at_fractional_years(periods_per_year):
+    user_inputs = scenario(periods_per_year=periods_per_year)
+    periods = evaluate_periods(user_inputs)['periods']
+    assert len(periods) == len(user_inputs['years']) * periods_per_year
+    np.testing.assert_allclose(periods[:periods_per_year], user_inputs['years'][0] + np.arange(periods_per_year) / periods_per_year)
+
+
+def test_quarterly_cohort_fleet_follows_network_vehicles():
+    fleet_path = evaluate_periods(scenario(periods_per_year=4))['network_vehicles']
+    cohorts = evaluate_periods(scenario(cohorts=True, periods_per_year=4))
+    np.testing.assert_allclose(cohorts['cohort_vehicles'].sum(axis=-2), cohorts['network_vehicles'], rtol=1e-12)
+    np.testing.assert_allclose(cohorts['network_vehicles'], fleet_path, rtol=1e-9)
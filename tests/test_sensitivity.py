@@ -0,0 +1,62 @@
+"""One-at-a-time, derivative and Sobol sensitivity of the final-year stock price."""
+import numpy as np
+
+from valuation import default_user_inputs, evaluate, expand_inputs, flatten_inputs
+from valuation.sensitivity import elasticities, one_at_a_time, sensitivity_paths, sobol_indices
+
+
+def test_perturbed_prices_match_evaluate():
+    user_inputs = default_user_inputs()
+    flat = flatten_inputs(user_inputs)
+    paths = ['net_profit_margin', 'products.Cars.sale_price', 'robotaxi_network.vehicle_growth_rate']
+    result = one_at_a_time(user_inputs, pct=0.2, paths=paths)
+    np.testing.assert_allclose(result['base'], evaluate(user_inputs)['stock_price'][-1], rtol=1e-12)
+    for i, path in enumerate(paths):
+        for key, factor in (('low', 0.8), ('high', 1.2)):
+            expected = evaluate(expand_inputs(user_inputs, {path: flat[path] * factor}))['stock_price'][-1]
+            np.testing.assert_allclose(result[key][i], expected, rtol=1e-12, err_msg=f'{path} {key}')
+
+
+def test_ranking_orders_paths_by_swing():
+    result = one_at_a_time(default_user_inputs())
+    assert result['low'].shape == result['high'].shape == (len(result['paths']), len(result['scenarios']))
+    for s in range(len(result['scenarios'])):
+        swings = result['swing'][result['ranking'][:, s], s]
+        assert np.all(np.diff(swings) <= 0)
+    # The margin scales net income, and with it every price, one for one
+    margin = result['paths'].index('net_profit_margin')
+    np.testing.assert_allclose(result['high'][margin] / result['base'], 1.1, rtol=1e-9)
+
+
+def test_default_paths_include_valuation_multiples_and_share_count():
+    user_inputs = default_user_inputs()
+    paths = sensitivity_paths(user_inputs)
+    assert 'base_shares_outstanding' in paths
+    assert [f'pe_ratios.{scenario}' for scenario in user_inputs['pe_ratios']] == [path for path in paths if path.startswith('pe_ratios.')]
+    assert not any(path.startswith(('override_values.', 'overrides.')) for path in paths)
+    result = one_at_a_time(user_inputs)
+    # A P/E ratio moves the price of its own scenario only, in proportion
+    current = list(user_inputs['pe_ratios']).index('Current')
+    swing = result['swing'][paths.index('pe_ratios.Current')]
+    np.testing.assert_allclose(swing[current], 0.2 * result['base'][current], rtol=1e-9)
+    assert np.all(np.delete(swing, current) == 0)
+
+
+def test_sobol_indices_of_a_product():
+    # The price is proportional to the margin and to each scenario's P/E ratio
+    user_inputs = default_user_inputs()
+    sobol = sobol_indices(user_inputs, paths=['net_profit_margin', 'pe_ratios.Current'], n=2048, seed=0)
+    current = sobol['scenarios'].index('Current')
+    others = [s for s in range(len(sobol['scenarios'])) if s != current]
+    np.testing.assert_allclose(sobol['first_order'][0, others], 1, atol=1e-9)
+    np.testing.assert_allclose(sobol['total'][1, others], 0, atol=1e-12)
+    # Equal relative ranges contribute about equally to the product
+    np.testing.assert_allclose(sobol['total'][:, current], 0.5, atol=0.05)
+
+
+def test_elasticities_of_multiples_and_share_count():
+    user_inputs = default_user_inputs()
+    result = elasticities(user_inputs, ['pe_ratios.Current', 'base_shares_outstanding'])
+    current = result['scenarios'].index('Current')
+    np.testing.assert_allclose(result['elasticity'][0], np.eye(len(result['scenarios']))[current], atol=1e-12)
+    np.testing.assert_allclose(result['elasticity'][1], -1, rtol=1e-9)
@@ -0,0 +1,88 @@
+"""The HTTP API answers every request, and one failing entry of a batch does not fail the others."""
+import asyncio
+import json
+
+from valuation import default_user_inputs, run_valuation
+from valuation.server import ValuationServer
+
+
+def serve(requests, **kwargs):
+    """(status, body) for each raw HTTP request, sent one per connection to a fresh server."""
+    async def run():
+        server = ValuationServer(workers=1, **kwargs)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        port = listener.sockets[0].getsockname()[1]
+
+        async def send(request):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            head, _, body = response.partition(b'\r\n\r\n')
+            return int(head.split()[1]), body
+
+        try:
+            return await asyncio.gather(*(send(request) for request in requests))
+        finally:
+            listener.close()
+            server.close()
+
+    return asyncio.run(run())
+
+
+def post(payload, path='/valuation'):
+    body = json.dumps(payload).encode('utf-8')
+    return f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+
+
+def get(path):
+    return f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode('latin-1')
+
+
+def test_single_valuation_matches_run_valuation():
+    [(status, body)] = serve([post(default_user_inputs())])
+    assert status == 200
+    assert json.loads(body) == json.loads(json.dumps(run_valuation(default_user_inputs())))
+
+
+def test_mixed_batch_keeps_the_valid_entry():
+    good = default_user_inputs()
+    bad = dict(default_user_inputs(), net_profit_margin='abc')
+    [(status, body)] = serve([post([good, bad, good])])
+    assert status == 200
+    results = json.loads(body)
+    assert 'error' in results[1]
+    for result in (results[0], results[2]):
+        assert 'error' not in result and len(result['yearly_results']) == len(good['years'])
+
+
+def test_concurrent_failing_requests_all_get_answers():
+    good = default_user_inputs()
+    bad = dict(default_user_inputs(), years='x')
+    responses = serve([post([bad]), post([good, bad]), post(bad)])
+    assert [status for status, _ in responses] == [200, 200, 400]
+    assert 'error' in json.loads(responses[0][1])[0]
+    batch = json.loads(responses[1][1])
+    assert 'yearly_results' in batch[0] and 'error' in batch[1]
+
+
+def test_errors_and_routes():
+    responses = serve([post(default_user_inputs(), '/nope'), get('/valuation'), post('text'), get('/health'), get('/stats')])
+    assert [status for status, _ in responses] == [405, 405, 400, 200, 200]
+    assert json.loads(responses[3][1]) == {'status': 'ok'}
+    assert 'cache' in json.loads(responses[4][1])
+
+
+def test_oversized_body_is_rejected():
+    [(status, _)] = serve([post(default_user_inputs())], max_body=100)
+    assert status == 413
+
+
+def test_unexpected_errors_answer_500(monkeypatch):
+    async def broken(self, method, path, body):
+        raise KeyError('boom')
+
+    monkeypatch.setattr(ValuationServer, 'route', broken)
+    [(status, body)] = serve([get('/health')])
+    assert status == 500 and 'KeyError' in json.loads(body)['error']
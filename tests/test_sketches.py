@@ -0,0 +1,84 @@
+"""QuantileSketch quantiles stay within relative_accuracy of the exact ones, in memory independent of the draws."""
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs
+from valuation.monte_carlo import _chunks, simulate, simulate_sketches
+from valuation.sketches import QuantileSketch
+
+QUANTILES = np.linspace(0, 1, 41)
+
+
+def assert_within_accuracy(sketch, values):
+    # The sketch answers with a value of rank floor(q * (n - 1)), as np.quantile's 'lower' method
+    exact = np.quantile(values, QUANTILES, axis=0, method='lower')
+    error = np.abs(sketch.quantile(QUANTILES).reshape(len(QUANTILES), -1) - exact)
+    assert np.all(error <= sketch.relative_accuracy * np.abs(exact) * (1 + 1e-9))
+
+
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.001])
+def test_quantiles_within_relative_accuracy(relative_accuracy):
+    rng = np.random.default_rng(0)
+    # Cells with wide positive, mixed-sign and narrow distributions
+    values = np.stack([rng.lognormal(10, 4, 20_000), rng.normal(0, 1e6, 20_000), rng.uniform(99, 101, 20_000)], axis=-1)
+    sketch = QuantileSketch((3,), relative_accuracy=relative_accuracy)
+    sketch.add(values)
+    assert_within_accuracy(sketch, values)
+
+
+def test_merged_sketches_within_relative_accuracy():
+    rng = np.random.default_rng(1)
+    values = rng.lognormal(0, 3, (30_000, 2, 2))
+    parts = [QuantileSketch((2, 2)) for _ in range(3)]
+    for part, chunk in zip(parts, np.array_split(values, 3)):
+        part.add(chunk)
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    assert merged.count.sum() == values.size
+    assert_within_accuracy(merged, values.reshape(len(values), -1))
+
+
+def test_simulated_stock_price_quantiles():
+    user_inputs = default_user_inputs()
+    distributions = {
+        'net_profit_margin': {'dist': 'uniform', 'low': 0.05, 'high': 0.25},
+        'robotaxi_network.vehicle_growth_rate': {'dist': 'normal', 'mean': 0.5, 'std': 0.1},
+    }
+    sketches = simulate_sketches(user_inputs, distributions, 20_000, seed=3, chunk_size=7_000)
+    # The same draws, kept and evaluated in full
+    chunks = _chunks(user_inputs, distributions, 20_000, np.random.default_rng(3), 7_000)
+    stock_price = np.concatenate([arrays['stock_price'] for _, arrays in chunks])
+    assert_within_accuracy(sketches['stock_price'], stock_price.reshape(len(stock_price), -1))
+
+
+def test_memory_does_not_grow_with_draws():
+    rng = np.random.default_rng(2)
+    sketch = QuantileSketch((4,))
+    sketch.add(rng.lognormal(0, 2, (1_000, 4)))
+    nbytes = sketch.nbytes
+    for _ in range(10):
+        sketch.add(rng.lognormal(0, 2, (10_000, 4)))
+    assert sketch.nbytes == nbytes
+    assert sketch.count.sum() == 101_000 * 4
+
+
+def test_moments_match_the_draws():
+    values = np.random.default_rng(4).normal(50, 10, (50_000, 3))
+    parts = [QuantileSketch((3,)) for _ in range(2)]
+    for part, chunk in zip(parts, np.array_split(values, 2)):
+        part.add(chunk)
+    merged = parts[0].merge(parts[1])
+    np.testing.assert_allclose(merged.mean, values.mean(axis=0), rtol=1e-12)
+    np.testing.assert_allclose(merged.std, values.std(axis=0, ddof=1), rtol=1e-9)
+    np.testing.assert_array_equal(merged.min, values.min(axis=0))
+    np.testing.assert_array_equal(merged.max, values.max(axis=0))
+
+
+def test_sketch_bands_match_exact_bands():
+    user_inputs = default_user_inputs()
+    distributions = {'net_profit_margin': {'dist': 'triangular', 'low': 0.05, 'mode': 0.15, 'high': 0.3}}
+    exact = simulate(user_inputs, distributions, 20_000, seed=5, method='exact')
+    sketched = simulate(user_inputs, distributions, 20_000, seed=5, method='sketch')
+    assert sketched['method'] == 'sketch' and sketched['sketches'] is not None
+    for metric in ('revenue', 'net_income', 'market_cap', 'stock_price'):
+        # 1% from the sketch, plus interpolation between neighbouring draws and float32 storage in the exact bands
+        np.testing.assert_allclose(sketched[metric], exact[metric], rtol=0.015, err_msg=metric)
@@ -0,0 +1,61 @@
+"""The scenario store keeps inputs once by hash, with results that read back without recomputation."""
+import json
+
+import numpy as np
+import pytest
+
+from valuation import default_user_inputs, evaluate, run_valuation
+from valuation.store import ScenarioStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ScenarioStore(str(tmp_path / 'scenarios.db'))
+    yield store
+    store.close()
+
+
+def margin_scenario(margin):
+    return dict(default_user_inputs(), net_profit_margin=margin)
+
+
+def test_results_round_trip(store):
+    user_inputs = default_user_inputs()
+    arrays = evaluate(user_inputs)
+    key = store.put(user_inputs, arrays, name='base', tags=('demo',))
+    assert store.has_result(key) and store.load('base') == json.loads(json.dumps(user_inputs))
+    for name, value in store.arrays(user_inputs).items():
+        if isinstance(value, np.ndarray):
+            np.testing.assert_array_equal(value, arrays[name], err_msg=name)
+    assert store.yearly_results(key) == json.loads(json.dumps(run_valuation(user_inputs)))
+
+
+def test_get_or_compute_stores_once(store, monkeypatch):
+    user_inputs = margin_scenario(0.2)
+    first = store.get_or_compute(user_inputs)
+    monkeypatch.setattr('valuation.store.evaluate', lambda user_inputs: pytest.fail("recomputed a stored scenario"))
+    assert store.get_or_compute(margin_scenario(0.2)) == first
+    assert store.stats() == {'scenarios': 1, 'results': 1, 'names': 0}
+
+
+def test_top_ranks_stored_prices(store):
+    margins = [0.1, 0.3, 0.2]
+    for i, margin in enumerate(margins):
+        user_inputs = margin_scenario(margin)
+        store.put(user_inputs, evaluate(user_inputs), name=f's{i}', tags=('wide',) if margin != 0.2 else ())
+    ranked = store.top('Current', limit=2)
+    assert [row['name'] for row in ranked] == ['s1', 's2']
+    assert ranked[0]['year'] == default_user_inputs()['years'][-1]
+    assert ranked[0]['stock_price'] == evaluate(margin_scenario(0.3))['stock_price'][-1, 1]
+    assert [row['name'] for row in store.top('Current', tag='wide', ascending=True)] == ['s0', 's1']
+
+
+def test_names_and_tags(store):
+    key = store.put(default_user_inputs(), name='a')
+    store.tag(key, 'x', 'y')
+    assert [(row['name'], row['tags']) for row in store.saved()] == [('a', ['x', 'y'])]
+    assert store.saved(tag='z') == []
+    store.delete('a')
+    with pytest.raises(KeyError):
+        store.load('a')
+    assert store.stats()['scenarios'] == 1 and not store.has_result(key)
@@ -0,0 +1,37 @@
+"""The preview surface interpolates final-year prices for the scenarios it covers."""
+import numpy as np
+
+from valuation import default_user_inputs, evaluate, expand_inputs
+from valuation.surface import ResponseSurface, fixed_inputs, timed_evaluate
+
+PATHS = ['net_profit_margin', 'products.Cars.growth_rate']
+
+
+def test_grid_points_are_exact_and_cells_close():
+    user_inputs = default_user_inputs()
+    surface = ResponseSurface(user_inputs, PATHS)
+    corner = expand_inputs(user_inputs, {path: axis[-1] for path, axis in zip(PATHS, surface.axes)})
+    inside = expand_inputs(user_inputs, {'products.Cars.growth_rate': surface.axes[1][1] + 0.01})
+    for scenario, rtol in ((user_inputs, 1e-12), (corner, 1e-12), (inside, 1e-2)):
+        assert surface.covers(scenario)
+        exact = evaluate(scenario)
+        for metric, values in surface.predict(scenario).items():
+            np.testing.assert_allclose(values, exact[metric][-1], rtol=rtol, err_msg=metric)
+
+
+def test_covers_only_the_grid_and_its_fixed_inputs():
+    user_inputs = default_user_inputs()
+    surface = ResponseSurface(user_inputs, PATHS)
+    assert not surface.covers(dict(user_inputs, net_profit_margin=surface.axes[0][-1] * 1.01))
+    assert not surface.covers(dict(user_inputs, shares_growth_rate=0.02))
+    moved = dict(user_inputs, net_profit_margin=user_inputs['net_profit_margin'] * 3)
+    assert fixed_inputs(moved) == fixed_inputs(user_inputs)
+    # The default paths are every growth rate and the margin
+    assert fixed_inputs(dict(user_inputs, shares_growth_rate=0.02)) == fixed_inputs(user_inputs)
+    assert fixed_inputs(expand_inputs(user_inputs, {'products.Cars.sale_price': 40_000})) != fixed_inputs(user_inputs)
+
+
+def test_timed_evaluate():
+    arrays, seconds = timed_evaluate(default_user_inputs())
+    np.testing.assert_array_equal(arrays['stock_price'], evaluate(default_user_inputs())['stock_price'])
+    assert seconds > 0
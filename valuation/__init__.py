@@ -0,0 +1,21 @@
+"""Tesla valuation engine.
+
+Importing this package only loads NumPy; Streamlit, Plotly and pandas are never
+imported on the compute path. Analyses live in submodules (monte_carlo,
+sensitivity, sweep, goal_seek, cache, universe) and are imported on demand.
+"""
+from .defaults import default_user_inputs
+from .engine import (
+    GRANULARITIES,
+    evaluate,
+    evaluate_periods,
+    expand_inputs,
+    flatten_inputs,
+    reevaluate,
+    rollup,
+    run_valuation,
+    segment_kind,
+    select_batch,
+    to_yearly_results,
+)
+from .result import ValuationResult, compute_valuation
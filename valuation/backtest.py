@@ -0,0 +1,211 @@
+"""Backtest the model against historical snapshots stored locally.
+
+    python -m valuation.backtest --write-demo history/ --days 11000
+    python -m valuation.backtest history/ --base base.json --every 5 --start 2000-01-01
+
+Snapshots are columns with one row per date: 'date', the realized share 'price', and
+any dotted input paths (see flatten_inputs) known on that date, e.g.
+'base_shares_outstanding', 'products.Cars.units_sold' or 'pe_ratios.Current' for the
+trailing P/E. They live in a directory of .npy files or in one Arrow IPC file and are
+memory-mapped, so loading reads nothing up front and float64 columns are never copied.
+Every selected start date becomes one batch element of an engine call, with its
+snapshot values replacing the base scenario's, and each projection year is compared
+with the price realized that many years later.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from .engine import evaluate, flatten_inputs
+
+RESERVED_COLUMNS = ('date', 'price')
+DAYS_PER_YEAR = 365.25
+
+
+# Snapshot files
+
+def save_snapshots(path, columns):
+    """Write snapshot columns to a directory of .npy files, or to an Arrow IPC file if path ends with .arrow."""
+    columns = {name: np.asarray(values) for name, values in columns.items()}
+    columns['date'] = columns['date'].astype('datetime64[D]')
+    if path.endswith('.arrow'):
+        from .export import _pyarrow
+        pa = _pyarrow()
+        table = pa.table({name: pa.array(values) for name, values in columns.items()})
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        return
+    os.makedirs(path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f'{name}.npy'), values)
+
+
+def load_snapshots(path):
+    """The snapshot columns at path as {name: array}, memory-mapped rather than read."""
+    if path.endswith('.arrow'):
+        from .export import _pyarrow
+        pa = _pyarrow()
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        # Float columns without nulls are views of the mapped file; dates are widened to datetime64[D]
+        return {
+            name: (column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()).to_numpy(zero_copy_only=False)
+            for name, column in zip(table.column_names, table.columns)
+        }
+    return {
+        name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode='r')
+        for name in sorted(os.listdir(path)) if name.endswith('.npy')
+    }
+
+
+# Backtest
+
+def backtest(user_inputs, snapshots, start=None, end=None, every=1, tolerance_days=7, chunk_size=50_000):
+    """Replay the model from every every-th snapshot date in [start, end] and compare with realized prices.
+
+    implied has shape (dates, years, scenarios): the stock price the model projected
+    from each start date for each projection year. realized (dates, years) is the price
+    on the first snapshot at least that many years later (NaN if none within
+    tolerance_days), and log_error = log(implied / realized). The summary arrays, per
+    year and scenario, are count, median_log_error, mean_abs_log_error and
+    overvalued (the share of starts whose projection came out above the realized price).
+    """
+    dates = np.asarray(snapshots['date']).astype('datetime64[D]', copy=False)
+    if np.any(dates[1:] < dates[:-1]):
+        raise ValueError("Snapshot dates must be sorted")
+    price = np.asarray(snapshots['price'], dtype=float)
+    flat = flatten_inputs(user_inputs)
+    paths = [name for name in snapshots if name not in RESERVED_COLUMNS]
+    unknown = sorted(set(paths) - set(flat))
+    if unknown:
+        raise KeyError(f"Unknown input path(s): {', '.join(unknown)}")
+    if not paths:
+        raise ValueError("Snapshots need at least one input column besides date and price")
+
+    first = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, 'D')))
+    last = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, 'D'), side='right'))
+    starts = dates[first:last:every]
+
+    # Start dates are batch elements; slices of the mapped columns are views, read chunk by chunk
+    implied = []
+    step = chunk_size * every
+    for chunk_start in range(first, last, step):
+        rows = slice(chunk_start, min(chunk_start + step, last), every)
+        implied.append(evaluate(user_inputs, {path: snapshots[path][rows] for path in paths})['stock_price'])
+    years = np.asarray(user_inputs['years'])
+    horizons = years - years[0]
+    implied = np.concatenate(implied) if implied else np.empty((0, len(years), len(user_inputs['pe_ratios'])))
+
+    # Realized price: the first snapshot on or after start + horizon years, if close enough
+    targets = starts[:, np.newaxis] + np.round(horizons * DAYS_PER_YEAR).astype('timedelta64[D]')
+    index = np.searchsorted(dates, targets)
+    found = index < len(dates)
+    index = np.minimum(index, len(dates) - 1)
+    found &= dates[index] - targets <= np.timedelta64(tolerance_days, 'D')
+    realized = np.where(found, price[index], np.nan)
+
+    ratio = implied / realized[..., np.newaxis]
+    log_error = np.log(ratio, out=np.full(ratio.shape, np.nan), where=ratio > 0)
+    valid = np.isfinite(log_error)
+    count = valid.sum(axis=0)
+    with warnings.catch_warnings():
+        # Years with no realized price yet have all-NaN columns
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median_log_error = np.nanmedian(log_error, axis=0)
+        mean_abs_log_error = np.nanmean(np.abs(log_error), axis=0)
+    return {
+        'dates': starts,
+        'years': horizons,
+        'scenarios': list(user_inputs['pe_ratios']),
+        'paths': paths,
+        'implied': implied,
+        'realized': realized,
+        'log_error': log_error,
+        'count': count,
+        'median_log_error': median_log_error,
+        'mean_abs_log_error': mean_abs_log_error,
+        'overvalued': np.divide((log_error > 0).sum(axis=0), count, out=np.full(count.shape, np.nan), where=count > 0),
+    }
+
+
+def synthetic_history(user_inputs, days=11_000, start='1995-01-01', seed=0):
+    """Daily snapshot columns with random-walk fundamentals, a trailing P/E and a noisy realized price.
+
+    The realized price is the model's same-year price under the 'Current' P/E (or the
+    first scenario) times lognormal noise, so only the projections are tested.
+    """
+    rng = np.random.default_rng(seed)
+    flat = flatten_inputs(user_inputs)
+    t = np.arange(days) / DAYS_PER_YEAR
+
+    def walk(level, drift, volatility):
+        return level * np.exp(drift * t + np.cumsum(rng.normal(0, volatility / np.sqrt(DAYS_PER_YEAR), days)))
+
+    scenario = 'Current' if 'Current' in user_inputs['pe_ratios'] else next(iter(user_inputs['pe_ratios']))
+    columns = {
+        'date': np.datetime64(start, 'D') + np.arange(days),
+        'products.Cars.units_sold': walk(flat['products.Cars.units_sold'] / 20, 0.12, 0.15),
+        'products.Energy.revenue': walk(flat['products.Energy.revenue'] / 20, 0.10, 0.10),
+        'net_profit_margin': np.clip(walk(flat['net_profit_margin'], 0.0, 0.10), 0.01, 0.4),
+        'base_shares_outstanding': walk(flat['base_shares_outstanding'] / 2, 0.02, 0.01),
+        f'pe_ratios.{scenario}': np.clip(walk(flat[f'pe_ratios.{scenario}'] / 4, 0.03, 0.30), 5, 1000),
+    }
+    present = dict(user_inputs, years=list(user_inputs['years'][:1]))
+    params = {path: values for path, values in columns.items() if path != 'date'}
+    fair = evaluate(present, params)['stock_price'][:, 0, list(user_inputs['pe_ratios']).index(scenario)]
+    columns['price'] = fair * np.exp(rng.normal(0, 0.2, days))
+    return columns
+
+
+def main(argv=None):
+    from .defaults import default_user_inputs
+
+    parser = argparse.ArgumentParser(prog='python -m valuation.backtest', description="Backtest projected prices against local snapshots.")
+    parser.add_argument('snapshots', nargs='?', help="directory of .npy columns or an .arrow file")
+    parser.add_argument('--base', help="user_inputs JSON file the snapshot columns are applied to (default: app defaults)")
+    parser.add_argument('--start', help="first start date (YYYY-MM-DD)")
+    parser.add_argument('--end', help="last start date (YYYY-MM-DD)")
+    parser.add_argument('--every', type=int, default=1, help="use every Nth snapshot as a start date")
+    parser.add_argument('--tolerance-days', type=int, default=7, help="how far a realized price may lie past its target date")
+    parser.add_argument('--write-demo', metavar='PATH', help="write a synthetic daily history to PATH and exit")
+    parser.add_argument('--days', type=int, default=11_000, help="days of synthetic history")
+    args = parser.parse_args(argv)
+
+    if args.base:
+        with open(args.base) as f:
+            user_inputs = json.load(f)
+    else:
+        user_inputs = default_user_inputs()
+    if args.write_demo:
+        save_snapshots(args.write_demo, synthetic_history(user_inputs, args.days))
+        print(f"Wrote {args.days:,} days of synthetic snapshots to {args.write_demo}", file=sys.stderr)
+        return 0
+    if not args.snapshots:
+        parser.error("give a snapshots path, or --write-demo PATH")
+
+    started = time.perf_counter()
+    result = backtest(user_inputs, load_snapshots(args.snapshots), args.start, args.end, args.every, args.tolerance_days)
+    elapsed = time.perf_counter() - started
+    try:
+        print(f"{'Years':>5}  {'Scenario':<14} {'Starts':>7} {'Median log err':>15} {'Mean |log err|':>15} {'Overvalued':>11}")
+        for h, horizon in enumerate(result['years']):
+            for s, scenario in enumerate(result['scenarios']):
+                if result['count'][h, s]:
+                    print(
+                        f"{horizon:>5}  {scenario:<14} {result['count'][h, s]:>7,} {result['median_log_error'][h, s]:>+15.3f} "
+                        f"{result['mean_abs_log_error'][h, s]:>15.3f} {result['overvalued'][h, s]:>10.0%}"
+                    )
+    except BrokenPipeError:
+        # The consumer (e.g. `| head`) went away; silence the flush of what is left
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    print(f"Backtested {len(result['dates']):,} start dates in {elapsed:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""Headless batch runner: stream scenarios from JSONL/CSV through a process pool.
+
+    python -m valuation.batch scenarios.jsonl -o results.jsonl --workers 8 --ordered
+    cat scenarios.csv | python -m valuation.batch --input-format csv --base base.json -o out.parquet
+    python -m valuation.batch scenarios.jsonl -o products.arrow --table products
+
+JSONL lines hold a user_inputs dict (optionally with an 'id' key). CSV rows hold an
+optional 'id' column plus dotted input paths (see flatten_inputs), 'toggles.<name>' and
+'override_flags.<name>' columns, applied on top of --base or the default scenario.
+With --store scenarios.db, scenarios evaluated before (by content hash) are read
+back from the scenario store instead of recomputed.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+
+import numpy as np
+
+from .defaults import default_user_inputs
+from .engine import evaluate, expand_inputs, flatten_inputs, select_batch, to_yearly_results
+from .export import LABEL_COLUMNS, TABLE_METRICS, table_columns
+
+TRUE_STRINGS = ('1', 'true', 'yes', 'y', 'on')
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            scenario = json.loads(line)
+            yield scenario.pop('id', None), scenario
+
+
+def read_csv(stream, base):
+    for row in csv.DictReader(stream):
+        scenario_id = row.pop('id', None)
+        values = {}
+        flags = {}
+        for column, cell in row.items():
+            if cell is None or cell == '':
+                continue
+            section, _, key = column.partition('.')
+            if section in ('toggles', 'override_flags'):
+                flags.setdefault(section, {})[key] = cell.strip().lower() in TRUE_STRINGS
+            else:
+                values[column] = float(cell)
+        scenario = expand_inputs(base, values)
+        for section, section_flags in flags.items():
+            scenario[section] = {**scenario.get(section, {}), **section_flags}
+        yield scenario_id, scenario
+
+
+def _structure_key(user_inputs, flat):
+    """Scenarios sharing this key differ only in scalar values and can be evaluated as one batch."""
+    return (
+        tuple(flat),
+        tuple(user_inputs['toggles'].items()),
+        tuple(user_inputs['years']),
+        int(user_inputs.get('periods_per_year', 1)),
+        tuple(sorted(user_inputs.get('override_flags', {}).items())),
+    )
+
+
+def _evaluate_grouped(chunk):
+    """Yield (index, id, user_inputs, arrays) for a chunk, batching scenarios of the same structure."""
+    groups = {}
+    for index, scenario_id, user_inputs in chunk:
+        try:
+            flat = flatten_inputs(user_inputs)
+            key = _structure_key(user_inputs, flat)
+        except Exception as exc:
+            yield index, scenario_id, user_inputs, exc
+            continue
+        groups.setdefault(key, []).append((index, scenario_id, user_inputs, flat))
+    for members in groups.values():
+        try:
+            params = {path: np.array([member[3][path] for member in members], dtype=float) for path in members[0][3]}
+            arrays = evaluate(members[0][2], params)
+        except Exception as exc:
+            # One bad scenario must not fail the others: retry the group one scenario at a time
+            for index, scenario_id, user_inputs, _ in members:
+                yield index, scenario_id, user_inputs, exc if len(members) == 1 else _evaluate_one(user_inputs)
+            continue
+        for i, (index, scenario_id, user_inputs, _) in enumerate(members):
+            yield index, scenario_id, user_inputs, select_batch(arrays, i)
+
+
+def _evaluate_one(user_inputs):
+    """evaluate(user_inputs), or the exception it raised."""
+    try:
+        return evaluate(user_inputs)
+    except Exception as exc:
+        return exc
+
+
+_stores = {}
+
+
+def _open_store(path):
+    """One ScenarioStore per worker process and path."""
+    if path not in _stores:
+        from .store import ScenarioStore
+        _stores[path] = ScenarioStore(path)
+    return _stores[path]
+
+
+def _evaluate_chunk(chunk, output_format, store_path=None, table='market'):
+    """Evaluate (index, id, user_inputs) items; runs inside a worker process.
+
+    With store_path, scenarios already in the store are read back instead of evaluated,
+    and newly evaluated ones are added to it.
+    """
+    store = _open_store(store_path) if store_path else None
+    stored = {}
+    if store is not None:
+        for index, scenario_id, user_inputs in chunk:
+            try:
+                payload = store.yearly_results(user_inputs) if output_format == 'jsonl' else store.arrays(user_inputs)
+            except Exception:
+                payload = None
+            if payload is not None:
+                stored[index] = (index, scenario_id, user_inputs, payload)
+        chunk = [item for item in chunk if item[0] not in stored]
+    results = list(_evaluate_grouped(chunk))
+    if store is not None:
+        for _, _, user_inputs, arrays in results:
+            if not isinstance(arrays, Exception):
+                store.put(user_inputs, arrays)
+    results = sorted(results + list(stored.values()), key=lambda result: result[0])
+
+    if output_format == 'jsonl':
+        lines = []
+        for index, scenario_id, user_inputs, arrays in results:
+            record = {'index': index, 'id': scenario_id}
+            try:
+                if isinstance(arrays, Exception):
+                    raise arrays
+                record.update(stored[index][3] if index in stored else to_yearly_results(user_inputs, arrays))
+            except Exception as exc:
+                record['error'] = f"{type(exc).__name__}: {exc}"
+            lines.append(json.dumps(record))
+        return len(results), lines
+
+    columns = {'index': [], 'id': []}
+    for index, scenario_id, user_inputs, arrays in results:
+        if isinstance(arrays, Exception):
+            print(f"Scenario {index} failed: {type(arrays).__name__}: {arrays}", file=sys.stderr)
+            continue
+        rows_columns, labels = table_columns(arrays, table)
+        rows = len(rows_columns['year'])
+        columns['index'].append(np.full(rows, index))
+        columns['id'].append(np.full(rows, '' if scenario_id is None else str(scenario_id), dtype=object))
+        for name, values in rows_columns.items():
+            if name in labels:
+                values = np.asarray(labels[name], dtype=object)[values]
+            columns.setdefault(name, []).append(values)
+    if not columns['index']:
+        return len(results), None
+    return len(results), {name: np.concatenate(parts) for name, parts in columns.items()}
+
+
+def run_chunks(chunks, fn, workers, ordered=False):
+    """Map fn over chunks in a process pool, keeping at most a few chunks per worker in memory."""
+    if workers == 0:
+        yield from map(fn, chunks)
+        return
+    max_in_flight = 4 * workers
+    chunks = enumerate(chunks)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        finished = {}
+        next_seq = 0
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) + len(finished) < max_in_flight:
+                item = next(chunks, None)
+                if item is None:
+                    exhausted = True
+                    break
+                seq, chunk = item
+                pending[pool.submit(fn, chunk)] = seq
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                seq = pending.pop(future)
+                if ordered:
+                    finished[seq] = future.result()
+                else:
+                    yield future.result()
+            while next_seq in finished:
+                yield finished.pop(next_seq)
+                next_seq += 1
+
+
+class TableSink:
+    """Writes one result table ('products', 'network' or 'market') as Parquet or an Arrow IPC file."""
+
+    def __init__(self, path, output_format='parquet', table='market'):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet and Arrow output require pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._schema = pa.schema(
+            [('index', pa.int64()), ('id', pa.string()), ('year', pa.int64())]
+            + [(name, pa.string()) for name in LABEL_COLUMNS[table]]
+            + [(name, pa.float64()) for name in TABLE_METRICS[table]]
+        )
+        if output_format == 'parquet':
+            self._writer = pq.ParquetWriter(path, self._schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self._schema)
+
+    def write(self, columns):
+        if columns is not None:
+            self._writer.write_table(self._pa.table(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class JsonlSink:
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, lines):
+        for line in lines:
+            self._stream.write(line)
+            self._stream.write('\n')
+
+    def close(self):
+        self._stream.flush()
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m valuation.batch', description="Evaluate valuation scenarios in bulk.")
+    parser.add_argument('inputs', nargs='*', default=['-'], help="scenario files (default: stdin)")
+    parser.add_argument('--input-format', choices=['jsonl', 'csv'], help="default: from the file extension, else jsonl")
+    parser.add_argument('--base', help="user_inputs JSON file that CSV rows are applied to (default: app defaults)")
+    parser.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    parser.add_argument('--output-format', choices=['jsonl', 'parquet', 'arrow'], help="default: from the output extension, else jsonl")
+    parser.add_argument('--table', choices=list(TABLE_METRICS), default='market',
+                        help="rows written to Parquet/Arrow output: per year and product, per year, or per year and P/E scenario (default)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes; 0 evaluates in-process (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=64, help="scenarios per task")
+    parser.add_argument('--ordered', action='store_true', help="emit results in input order")
+    parser.add_argument('--store', help="SQLite scenario store: reuse results stored there and add new ones")
+    parser.add_argument('--progress-interval', type=float, default=5.0, help="seconds between progress reports on stderr; 0 disables")
+    args = parser.parse_args(argv)
+
+    output_format = args.output_format or {'.parquet': 'parquet', '.arrow': 'arrow'}.get(os.path.splitext(args.output)[1], 'jsonl')
+    if output_format != 'jsonl' and args.output == '-':
+        parser.error("Parquet and Arrow output need a file path (-o results.parquet)")
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+    else:
+        base = default_user_inputs()
+
+    def scenarios():
+        for path in args.inputs:
+            input_format = args.input_format or ('csv' if path.endswith('.csv') else 'jsonl')
+            stream = sys.stdin if path == '-' else open(path, newline='')
+            try:
+                reader = read_csv(stream, base) if input_format == 'csv' else read_jsonl(stream)
+                yield from reader
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+
+    items = ((index, scenario_id, user_inputs) for index, (scenario_id, user_inputs) in enumerate(scenarios()))
+    if output_format != 'jsonl':
+        sink = TableSink(args.output, output_format, args.table)
+        out_stream = None
+    else:
+        out_stream = sys.stdout if args.output == '-' else open(args.output, 'w')
+        sink = JsonlSink(out_stream)
+
+    workers = args.workers if args.workers is not None else os.cpu_count() or 1
+    started = last_report = time.perf_counter()
+    total = 0
+    try:
+        fn = partial(_evaluate_chunk, output_format=output_format, store_path=args.store, table=args.table)
+        for count, payload in run_chunks(_chunked(items, args.chunk_size), fn, workers, ordered=args.ordered):
+            sink.write(payload)
+            total += count
+            now = time.perf_counter()
+            if args.progress_interval and now - last_report >= args.progress_interval:
+                print(f"{total:,} scenarios, {total / (now - started):,.0f} scenarios/s", file=sys.stderr)
+                last_report = now
+    except BrokenPipeError:
+        # The consumer (e.g. `| head`) went away; silence the flush of what is left
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        sink.close()
+        if out_stream is not None and out_stream is not sys.stdout:
+            out_stream.close()
+    elapsed = time.perf_counter() - started
+    print(f"Evaluated {total:,} scenarios in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} scenarios/s)", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
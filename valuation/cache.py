@@ -0,0 +1,88 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def _json_default(value):
+    # NumPy scalars and arrays (e.g. from sweeps or goal seeks) serialize as plain Python values
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def canonical_hash(user_inputs):
+    """SHA-256 of user_inputs serialized with sorted keys, so dict ordering does not change the key."""
+    payload = json.dumps(user_inputs, sort_keys=True, separators=(',', ':'), default=_json_default)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache of valuation results with a size bound and a time-to-live.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, user_inputs, compute):
+        """Return the cached result for user_inputs, calling compute(user_inputs) on a miss."""
+        key = canonical_hash(user_inputs)
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Computed outside the lock; concurrent misses on one key may both compute, which is harmless
+            value = compute(user_inputs)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
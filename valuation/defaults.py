@@ -0,0 +1,98 @@
+import copy
+
+# Default assumptions shown in the Streamlit sidebar
+DEFAULT_PRODUCTS = {
+    'Cars': {
+        'units_sold': 2000000,
+        'sale_price': 50000,
+        'gross_margin': 0.18,
+        'op_expense_ratio': 0.80,
+        'growth_rate': 0.05
+    },
+    'Robotaxi': {
+        'units_sold': 100,
+        'sale_price': 30000,
+        'gross_margin': 0.25,
+        'op_expense_ratio': 0.70,
+        'growth_rate': 0.50
+    },
+    'Optimus': {
+        'units_sold': 1,
+        'sale_price': 20000,
+        'gross_margin': 0.30,
+        'op_expense_ratio': 0.70,
+        'growth_rate': 1.00
+    },
+    'Energy': {
+        'revenue': 15000,
+        'gross_margin': 0.30,
+        'op_expense_ratio': 0.20,
+        'growth_rate': 0.20
+    },
+    'Services': {
+        'revenue': 10000,
+        'gross_margin': 0.15,
+        'op_expense_ratio': 0.30,
+        'growth_rate': 0.10
+    }
+}
+
+DEFAULT_ROBOTAXI_NETWORK = {
+    'network_vehicles': 100,
+    'miles_per_car': 50000,
+    'rider_pays_per_mile': 1.00,
+    'car_owner_cut_per_mile': 0.60,
+    'tesla_cut_per_mile': 0.40,
+    'operating_cost_per_mile': 0.42,
+    'utilization_rate': 0.50,
+    'vehicle_growth_rate': 1.00,
+    'cost_reduction_rate': 0.05,
+    'utilization_growth_rate': 0.0234
+}
+
+# Optional cohort fleet model (user_inputs['fleet_cohorts']); ages are in years
+DEFAULT_FLEET_COHORTS = {
+    'lifetime_years': 8,
+    'attrition_rate': 0.02,
+    'ramp_years': 2,
+    'age_mileage_decline': 0.03,
+    'age_cost_growth': 0.04
+}
+
+DEFAULT_TOGGLES = {
+    'Cars': False,
+    'Robotaxi': False,
+    'Optimus': False,
+    'Energy': False,
+    'Services': False,
+    'Robotaxi Network': True
+}
+
+DEFAULT_PE_RATIOS = {
+    'Conservative': 100,
+    'Current': 191.60,
+    'Optimistic': 250,
+    'Bullish': 350
+}
+
+DEFAULT_NET_PROFIT_MARGIN = 0.08
+DEFAULT_BASE_SHARES_OUTSTANDING = 3220  # millions
+DEFAULT_SHARES_GROWTH_RATE = 0.01
+DEFAULT_YEARS = list(range(2025, 2036))
+
+
+def default_user_inputs(years=None):
+    """A fresh user_inputs dict holding the default assumptions, safe to mutate."""
+    return {
+        'products': copy.deepcopy(DEFAULT_PRODUCTS),
+        'robotaxi_network': dict(DEFAULT_ROBOTAXI_NETWORK),
+        'toggles': dict(DEFAULT_TOGGLES),
+        'net_profit_margin': DEFAULT_NET_PROFIT_MARGIN,
+        'base_shares_outstanding': DEFAULT_BASE_SHARES_OUTSTANDING,
+        'shares_growth_rate': DEFAULT_SHARES_GROWTH_RATE,
+        'pe_ratios': dict(DEFAULT_PE_RATIOS),
+        'years': list(years if years is not None else DEFAULT_YEARS),
+        'override_flags': {product: False for product in DEFAULT_PRODUCTS},
+        'override_values': {},
+        'overrides': {}
+    }
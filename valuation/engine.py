@@ -0,0 +1,672 @@
+import numpy as np
+
+# Segment schema: the fields of each kind of business line. A product is unit-based
+# when it has units_sold and revenue-based when it has revenue ($M); the per-mile
+# network segment is user_inputs['robotaxi_network'], absent or None when there is none.
+SEGMENT_FIELDS = {
+    'units': ('units_sold', 'sale_price', 'gross_margin', 'op_expense_ratio', 'growth_rate'),
+    'revenue': ('revenue', 'gross_margin', 'op_expense_ratio', 'growth_rate'),
+    'network': (
+        'network_vehicles', 'miles_per_car', 'rider_pays_per_mile', 'car_owner_cut_per_mile', 'tesla_cut_per_mile',
+        'operating_cost_per_mile', 'utilization_rate', 'vehicle_growth_rate', 'cost_reduction_rate', 'utilization_growth_rate',
+    ),
+}
+OVERRIDE_YEAR_INDEX = 4
+PRODUCT_KEYS = ('units_sold', 'revenue', 'op_expenses', 'net_revenue', 'gross_profit')
+COMPLEX_STEP = 1e-20
+# Period granularities for user_inputs['periods_per_year'] (annual when absent). Growth
+# rates stay annual; flows are reported per period and levels at the start of each period.
+GRANULARITIES = {'Annual': 1, 'Quarterly': 4, 'Monthly': 12}
+FLOW_KEYS = PRODUCT_KEYS + (
+    'total_miles', 'gross_revenue', 'car_owner_earnings', 'tesla_gross_earnings', 'operating_costs', 'tesla_earnings',
+    'total_revenue', 'net_income',
+)
+RATE_KEYS = ('utilization_rate', 'utilized_miles_per_car', 'operating_cost_per_mile')
+STOCK_KEYS = ('network_vehicles', 'shares_outstanding')
+NETWORK_KEYS = (
+    'network_vehicles', 'utilization_rate', 'utilized_miles_per_car', 'operating_cost_per_mile', 'total_miles',
+    'gross_revenue', 'car_owner_earnings', 'tesla_gross_earnings', 'operating_costs', 'tesla_earnings',
+)
+
+
+def segment_kind(data):
+    """'units' or 'revenue' for one product's assumptions, from the fields it has (see SEGMENT_FIELDS)."""
+    if 'units_sold' in data:
+        return 'units'
+    if 'revenue' in data:
+        return 'revenue'
+    raise ValueError(f"A product needs units_sold or revenue, got {sorted(data)}")
+
+
+def flatten_inputs(user_inputs):
+    """Map every scalar assumption in user_inputs to a dotted path such as 'products.Cars.growth_rate'."""
+    flat = {}
+    for product, data in user_inputs['products'].items():
+        for field, value in data.items():
+            flat[f'products.{product}.{field}'] = value
+    for key, value in (user_inputs.get('robotaxi_network') or {}).items():
+        flat[f'robotaxi_network.{key}'] = value
+    for key in ('net_profit_margin', 'base_shares_outstanding', 'shares_growth_rate'):
+        flat[key] = user_inputs[key]
+    for scenario, value in user_inputs['pe_ratios'].items():
+        flat[f'pe_ratios.{scenario}'] = value
+    for key, value in (user_inputs.get('fleet_cohorts') or {}).items():
+        flat[f'fleet_cohorts.{key}'] = value
+    for product, value in user_inputs.get('override_values', {}).items():
+        flat[f'override_values.{product}'] = value
+    for target, points in user_inputs.get('overrides', {}).items():
+        for kind in ('values', 'growth_rates'):
+            for year, value in points.get(kind, {}).items():
+                flat[f'overrides.{target}.{kind}.{int(year)}'] = value
+    return flat
+
+
+def expand_inputs(user_inputs, values):
+    """Return a copy of user_inputs with the dotted paths in values replaced (inverse of flatten_inputs)."""
+    expanded = {
+        key: dict(value) if isinstance(value, dict) else value
+        for key, value in user_inputs.items()
+    }
+    expanded['products'] = {product: dict(data) for product, data in user_inputs['products'].items()}
+    expanded['overrides'] = {
+        target: {kind: dict(points.get(kind, {})) for kind in ('values', 'growth_rates')}
+        for target, points in user_inputs.get('overrides', {}).items()
+    }
+    for path, value in values.items():
+        section, _, rest = path.partition('.')
+        if not rest:
+            expanded[section] = value
+        elif section == 'products':
+            product, _, field = rest.rpartition('.')
+            expanded['products'][product][field] = value
+        elif section == 'overrides':
+            target, kind, year = rest.rsplit('.', 2)
+            points = expanded['overrides'].setdefault(target, {'values': {}, 'growth_rates': {}})[kind]
+            # Keep the existing key (int or JSON string) for a year that is already set
+            points[next((key for key in points if int(key) == int(year)), int(year))] = value
+        else:
+            expanded[section][rest] = value
+    return expanded
+
+
+def override_points(user_inputs, target, kind):
+    """Sorted (year, path) pairs of one target's 'values' or 'growth_rates' override points."""
+    points = user_inputs.get('overrides', {}).get(target, {}).get(kind, {})
+    return sorted((int(year), f'overrides.{target}.{kind}.{int(year)}') for year in points)
+
+
+def periods_per_year(user_inputs):
+    return int(user_inputs.get('periods_per_year', 1))
+
+
+def period_grid(user_inputs):
+    """The start of every projection period in (fractional) years; user_inputs['years'] when annual."""
+    years = np.asarray(user_inputs['years'])
+    n = periods_per_year(user_inputs)
+    if n == 1:
+        return years
+    return years[0] + np.arange(len(years) * n) / n
+
+
+def _power(base, t):
+    """base ** t along the time grid t (base is batch + (1,)).
+
+    Sub-annual grids are evenly spaced, so they take one power per batch element and a
+    cumulative product of the per-period factor instead of one power per period. Annual
+    grids keep the direct power, which matches the original per-year loop exactly.
+    """
+    if len(t) < 2 or t[1] - t[0] >= 1:
+        return base ** t
+    factors = np.repeat(base ** (t[1] - t[0]), len(t), axis=-1)
+    factors[..., 0] = (base ** t[0])[..., 0]
+    return np.cumprod(factors, axis=-1)
+
+
+def _compound(user_inputs, value, target, base_path, rate_path, years, start):
+    """A compounding line (units, revenue or vehicles) for years[start:].
+
+    Each year grows from the latest 'values' override at or before it (or from base_path
+    in the first year), at rate_path until the first 'growth_rates' point and at each
+    point's rate from that year's step on. Points outside the projection years only
+    change the rate schedule; level overrides there are ignored.
+    """
+    t = (years - years[0]).astype(float)
+    levels = [(list(years).index(year), path) for year, path in override_points(user_inputs, target, 'values') if year in years]
+    curve = override_points(user_inputs, target, 'growth_rates')
+    if not levels and not curve:
+        return value(base_path) * _power(1 + value(rate_path), t[start:])
+
+    index = np.arange(start, len(years))
+    anchor = np.zeros(len(index), dtype=int)
+    level = value(base_path)
+    for position, path in levels:
+        anchor = np.where(index >= position, position, anchor)
+        level = np.where(index >= position, value(path), level)
+
+    # Piecewise-constant rate schedule: segment s runs over (bounds[s], bounds[s + 1]] in t
+    bounds = [-np.inf] + [year - 1 - years[0] for year, _ in curve] + [np.inf]
+    rates = [rate_path] + [path for _, path in curve]
+    t_end, t_anchor = t[index], t[anchor]
+    factor = 1.0
+    for s, rate in enumerate(rates):
+        steps = np.maximum(0.0, np.minimum(t_end, bounds[s + 1]) - np.maximum(t_anchor, bounds[s]))
+        factor = factor * (1 + value(rate)) ** steps
+    return level * factor
+
+
+def _year_mean(array, n):
+    """Mean over each year's n periods (the last axis); for an annual rate, that year's total."""
+    return array.reshape(array.shape[:-1] + (-1, n)).mean(axis=-1)
+
+
+def _roll_lines(lines, n):
+    """Annual values of period-level lines: counts at the start of each year, annual rates
+    averaged over its periods, and cohort vintages bought within a year merged."""
+    rolled = {}
+    for key, line in lines.items():
+        if key in STOCK_KEYS:
+            rolled[key] = line[..., ::n]
+        elif key == 'cohort_vehicles':
+            vehicles = line[..., ::n]
+            rolled[key] = vehicles.reshape(vehicles.shape[:-2] + (-1, n, vehicles.shape[-1])).sum(axis=-2)
+        else:
+            rolled[key] = _year_mean(line, n)
+    return rolled
+
+
+def _product_lines(user_inputs, value, product, years, start, rolled=False):
+    """units_sold, revenue, op_expenses, net_revenue and gross_profit of one product for years[start:].
+
+    rolled averages the compounding line over each year's periods before the (linear)
+    margins are applied, so the rest runs at annual resolution.
+    """
+    # The legacy override replaces every period of the fifth projection year
+    n = periods_per_year(user_inputs)
+    first = OVERRIDE_YEAR_INDEX * n - start
+    override_periods = slice(first, first + n) if len(years) > OVERRIDE_YEAR_INDEX * n >= start else None
+    override = override_periods is not None and user_inputs.get('override_flags', {}).get(product, False)
+    if segment_kind(user_inputs['products'][product]) == 'units':
+        units = _compound(user_inputs, value, product, f'products.{product}.units_sold', f'products.{product}.growth_rate', years, start)
+        if override:
+            override_units = value(f'override_values.{product}')
+            units = units.astype(np.result_type(units, override_units), copy=False)
+            units[..., override_periods] = override_units
+        if rolled:
+            units = _year_mean(units, n)
+        revenue = units * value(f'products.{product}.sale_price')
+    else:
+        revenue = _compound(user_inputs, value, product, f'products.{product}.revenue', f'products.{product}.growth_rate', years, start) * 1e6
+        if override:
+            override_revenue = value(f'override_values.{product}') * 1e6
+            revenue = revenue.astype(np.result_type(revenue, override_revenue), copy=False)
+            revenue[..., override_periods] = override_revenue
+        if rolled:
+            revenue = _year_mean(revenue, n)
+        units = np.full(revenue.shape, np.nan)
+    toggle = user_inputs['toggles'][product]
+    op_expense_ratio = value(f'products.{product}.op_expense_ratio') if toggle else np.nan
+    return _segment_lines(units, revenue, toggle, op_expense_ratio, value(f'products.{product}.gross_margin'))
+
+
+def _where(condition, a, b):
+    """a where condition holds, else b; condition is a bool, or a boolean array when
+    the structure differs across a batch (see universe)."""
+    if isinstance(condition, np.ndarray):
+        return np.where(condition, a, b)
+    return a if condition else b
+
+
+def _segment_lines(units, revenue, toggle, op_expense_ratio, gross_margin):
+    """The PRODUCT_KEYS lines of a segment from its units (NaN when revenue-based) and
+    revenue; toggle deducts operating expenses at op_expense_ratio."""
+    op_expenses = _where(toggle, revenue * op_expense_ratio, np.full(revenue.shape, np.nan))
+    net_revenue = _where(toggle, revenue - op_expenses, revenue)
+    return {
+        'units_sold': units,
+        'revenue': revenue,
+        'op_expenses': op_expenses,
+        'net_revenue': net_revenue,
+        'gross_profit': net_revenue * gross_margin,
+    }
+
+
+def _cohort_fleet(user_inputs, value, years, enabled):
+    """Vintage x year fleet matrices for the cohort model (see DEFAULT_FLEET_COHORTS).
+
+    Vehicles bought in year v are still in service in year y with probability
+    (1 - attrition_rate) ** age while age < lifetime_years. Purchases are whatever keeps
+    the fleet in service on the network_vehicles path, so retired vehicles are replaced
+    (a shrinking path gives negative purchases). Utilization ramps up over ramp_years of
+    age, miles per car fall with age_mileage_decline and cost per mile rises with
+    age_cost_growth on top of the network-wide calendar trends.
+    """
+    t = (years - years[0]).astype(float)
+    age = t[np.newaxis, :] - t[:, np.newaxis]
+    in_service = age >= 0
+    age = np.maximum(age, 0.0)
+    lifetime = value('fleet_cohorts.lifetime_years')[..., np.newaxis]
+    attrition = value('fleet_cohorts.attrition_rate')[..., np.newaxis]
+    # Every vintage must survive its first year, or no purchases can reach the fleet path
+    if np.any(lifetime.real <= 0):
+        raise ValueError(f"fleet_cohorts.lifetime_years must be positive, got {np.min(lifetime.real):g}")
+    if np.any(attrition.real >= 1):
+        raise ValueError(f"fleet_cohorts.attrition_rate must be below 1, got {np.max(attrition.real):g}")
+    survival = np.where(in_service & (age < lifetime), (1 - attrition) ** age, 0.0)
+
+    # survival.T[y, v] maps purchases by vintage to the fleet in service each year
+    fleet = _compound(user_inputs, value, 'Robotaxi Network', 'robotaxi_network.network_vehicles', 'robotaxi_network.vehicle_growth_rate', years, 0)
+    purchases = np.linalg.solve(np.swapaxes(survival, -1, -2), fleet[..., np.newaxis])
+    vehicles = purchases * survival
+
+    miles = value('robotaxi_network.miles_per_car')[..., np.newaxis] * (1 - value('fleet_cohorts.age_mileage_decline')[..., np.newaxis]) ** age
+    # A vintage's first period counts toward its ramp-up
+    step = t[1] - t[0] if len(t) > 1 else 1.0
+    ramp = np.minimum(1.0, (age + step) / value('fleet_cohorts.ramp_years')[..., np.newaxis])
+    network_utilization = value('robotaxi_network.utilization_rate') * _power(1 + value('robotaxi_network.utilization_growth_rate'), t)
+    utilization = np.minimum(0.70, network_utilization[..., np.newaxis, :] * ramp)
+    network_cost = value('robotaxi_network.operating_cost_per_mile') * _power(1 - value('robotaxi_network.cost_reduction_rate'), t)
+    cost_per_mile = network_cost[..., np.newaxis, :] * (1 + value('fleet_cohorts.age_cost_growth')[..., np.newaxis]) ** age
+    car_miles = miles * utilization if enabled else miles
+    return vehicles, miles, utilization, car_miles, cost_per_mile, network_cost
+
+
+def _ratio(numerator, denominator, fallback):
+    """numerator / denominator, or fallback wherever the denominator is zero (real or complex)."""
+    out = np.empty(numerator.shape, np.result_type(numerator, denominator, fallback))
+    out[...] = fallback
+    return np.divide(numerator, denominator, out=out, where=denominator != 0)
+
+
+def _network_lines(user_inputs, value, years, start, rolled=False):
+    """The Robotaxi Network columns for years[start:], rolled up to years if rolled.
+
+    Companies without a network segment (robotaxi_network absent or None) get zeros.
+    """
+    t = (years[start:] - years[0]).astype(float)
+    enabled = user_inputs['toggles'].get('Robotaxi Network', False)
+    if not user_inputs.get('robotaxi_network'):
+        shape = np.broadcast_shapes(value('net_profit_margin').shape, t.shape)
+        lines = {key: np.zeros(shape) for key in NETWORK_KEYS}
+    elif user_inputs.get('fleet_cohorts'):
+        vehicles, miles, utilization, car_miles, cost_per_mile, network_cost = (
+            matrix[..., start:] for matrix in _cohort_fleet(user_inputs, value, years, enabled)
+        )
+        # Fleet totals over vintages, reported as fleet averages per car and per mile
+        network_vehicles = vehicles.sum(axis=-2)
+        total_miles = (vehicles * car_miles).sum(axis=-2)
+        fleet_miles = (vehicles * miles).sum(axis=-2)
+        cost = (vehicles * car_miles * cost_per_mile).sum(axis=-2)
+        fleet = {
+            'network_vehicles': network_vehicles,
+            'utilization_rate': _ratio((vehicles * miles * utilization).sum(axis=-2), fleet_miles, 0.0),
+            'utilized_miles_per_car': _ratio(total_miles, network_vehicles, 0.0),
+            'operating_cost_per_mile': _ratio(cost, total_miles, network_cost),
+            'total_miles': total_miles,
+            'operating_costs': cost if enabled else np.zeros(total_miles.shape),
+        }
+        lines = {**_network_earnings(value, enabled, **fleet), 'cohort_vehicles': vehicles}
+    else:
+        network_vehicles = _compound(user_inputs, value, 'Robotaxi Network', 'robotaxi_network.network_vehicles', 'robotaxi_network.vehicle_growth_rate', years, start)
+        lines = _network_earnings(value, enabled, **_fleet_lines(value, network_vehicles, t, enabled))
+    return _roll_lines(lines, periods_per_year(user_inputs)) if rolled else lines
+
+
+def _fleet_lines(value, network_vehicles, t, enabled):
+    """Utilization, mileage and cost lines of a fleet on the network_vehicles path, with
+    network-wide calendar trends only; enabled is a bool or a boolean array (see _where)."""
+    operating_cost_per_mile = value('robotaxi_network.operating_cost_per_mile') * _power(1 - value('robotaxi_network.cost_reduction_rate'), t)
+    utilization_rate = np.minimum(0.70, value('robotaxi_network.utilization_rate') * _power(1 + value('robotaxi_network.utilization_growth_rate'), t))
+    miles_per_car = value('robotaxi_network.miles_per_car')
+    utilized_miles_per_car = _where(enabled, miles_per_car * utilization_rate, np.broadcast_to(miles_per_car, network_vehicles.shape))
+    total_miles = network_vehicles * utilized_miles_per_car
+    return {
+        'network_vehicles': network_vehicles,
+        'utilization_rate': utilization_rate,
+        'utilized_miles_per_car': utilized_miles_per_car,
+        'operating_cost_per_mile': operating_cost_per_mile,
+        'total_miles': total_miles,
+        'operating_costs': _where(enabled, total_miles * operating_cost_per_mile, np.zeros(total_miles.shape)),
+    }
+
+
+def _network_earnings(value, enabled, total_miles, operating_costs, **fleet):
+    """NETWORK_KEYS lines: the fleet lines plus what riders pay, owners and Tesla earn on total_miles."""
+    tesla_gross_earnings = total_miles * value('robotaxi_network.tesla_cut_per_mile')
+    return {
+        **fleet,
+        'total_miles': total_miles,
+        'gross_revenue': total_miles * value('robotaxi_network.rider_pays_per_mile'),
+        'car_owner_earnings': total_miles * value('robotaxi_network.car_owner_cut_per_mile'),
+        'tesla_gross_earnings': tesla_gross_earnings,
+        'operating_costs': operating_costs,
+        'tesla_earnings': _where(enabled, tesla_gross_earnings - operating_costs, tesla_gross_earnings),
+    }
+
+
+def _company_totals(net_profit_margin, net_revenue, tesla_earnings, shares_outstanding, pe_ratios):
+    """total_revenue, net_income, market_cap and stock_price from the per-line results."""
+    # Sum products in input order, as the per-year loop does, to keep rounding the same
+    total_product_revenue = np.zeros(tesla_earnings.shape)
+    for product_net_revenue in net_revenue:
+        total_product_revenue = total_product_revenue + product_net_revenue
+    total_revenue = total_product_revenue + tesla_earnings
+    net_income = total_revenue * net_profit_margin
+    market_cap = net_income[..., np.newaxis] * pe_ratios[..., np.newaxis, :]
+    return {
+        'total_revenue': total_revenue,
+        'net_income': net_income,
+        'market_cap': market_cap,
+        'stock_price': market_cap / (shares_outstanding[..., np.newaxis] * 1e6),
+    }
+
+
+def _reader(user_inputs, params):
+    """value(path) -> the input at path as a batch + (1,) array, and the batch shape."""
+    flat = flatten_inputs(user_inputs)
+    unknown = sorted(set(params) - set(flat))
+    if unknown:
+        raise KeyError(f"Unknown input path(s): {', '.join(unknown)}")
+    batch_shape = np.broadcast_shapes(*(np.shape(v) for v in params.values()))
+
+    def value(path):
+        array = np.asarray(params.get(path, flat[path]))
+        # Complex inputs pass through untouched for complex-step derivatives (see evaluate)
+        if not np.iscomplexobj(array):
+            array = array.astype(float, copy=False)
+        return np.broadcast_to(array, batch_shape)[..., np.newaxis]
+
+    return value, batch_shape
+
+
+def evaluate(user_inputs, params=None, jacobian=None):
+    """Evaluate the valuation model for every year with NumPy broadcasting.
+
+    params optionally maps dotted input paths (see flatten_inputs) to arrays that
+    replace the scalar from user_inputs, which turns the call into a batch evaluation.
+    All arrays must broadcast to one batch shape; per-year outputs then have shape
+    batch + (years,), per-product outputs batch + (products, years) and per-scenario
+    outputs batch + (years, scenarios). With user_inputs['fleet_cohorts'] set, the
+    Robotaxi Network comes from the cohort fleet model and cohort_vehicles holds the
+    fleet by vintage, batch + (vintages, years). With user_inputs['periods_per_year']
+    above 1 the model runs on that many periods a year and the result is rolled up to
+    years (see evaluate_periods and rollup).
+
+    jacobian (a list of paths, or True for every path) adds the exact derivatives of
+    the stock price with respect to those inputs: jacobian_paths, and
+    stock_price_jacobian of shape batch + (paths, years, scenarios). They come from one
+    extra complex-step evaluation, so they carry no finite-difference truncation error.
+    """
+    arrays = _evaluate(user_inputs, params or {})
+    if jacobian is not None and jacobian is not False:
+        arrays.update(_stock_price_jacobian(user_inputs, params or {}, jacobian))
+    return arrays
+
+
+def _stock_price_jacobian(user_inputs, params, paths):
+    """d stock_price / d input for each path, by complex-step differentiation.
+
+    Each path gets an imaginary step COMPLEX_STEP * 1j along its own entry of a new
+    trailing direction axis, so a single complex evaluation of batch + (paths,) yields
+    every derivative as imag(stock_price) / COMPLEX_STEP. Unlike finite differences
+    nothing is subtracted, so the result is exact to rounding (the engine is analytic
+    apart from the min/max caps and the cohort lifetime cut-off, whose derivative is
+    taken on the active branch). Discrete inputs such as lifetime_years get 0.
+    """
+    flat = flatten_inputs(user_inputs)
+    paths = list(flat) if paths is True else list(paths)
+    unknown = sorted(set(paths) - set(flat))
+    if unknown:
+        raise KeyError(f"Unknown input path(s): {', '.join(unknown)}")
+    steps = np.eye(len(paths)) * (COMPLEX_STEP * 1j)
+    directions = {path: np.asarray(values, dtype=float)[..., np.newaxis] for path, values in params.items()}
+    for i, path in enumerate(paths):
+        directions[path] = np.asarray(params.get(path, flat[path]), dtype=float)[..., np.newaxis] + steps[i]
+    stock_price = _evaluate(user_inputs, directions)['stock_price']
+    return {
+        'jacobian_paths': tuple(paths),
+        'stock_price_jacobian': stock_price.imag / COMPLEX_STEP,
+    }
+
+
+def evaluate_periods(user_inputs, params=None):
+    """Period-level evaluate(): the time axis has one entry per period of
+    user_inputs['periods_per_year'] (see GRANULARITIES) instead of one per year.
+
+    periods holds each period's start in fractional years. Flows (FLOW_KEYS) are the
+    amounts earned in the period; everything else is a level at the period's start, and
+    market cap and stock price value the period's annualized net income at each P/E.
+    rollup() turns the result into annual evaluate() arrays.
+    """
+    arrays = _evaluate(user_inputs, params or {}, rolled=False)
+    # Lines are computed as annual rates; flows become the amounts earned in one period
+    n = periods_per_year(user_inputs)
+    for key in FLOW_KEYS:
+        arrays[key] = arrays[key] / n
+    arrays['periods'] = period_grid(user_inputs).astype(float)
+    return arrays
+
+
+def rollup(arrays):
+    """Annual evaluate() arrays from evaluate_periods() output.
+
+    Flows are summed over each year's periods, rates (RATE_KEYS) averaged, and fleet and
+    share counts (STOCK_KEYS) taken at the start of the year, as in the annual model;
+    market cap and stock price are then recomputed from the annual net income.
+    evaluate() gives the same result (to rounding) without the period-level arrays.
+    """
+    n = len(arrays['periods']) // len(arrays['years'])
+    result = {key: value for key, value in arrays.items() if key != 'periods'}
+    if n == 1:
+        return result
+    keys = FLOW_KEYS + RATE_KEYS + STOCK_KEYS + (('cohort_vehicles',) if 'cohort_vehicles' in arrays else ())
+    result.update(_roll_lines({key: arrays[key] for key in keys}, n))
+    for key in FLOW_KEYS:
+        result[key] = result[key] * n
+    result['market_cap'] = result['net_income'][..., np.newaxis] * arrays['pe_ratios'][..., np.newaxis, :]
+    result['stock_price'] = result['market_cap'] / (result['shares_outstanding'][..., np.newaxis] * 1e6)
+    return result
+
+
+def _evaluate(user_inputs, params, rolled=None):
+    """evaluate() arrays; sub-annual runs are rolled up to years line by line (see rollup)."""
+    n = periods_per_year(user_inputs)
+    rolled = n > 1 if rolled is None else rolled
+    value, batch_shape = _reader(user_inputs, params)
+    products = user_inputs['products']
+    years = period_grid(user_inputs)
+    t = (years - years[0]).astype(float)
+
+    lines = [_product_lines(user_inputs, value, product, years, 0, rolled) for product in products]
+    network = _network_lines(user_inputs, value, years, 0, rolled)
+    shares_outstanding = value('base_shares_outstanding') * _power(1 + value('shares_growth_rate'), t)
+    if rolled:
+        shares_outstanding = shares_outstanding[..., ::n]
+    scenarios = tuple(user_inputs['pe_ratios'])
+    pe_ratios = np.concatenate([value(f'pe_ratios.{scenario}') for scenario in scenarios], axis=-1)
+    totals = _company_totals(value('net_profit_margin'), [line['net_revenue'] for line in lines], network['tesla_earnings'], shares_outstanding, pe_ratios)
+
+    return {
+        'years': np.asarray(user_inputs['years']),
+        'products': tuple(products),
+        'scenarios': scenarios,
+        **{key: np.stack([line[key] for line in lines], axis=-2) for key in PRODUCT_KEYS},
+        **network,
+        'total_revenue': totals['total_revenue'],
+        'net_income': totals['net_income'],
+        'shares_outstanding': shares_outstanding,
+        'pe_ratios': pe_ratios,
+        'market_cap': totals['market_cap'],
+        'stock_price': totals['stock_price'],
+    }
+
+
+def _first_changed(user_inputs, new_user_inputs, target, years):
+    """Index of the first year whose result an edit of target's overrides can change, or None."""
+    flat_old, flat_new = flatten_inputs(user_inputs), flatten_inputs(new_user_inputs)
+    first = None
+    for kind in ('values', 'growth_rates'):
+        old = dict(override_points(user_inputs, target, kind))
+        new = dict(override_points(new_user_inputs, target, kind))
+        for year in set(old) | set(new):
+            if year in old and year in new and flat_old[old[year]] == flat_new[new[year]]:
+                continue
+            if kind == 'values' and year not in years:
+                continue
+            # A rate point changes the step into its year; a level override the year itself
+            index = int(np.searchsorted(years, year))
+            first = index if first is None else min(first, index)
+    return first if first is None or first < len(years) else None
+
+
+def reevaluate(user_inputs, arrays, new_user_inputs):
+    """evaluate(new_user_inputs), given arrays = evaluate(user_inputs).
+
+    When the two differ only in 'overrides', just the edited products (or the Robotaxi
+    Network) are recomputed, from the first year the edit touches onward, followed by the
+    company totals for those years. Any other change, and any sub-annual granularity,
+    falls back to a full evaluate().
+    """
+    keys = (set(user_inputs) | set(new_user_inputs)) - {'overrides'}
+    if any(user_inputs.get(key) != new_user_inputs.get(key) for key in keys) or periods_per_year(new_user_inputs) > 1:
+        return evaluate(new_user_inputs)
+    years = np.asarray(new_user_inputs['years'])
+    targets = set(user_inputs.get('overrides', {})) | set(new_user_inputs.get('overrides', {}))
+    changed = {target: _first_changed(user_inputs, new_user_inputs, target, list(years)) for target in targets}
+    changed = {target: start for target, start in changed.items() if start is not None}
+    if not changed:
+        return arrays
+
+    value, _ = _reader(new_user_inputs, {})
+    result = {key: array.copy() if isinstance(array, np.ndarray) else array for key, array in arrays.items()}
+    for p, product in enumerate(new_user_inputs['products']):
+        if product in changed:
+            start = changed[product]
+            for key, line in _product_lines(new_user_inputs, value, product, years, start).items():
+                result[key][..., p, start:] = line
+    if 'Robotaxi Network' in changed:
+        start = changed['Robotaxi Network']
+        for key, line in _network_lines(new_user_inputs, value, years, start).items():
+            result[key][..., start:] = line
+    start = min(changed.values())
+    totals = _company_totals(
+        value('net_profit_margin'),
+        [result['net_revenue'][..., p, start:] for p in range(len(result['products']))],
+        result['tesla_earnings'][..., start:],
+        result['shares_outstanding'][..., start:],
+        result['pe_ratios'],
+    )
+    for key in ('total_revenue', 'net_income'):
+        result[key][..., start:] = totals[key]
+    for key in ('market_cap', 'stock_price'):
+        result[key][..., start:, :] = totals[key]
+    return result
+
+
+def select_batch(arrays, index):
+    """Pick one batch element (or a sub-batch) out of batched evaluate() output."""
+    return {
+        key: value[index] if isinstance(value, np.ndarray) and key not in ('years', 'periods') else value
+        for key, value in arrays.items()
+    }
+
+
+def result_columns(arrays):
+    """Unbatched evaluate() arrays as nested Python lists, ready for year_result()."""
+    return {key: value.tolist() for key, value in arrays.items() if isinstance(value, np.ndarray)}
+
+
+def year_result(user_inputs, columns, y):
+    """The legacy nested dict for year index y (product_valuation, robotaxi_network, ...)."""
+    products = user_inputs['products']
+    robotaxi_network = user_inputs.get('robotaxi_network')
+    toggles = user_inputs['toggles']
+    override_flags = user_inputs.get('override_flags', {})
+    override_values = user_inputs.get('override_values', {})
+    y = range(len(columns['years']))[y]
+
+    product_results = []
+    revenue_breakdown = []
+    for p, (product, data) in enumerate(products.items()):
+        is_unit_based = segment_kind(data) == 'units'
+        if is_unit_based and y == OVERRIDE_YEAR_INDEX and override_flags.get(product, False):
+            units_sold = override_values[product]
+        else:
+            units_sold = columns['units_sold'][p][y]
+        net_revenue = columns['net_revenue'][p][y]
+        product_results.append({
+            'Product': product,
+            'Units Sold': units_sold if is_unit_based else '-',
+            'Sale Price ($)': data['sale_price'] if is_unit_based else '-',
+            'Gross Margin (%)': data['gross_margin'] * 100,
+            'Revenue ($M)': net_revenue / 1e6,
+            'Gross Profit ($M)': columns['gross_profit'][p][y] / 1e6,
+            'Operating Expenses ($M)' if toggles[product] else None: columns['op_expenses'][p][y] / 1e6 if toggles[product] else None
+        })
+        revenue_breakdown.append({
+            'Category': product,
+            'Revenue ($M)': net_revenue / 1e6
+        })
+
+    tesla_earnings = columns['tesla_earnings'][y]
+    if not robotaxi_network:
+        robotaxi_results = None
+    elif toggles.get('Robotaxi Network', False):
+        robotaxi_results = {
+            'Network Vehicles': columns['network_vehicles'][y],
+            'Miles per Car (Utilized)': columns['utilized_miles_per_car'][y],
+            'Utilization Rate (%)': columns['utilization_rate'][y] * 100,
+            'Rider Pays per Mile ($)': robotaxi_network['rider_pays_per_mile'],
+            'Car Owner Cut per Mile ($)': robotaxi_network['car_owner_cut_per_mile'],
+            'Tesla Cut per Mile ($)': robotaxi_network['tesla_cut_per_mile'],
+            'Operating Cost per Mile ($)': columns['operating_cost_per_mile'][y],
+            'Gross Revenue ($M)': columns['gross_revenue'][y] / 1e6,
+            'Car Owner Earnings ($M)': columns['car_owner_earnings'][y] / 1e6,
+            'Tesla Gross Earnings ($M)': columns['tesla_gross_earnings'][y] / 1e6,
+            'Operating Costs ($M)': columns['operating_costs'][y] / 1e6,
+            'Tesla Net Earnings ($M)': tesla_earnings / 1e6
+        }
+    else:
+        robotaxi_results = {
+            'Network Vehicles': columns['network_vehicles'][y],
+            'Miles per Car': robotaxi_network['miles_per_car'],
+            'Rider Pays per Mile ($)': robotaxi_network['rider_pays_per_mile'],
+            'Car Owner Cut per Mile ($)': robotaxi_network['car_owner_cut_per_mile'],
+            'Tesla Cut per Mile ($)': robotaxi_network['tesla_cut_per_mile'],
+            'Tesla Earnings per Year ($M)': tesla_earnings / 1e6
+        }
+    if robotaxi_network:
+        revenue_breakdown.append({
+            'Category': 'Robotaxi Network',
+            'Revenue ($M)': tesla_earnings / 1e6
+        })
+
+    net_income = columns['net_income'][y]
+    market_cap_results = []
+    for s, (scenario, pe_ratio) in enumerate(user_inputs['pe_ratios'].items()):
+        market_cap_results.append({
+            'Scenario': scenario,
+            'P/E Ratio': pe_ratio,
+            'Net Income ($M)': net_income / 1e6,
+            'Market Cap ($B)': columns['market_cap'][y][s] / 1e9,
+            'Stock Price ($)': columns['stock_price'][y][s]
+        })
+
+    return {
+        'Year': columns['years'][y],
+        'product_valuation': product_results,
+        'robotaxi_network': robotaxi_results,
+        'revenue_breakdown': revenue_breakdown,
+        'total_revenue_million': columns['total_revenue'][y] / 1e6,
+        'market_cap': market_cap_results
+    }
+
+
+def to_yearly_results(user_inputs, arrays):
+    """Build the legacy {'yearly_results': [...]} payload from unbatched evaluate() output."""
+    columns = result_columns(arrays)
+    return {'yearly_results': [year_result(user_inputs, columns, y) for y in range(len(columns['years']))]}
+
+
+def run_valuation(user_inputs):
+    """Vectorized replacement for the per-year loop; returns the same {'yearly_results': [...]} shape."""
+    return to_yearly_results(user_inputs, evaluate(user_inputs))
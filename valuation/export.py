@@ -0,0 +1,159 @@
+"""Typed Arrow tables, Parquet and Arrow IPC files built straight from result arrays.
+
+Tables are assembled column by column from evaluate() (batched or not), sweep_2d() and
+simulate() output with NumPy repeat/tile and reshape, never through per-row Python
+objects. Product and scenario labels become dictionary-encoded columns. Needs
+pyarrow, which is imported on first use.
+"""
+import io
+
+import numpy as np
+
+PRODUCT_METRICS = ('units_sold', 'revenue', 'op_expenses', 'net_revenue', 'gross_profit')
+NETWORK_METRICS = (
+    'network_vehicles', 'utilization_rate', 'utilized_miles_per_car', 'operating_cost_per_mile', 'total_miles',
+    'gross_revenue', 'car_owner_earnings', 'tesla_gross_earnings', 'operating_costs', 'tesla_earnings',
+    'total_revenue', 'net_income', 'shares_outstanding',
+)
+MARKET_METRICS = ('pe_ratio', 'total_revenue', 'net_income', 'market_cap', 'stock_price')
+TABLE_METRICS = {'products': PRODUCT_METRICS, 'network': NETWORK_METRICS, 'market': MARKET_METRICS}
+LABEL_COLUMNS = {'products': ('product',), 'network': (), 'market': ('scenario',)}
+EXPORT_FORMATS = {'parquet': 'application/vnd.apache.parquet', 'arrow': 'application/vnd.apache.arrow.file'}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Arrow and Parquet export requires pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def _batch_shape(arrays):
+    return arrays['total_revenue'].shape[:-1]
+
+
+def table_columns(arrays, table, params=None):
+    """NumPy columns of one result table, plus the labels of its dictionary columns.
+
+    table is 'products' (one row per year and product), 'network' (per year) or 'market'
+    (per year and P/E scenario, with the year's revenue and net income repeated). Batched output gets a leading 'batch' column (the flat
+    batch index) and, for each params path, a column with that input's value per row.
+    Label columns hold integer codes into the returned labels.
+    """
+    years = np.asarray(arrays['years'])
+    batch_shape = _batch_shape(arrays)
+    n = int(np.prod(batch_shape, dtype=np.int64))
+    n_years = len(years)
+    if table == 'products':
+        inner = (len(arrays['products']), n_years)
+        columns = {
+            'year': np.tile(years, n * inner[0]),
+            'product': np.tile(np.repeat(np.arange(inner[0], dtype=np.int32), n_years), n),
+        }
+        columns.update({metric: arrays[metric].reshape(-1) for metric in PRODUCT_METRICS})
+        labels = {'product': tuple(arrays['products'])}
+    elif table == 'network':
+        inner = (n_years,)
+        columns = {'year': np.tile(years, n)}
+        columns.update({metric: arrays[metric].reshape(-1) for metric in NETWORK_METRICS})
+        labels = {}
+    elif table == 'market':
+        n_scenarios = len(arrays['scenarios'])
+        inner = (n_years, n_scenarios)
+        columns = {
+            'year': np.tile(np.repeat(years, n_scenarios), n),
+            'scenario': np.tile(np.arange(n_scenarios, dtype=np.int32), n * n_years),
+            'pe_ratio': np.broadcast_to(np.asarray(arrays['pe_ratios'])[..., np.newaxis, :], batch_shape + inner).reshape(-1),
+            'total_revenue': np.repeat(arrays['total_revenue'].reshape(-1), n_scenarios),
+            'net_income': np.repeat(arrays['net_income'].reshape(-1), n_scenarios),
+            'market_cap': arrays['market_cap'].reshape(-1),
+            'stock_price': arrays['stock_price'].reshape(-1),
+        }
+        labels = {'scenario': tuple(arrays['scenarios'])}
+    else:
+        raise ValueError(f"Unknown table '{table}', expected one of {tuple(TABLE_METRICS)}")
+
+    rows = int(np.prod(inner))
+    if batch_shape:
+        leading = {'batch': np.repeat(np.arange(n, dtype=np.int64), rows)}
+        for path, values in (params or {}).items():
+            leading[path] = np.repeat(np.broadcast_to(np.asarray(values, dtype=float), batch_shape).reshape(-1), rows)
+        columns = {**leading, **columns}
+    return columns, labels
+
+
+def to_arrow(columns, labels=None):
+    """A pyarrow Table from NumPy columns; columns named in labels become dictionary<int32, string>."""
+    pa = _pyarrow()
+    labels = labels or {}
+    fields = {}
+    for name, values in columns.items():
+        if name in labels:
+            fields[name] = pa.DictionaryArray.from_arrays(
+                pa.array(np.asarray(values, dtype=np.int32)), pa.array(list(labels[name]), type=pa.string())
+            )
+        elif name == 'year':
+            fields[name] = pa.array(np.asarray(values, dtype=np.int32))
+        else:
+            fields[name] = pa.array(values)
+    return pa.table(fields)
+
+
+def result_table(arrays, table='market', params=None):
+    """One result table ('products', 'network' or 'market') of evaluate() output as a pyarrow Table."""
+    return to_arrow(*table_columns(arrays, table, params))
+
+
+def sweep_arrow(sweep):
+    """A sweep_2d() result as a pyarrow Table: one row per grid point and P/E scenario."""
+    ny, nx, ns = sweep['values'].shape
+    return to_arrow(
+        {
+            sweep['x_path']: np.tile(np.repeat(np.asarray(sweep['x_values'], dtype=float), ns), ny),
+            sweep['y_path']: np.repeat(np.asarray(sweep['y_values'], dtype=float), nx * ns),
+            'scenario': np.tile(np.arange(ns, dtype=np.int32), nx * ny),
+            sweep['metric']: sweep['values'].reshape(-1),
+        },
+        {'scenario': tuple(sweep['scenarios'])},
+    )
+
+
+def simulation_arrow(simulation):
+    """A simulate() result as a pyarrow Table: one row per percentile, year and P/E scenario.
+
+    Revenue and net income do not depend on the P/E scenario and repeat across it.
+    """
+    percentiles = np.asarray(simulation['percentiles'], dtype=float)
+    years = np.asarray(simulation['years'])
+    shape = (len(percentiles), len(years), len(simulation['scenarios']))
+    columns = {
+        'percentile': np.repeat(percentiles, shape[1] * shape[2]),
+        'year': np.tile(np.repeat(years, shape[2]), shape[0]),
+        'scenario': np.tile(np.arange(shape[2], dtype=np.int32), shape[0] * shape[1]),
+    }
+    for metric in ('revenue', 'net_income'):
+        columns[metric] = np.broadcast_to(np.asarray(simulation[metric])[..., np.newaxis], shape).reshape(-1)
+    for metric in ('market_cap', 'stock_price'):
+        columns[metric] = np.asarray(simulation[metric]).reshape(-1)
+    return to_arrow(columns, {'scenario': tuple(simulation['scenarios'])})
+
+
+def write_table(table, sink, format='parquet', compression='zstd'):
+    """Write a pyarrow Table to a path or binary file as Parquet or as an Arrow IPC file."""
+    pa = _pyarrow()
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, sink, compression=compression)
+    elif format == 'arrow':
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        raise ValueError(f"Unknown format '{format}', expected one of {tuple(EXPORT_FORMATS)}")
+
+
+def table_bytes(table, format='parquet'):
+    """The bytes of a Parquet or Arrow IPC file holding table, e.g. for a download button."""
+    buffer = io.BytesIO()
+    write_table(table, buffer, format)
+    return buffer.getvalue()
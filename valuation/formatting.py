@@ -0,0 +1,95 @@
+import math
+import numbers
+
+import numpy as np
+
+MAGNITUDES = ((1e9, 'B'), (1e6, 'M'), (1e3, 'K'))
+
+
+def human_format(num, precision=2):
+    """Convert a number to a human-readable string (e.g., 1.2M, 3.4B). For $ amounts < 1M, use commas."""
+    if num is None or num == '-' or (isinstance(num, numbers.Real) and math.isnan(num)):
+        return num
+    try:
+        num = float(num)
+    except Exception:
+        return num
+    abs_num = abs(num)
+    if abs_num >= 1_000_000_000:
+        return f"{num/1_000_000_000:.{precision}f}B"
+    elif abs_num >= 1_000_000:
+        return f"{num/1_000_000:.{precision}f}M"
+    elif abs_num >= 1_000:
+        return f"{num/1_000:.{precision}f}K"
+    else:
+        return f"{int(round(num)):,}"
+
+
+def human_format_array(values, scale=1, precision=2, placeholder='-'):
+    """Vectorized human_format for a whole column (after multiplying by scale); NaN becomes placeholder."""
+    values = np.asarray(values, dtype=float) * scale
+    out = np.full(values.shape, placeholder, dtype=object)
+    remaining = ~np.isnan(values)
+    magnitude = np.abs(values)
+    for threshold, suffix in MAGNITUDES:
+        bucket = remaining & (magnitude >= threshold)
+        if bucket.any():
+            out[bucket] = np.char.add(np.char.mod(f'%.{precision}f', values[bucket] / threshold), suffix)
+        remaining &= ~bucket
+    if remaining.any():
+        # Below 1,000 (up to rounding) this is the plain integer format
+        out[remaining] = integer_format_array(values[remaining])
+    return out
+
+
+def integer_format_array(values, placeholder='-'):
+    """Vectorized f"{int(round(x)):,}" for a whole column; NaN becomes placeholder."""
+    values = np.asarray(values, dtype=float)
+    out = np.full(values.shape, placeholder, dtype=object)
+    finite = np.isfinite(values)
+    if not finite.any():
+        return out
+    rounded = np.round(values[finite])
+    n = np.abs(rounded).astype(np.int64)
+    groups = max(1, (len(str(int(n.max()))) + 2) // 3)
+    text = (n // 1000 ** (groups - 1)).astype(str)
+    started = n >= 1000 ** (groups - 1)
+    # Append three-digit groups from the most significant down, zero-padded once a number has started
+    for g in range(groups - 2, -1, -1):
+        group = ((n // 1000 ** g) % 1000).astype(str)
+        text = np.where(started, np.char.add(np.char.add(text, ','), np.char.zfill(group, 3)), group)
+        started |= n >= 1000 ** g
+    out[finite] = np.char.add(np.where(rounded < 0, '-', ''), text)
+    return out
+
+
+def format_columns(table, formats):
+    """Display strings for the columns of a {column: values} table named in formats.
+
+    formats maps a column to ('human', scale) or ('integer',); other columns are left out.
+    """
+    display = {}
+    for column, spec in formats.items():
+        if column not in table:
+            continue
+        if spec[0] == 'human':
+            display[column] = human_format_array(table[column], scale=spec[1])
+        elif spec[0] == 'integer':
+            display[column] = integer_format_array(table[column])
+        else:
+            raise ValueError(f"Unknown column format '{spec[0]}'")
+    return display
+
+
+def input_label(path):
+    """Readable label for a dotted input path, e.g. 'products.Cars.growth_rate' -> 'Cars Growth Rate'."""
+    section, _, rest = path.partition('.')
+    if section == 'robotaxi_network':
+        rest = f"Robotaxi Network {rest}"
+    elif section == 'fleet_cohorts':
+        rest = f"Fleet {rest}"
+    elif section == 'pe_ratios':
+        rest = f"{rest} P/E"
+    elif not rest:
+        rest = section
+    return rest.replace('.', ' ').replace('_', ' ').title()
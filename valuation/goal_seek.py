@@ -0,0 +1,111 @@
+import numpy as np
+
+from .engine import COMPLEX_STEP, evaluate, flatten_inputs
+
+GOAL_METRICS = ('stock_price', 'market_cap', 'net_income', 'total_revenue')
+
+
+def _metric_at(user_inputs, path, x, metric, year_index, scenario_index):
+    """Metric value for each candidate x, where x[..., k] is solved under scenario_index[k]."""
+    values = evaluate(user_inputs, {path: x.reshape(-1)})[metric]
+    if values.ndim == 3:
+        return values[np.arange(x.size), year_index, np.tile(scenario_index, x.size // scenario_index.size)].reshape(x.shape)
+    return values[:, year_index].reshape(x.shape)
+
+
+def goal_seek(user_inputs, path, targets, metric='stock_price', year=None, scenarios=None, bracket=None, xtol=1e-10, rtol=1e-10, max_iter=100, max_expand=30):
+    """Solve for the value of one input that makes metric hit each target.
+
+    Every (target, scenario) pair is solved at once with a batched, safeguarded Newton
+    iteration: each step is one complex-step engine call that returns the metric and its
+    exact derivative, and falls back to bisection whenever the Newton step would leave
+    the bracket. The bracket defaults
+    to a window around the current value that is widened until it contains a sign
+    change. Pairs that cannot be bracketed come back as NaN with converged False.
+    year defaults to the final projection year, scenarios to every P/E scenario.
+    """
+    if metric not in GOAL_METRICS:
+        raise ValueError(f"Unknown goal metric '{metric}', expected one of {GOAL_METRICS}")
+    flat = flatten_inputs(user_inputs)
+    if path not in flat:
+        raise KeyError(f"Unknown input path: {path}")
+    years = list(user_inputs['years'])
+    year_index = len(years) - 1 if year is None else years.index(year)
+    all_scenarios = list(user_inputs['pe_ratios'])
+    scenarios = all_scenarios if scenarios is None else list(scenarios)
+    scenario_index = np.array([all_scenarios.index(s) for s in scenarios])
+    targets = np.atleast_1d(np.asarray(targets, dtype=float))
+    shape = (targets.size, len(scenarios))
+    target = np.broadcast_to(targets[:, np.newaxis], shape)
+
+    def residual(x):
+        # Wide brackets can overflow the compounding terms; those points simply never bracket a root
+        with np.errstate(over='ignore', invalid='ignore'):
+            return _metric_at(user_inputs, path, x, metric, year_index, scenario_index) - target
+
+    def residual_and_slope(x):
+        # The imaginary part of a complex-step evaluation is the exact derivative
+        with np.errstate(over='ignore', invalid='ignore'):
+            values = _metric_at(user_inputs, path, x + COMPLEX_STEP * 1j, metric, year_index, scenario_index)
+        return values.real - target, values.imag / COMPLEX_STEP
+
+    # Bracket the root, widening a window around the current value until the residual changes sign
+    current = float(flat[path])
+    if bracket is None:
+        width = max(abs(current), 1.0)
+        lo, hi = np.full(shape, current - width), np.full(shape, current + width)
+    else:
+        lo, hi = np.full(shape, float(bracket[0])), np.full(shape, float(bracket[1]))
+    f_lo, f_hi = residual(lo), residual(hi)
+    evaluations = 2
+    for _ in range(max_expand if bracket is None else 0):
+        open_ = np.sign(f_lo) == np.sign(f_hi)
+        if not open_.any():
+            break
+        width = hi - lo
+        lo = np.where(open_, lo - width / 2, lo)
+        hi = np.where(open_, hi + width / 2, hi)
+        f_lo, f_hi = residual(lo), residual(hi)
+        evaluations += 1
+    bracketed = (np.sign(f_lo) != np.sign(f_hi)) & np.isfinite(f_lo) & np.isfinite(f_hi)
+
+    # Newton from the end with the smaller residual; the bracket shrinks around the root
+    # every step, and a step that would leave it is replaced by the bracket's midpoint
+    x = np.where(np.abs(f_lo) < np.abs(f_hi), lo, hi)
+    done = ~bracketed | (f_lo == 0) | (f_hi == 0)
+    f_x, slope = residual_and_slope(x)
+    evaluations += 1
+    iterations = 0
+    while not done.all() and iterations < max_iter:
+        iterations += 1
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = x - f_x / slope
+            inside = (newton - lo) * (newton - hi) < 0
+        step = np.where(done, x, np.where(inside, newton, (lo + hi) / 2))
+        f_step, slope_step = residual_and_slope(step)
+        evaluations += 1
+        keep_lo = done | (np.sign(f_step) != np.sign(f_lo))
+        keep_hi = done | ~keep_lo
+        lo, f_lo = np.where(keep_lo, lo, step), np.where(keep_lo, f_lo, f_step)
+        hi, f_hi = np.where(keep_hi, hi, step), np.where(keep_hi, f_hi, f_step)
+        moved = np.abs(step - x)
+        x, f_x, slope = np.where(done, x, step), np.where(done, f_x, f_step), np.where(done, slope, slope_step)
+        done |= (
+            (np.abs(f_step) <= rtol * np.maximum(np.abs(target), 1.0))
+            | (np.abs(hi - lo) <= xtol * np.maximum(np.abs(x), 1.0))
+            | (moved <= xtol * np.maximum(np.abs(x), 1.0))
+        )
+
+    converged = bracketed & done
+    return {
+        'path': path,
+        'metric': metric,
+        'year': years[year_index],
+        'scenarios': scenarios,
+        'targets': targets,
+        'values': np.where(converged, x, np.nan),
+        'converged': converged,
+        'residual': np.where(converged, residual(x), np.nan),
+        'iterations': iterations,
+        'evaluations': evaluations + 1,
+    }
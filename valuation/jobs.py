@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobLimitError(Exception):
+    pass
+
+
+class Job:
+    """One analysis split into tasks that run on a JobPool; combine(results) builds its result.
+
+    Only a few of a job's tasks sit in the executor at a time, and each finished task
+    submits the next, so concurrent jobs take turns on the workers instead of queueing
+    behind each other.
+    """
+
+    def __init__(self, executor, tasks, combine, in_flight):
+        self._executor = executor
+        self._tasks = list(tasks)
+        self._combine = combine
+        self._results = [None] * len(self._tasks)
+        self._futures = {}
+        self._next = 0
+        self._finished = 0
+        self._error = None
+        # Re-entrant: a done callback can run synchronously inside submit() or cancel()
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self.cancelled = False
+        with self._lock:
+            for _ in range(min(in_flight, len(self._tasks))):
+                self._submit_next()
+
+    def _submit_next(self):
+        index = self._next
+        self._next += 1
+        fn, args = self._tasks[index]
+        future = self._executor.submit(fn, *args)
+        self._futures[future] = index
+        future.add_done_callback(self._task_done)
+
+    def _task_done(self, future):
+        with self._lock:
+            index = self._futures.pop(future)
+            if not self.cancelled and self._error is None:
+                try:
+                    self._results[index] = future.result()
+                    self._finished += 1
+                    if self._next < len(self._tasks):
+                        self._submit_next()
+                except CancelledError:
+                    pass
+                except Exception as exc:
+                    self._error = exc
+            self._changed.notify_all()
+
+    @property
+    def progress(self):
+        return self._finished / len(self._tasks) if self._tasks else 1.0
+
+    def done(self):
+        return self.cancelled or self._error is not None or self._finished == len(self._tasks)
+
+    def cancel(self):
+        """Drop the tasks that have not started; running ones finish but are discarded."""
+        with self._lock:
+            if self.done():
+                return
+            self.cancelled = True
+            for future in list(self._futures):
+                future.cancel()
+            self._changed.notify_all()
+
+    def result(self, progress=None, poll=0.1):
+        """Block until every task is done, calling progress(fraction) as they finish."""
+        reported = None
+        while True:
+            with self._lock:
+                if not self.done():
+                    self._changed.wait(poll)
+                fraction, finished = self.progress, self.done()
+            if progress is not None and fraction != reported:
+                progress(fraction)
+                reported = fraction
+            if finished:
+                break
+        if self.cancelled:
+            raise JobCancelled("The job was cancelled")
+        if self._error is not None:
+            raise self._error
+        return self._combine(self._results)
+
+
+class JobPool:
+    """A process pool shared by every session of the server.
+
+    Jobs are keyed by (session, name): submitting a job cancels the same session's
+    previous job of that name, which a newer rerun has superseded. A session may run at
+    most max_jobs_per_session jobs at once.
+    """
+
+    def __init__(self, workers=None, max_jobs_per_session=2, in_flight=None):
+        self.workers = workers or os.cpu_count() or 1
+        # Spawned workers import only the valuation engine, and avoid forking a threaded server
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.max_jobs_per_session = max_jobs_per_session
+        self.in_flight = in_flight or self.workers
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session, name, tasks, combine=list):
+        """Start tasks, a list of (fn, args) with picklable top-level fn, as a Job."""
+        with self._lock:
+            previous = self._jobs.pop((session, name), None)
+            if previous is not None:
+                previous.cancel()
+            self._jobs = {key: job for key, job in self._jobs.items() if not job.done()}
+            running = sum(1 for key in self._jobs if key[0] == session)
+            if running >= self.max_jobs_per_session:
+                raise JobLimitError(f"At most {self.max_jobs_per_session} analyses can run at once per session")
+            job = Job(self._executor, tasks, combine, self.in_flight)
+            self._jobs[(session, name)] = job
+            return job
+
+    def active(self):
+        """Number of unfinished jobs across all sessions."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if not job.done())
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .engine import evaluate, flatten_inputs
+from .sketches import QuantileSketch
+
+DISTRIBUTIONS = ('normal', 'lognormal', 'triangular', 'uniform')
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+# Result arrays (engine key) summarized per simulation metric
+METRICS = {'revenue': 'total_revenue', 'net_income': 'net_income', 'market_cap': 'market_cap', 'stock_price': 'stock_price'}
+# Above this many bytes of stored draws, method='auto' streams them into sketches instead
+EXACT_MEMORY_LIMIT = 256 * 2**20
+
+
+def spread_distribution(dist, value, spread):
+    """Build a distribution spec centred on a point estimate, with spread as a fraction of the value."""
+    if dist == 'normal':
+        return {'dist': 'normal', 'mean': value, 'std': abs(value) * spread}
+    if dist == 'lognormal':
+        return {'dist': 'lognormal', 'median': value, 'sigma': spread}
+    if dist == 'triangular':
+        low, high = sorted((value * (1 - spread), value * (1 + spread)))
+        return {'dist': 'triangular', 'low': low, 'mode': value, 'high': high}
+    if dist == 'uniform':
+        low, high = sorted((value * (1 - spread), value * (1 + spread)))
+        return {'dist': 'uniform', 'low': low, 'high': high}
+    raise ValueError(f"Unknown distribution '{dist}', expected one of {DISTRIBUTIONS}")
+
+
+def sample(spec, size, rng):
+    """Draw size values from a distribution spec such as {'dist': 'normal', 'mean': 0.05, 'std': 0.01}."""
+    dist = spec['dist']
+    if dist == 'normal':
+        values = rng.normal(spec['mean'], spec['std'], size)
+    elif dist == 'lognormal':
+        values = spec['median'] * np.exp(spec['sigma'] * rng.standard_normal(size))
+    elif dist == 'triangular':
+        if spec['low'] == spec['high']:
+            values = np.full(size, float(spec['mode']))
+        else:
+            values = rng.triangular(spec['low'], spec['mode'], spec['high'], size)
+    elif dist == 'uniform':
+        values = rng.uniform(spec['low'], spec['high'], size)
+    else:
+        raise ValueError(f"Unknown distribution '{dist}', expected one of {DISTRIBUTIONS}")
+    if 'min' in spec or 'max' in spec:
+        values = np.clip(values, spec.get('min', -np.inf), spec.get('max', np.inf))
+    return values
+
+
+def _check_paths(user_inputs, distributions):
+    flat = flatten_inputs(user_inputs)
+    unknown = sorted(set(distributions) - set(flat))
+    if unknown:
+        raise KeyError(f"Unknown input path(s): {', '.join(unknown)}")
+
+
+def _chunks(user_inputs, distributions, draws, rng, chunk_size):
+    """Yield (size, evaluate() arrays) for successive batches of sampled draws."""
+    for start in range(0, draws, chunk_size):
+        size = min(chunk_size, draws - start)
+        params = {path: sample(spec, size, rng) for path, spec in distributions.items()}
+        yield size, evaluate(user_inputs, params)
+
+
+def simulate_sketches(user_inputs, distributions, draws, seed=None, chunk_size=50_000, relative_accuracy=0.01):
+    """Stream draws through the engine into one QuantileSketch per metric.
+
+    Memory stays the same whatever the number of draws. seed may be a
+    numpy.random.SeedSequence, so parallel workers can each take a spawned child and
+    their sketches be combined with merge_sketches.
+    """
+    _check_paths(user_inputs, distributions)
+    rng = np.random.default_rng(seed)
+    shapes = {
+        'revenue': (len(user_inputs['years']),),
+        'net_income': (len(user_inputs['years']),),
+        'market_cap': (len(user_inputs['years']), len(user_inputs['pe_ratios'])),
+        'stock_price': (len(user_inputs['years']), len(user_inputs['pe_ratios'])),
+    }
+    sketches = {metric: QuantileSketch(shape, relative_accuracy) for metric, shape in shapes.items()}
+    for size, arrays in _chunks(user_inputs, distributions, draws, rng, chunk_size):
+        for metric, key in METRICS.items():
+            sketches[metric].add(np.broadcast_to(arrays[key], (size,) + shapes[metric]))
+    return sketches
+
+
+def split_draws(draws, parts, seed=None):
+    """(draws, seed) per part: near-equal shares of draws with independent spawned seed sequences."""
+    shares = [draws // parts + (i < draws % parts) for i in range(parts)]
+    return [(share, child) for share, child in zip(shares, np.random.SeedSequence(seed).spawn(parts)) if share]
+
+
+def merge_sketches(parts):
+    """Combine the simulate_sketches() results of several workers."""
+    parts = list(parts)
+    merged = parts[0]
+    for part in parts[1:]:
+        for metric, sketch in part.items():
+            merged[metric].merge(sketch)
+    return merged
+
+
+def summarize_sketches(user_inputs, sketches, draws, percentiles=DEFAULT_PERCENTILES):
+    """The simulate() result for sketches from simulate_sketches()/merge_sketches()."""
+    return {
+        'years': list(user_inputs['years']),
+        'scenarios': list(user_inputs['pe_ratios']),
+        'draws': draws,
+        'method': 'sketch',
+        'percentiles': list(percentiles),
+        **{metric: sketch.percentile(percentiles) for metric, sketch in sketches.items()},
+        'mean_stock_price': sketches['stock_price'].mean,
+        'sketches': sketches,
+    }
+
+
+def _simulate_exact(user_inputs, distributions, draws, percentiles, seed, chunk_size):
+    rng = np.random.default_rng(seed)
+    n_years = len(user_inputs['years'])
+    n_scenarios = len(user_inputs['pe_ratios'])
+    # Keep the draws in float32: percentile bands do not need double precision and it halves memory
+    stored = {
+        'revenue': np.empty((draws, n_years), dtype=np.float32),
+        'net_income': np.empty((draws, n_years), dtype=np.float32),
+        'market_cap': np.empty((draws, n_years, n_scenarios), dtype=np.float32),
+        'stock_price': np.empty((draws, n_years, n_scenarios), dtype=np.float32),
+    }
+    start = 0
+    for size, arrays in _chunks(user_inputs, distributions, draws, rng, chunk_size):
+        for metric, key in METRICS.items():
+            stored[metric][start:start + size] = np.broadcast_to(arrays[key], (size,) + stored[metric].shape[1:])
+        start += size
+    q = np.asarray(percentiles, dtype=float)
+    bands = {metric: np.percentile(values, q, axis=0) for metric, values in stored.items()}
+    return bands, stored['stock_price'].mean(axis=0, dtype=np.float64)
+
+
+def simulate(user_inputs, distributions, draws=100_000, percentiles=DEFAULT_PERCENTILES, seed=None, chunk_size=50_000, method='auto', workers=0):
+    """Monte Carlo valuation: sample every assumption in distributions and return per-year percentile bands.
+
+    distributions maps dotted input paths (see flatten_inputs) to distribution specs.
+    Draws are evaluated in batches of chunk_size through the vectorized engine. Returned
+    bands have shape (percentiles, years) for revenue and net income and
+    (percentiles, years, scenarios) for market cap and stock price, in dollars.
+
+    method='exact' keeps every draw and takes exact percentiles; 'sketch' streams the
+    draws into mergeable quantile sketches (within 1% relative error) so memory does not
+    grow with draws, and splits them over workers processes when workers > 0. 'auto'
+    sketches once the stored draws would exceed EXACT_MEMORY_LIMIT.
+    """
+    _check_paths(user_inputs, distributions)
+    n_years = len(user_inputs['years'])
+    n_scenarios = len(user_inputs['pe_ratios'])
+    if method == 'auto':
+        stored_bytes = draws * (2 * n_years + 2 * n_years * n_scenarios) * 4
+        method = 'sketch' if workers or stored_bytes > EXACT_MEMORY_LIMIT else 'exact'
+    if method == 'sketch':
+        if workers:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(simulate_sketches, user_inputs, distributions, share, child, chunk_size) for share, child in split_draws(draws, workers, seed)]
+                sketches = merge_sketches(future.result() for future in futures)
+        else:
+            sketches = simulate_sketches(user_inputs, distributions, draws, seed, chunk_size)
+        return summarize_sketches(user_inputs, sketches, draws, percentiles)
+    if method != 'exact':
+        raise ValueError(f"Unknown method '{method}', expected 'auto', 'exact' or 'sketch'")
+
+    bands, mean_stock_price = _simulate_exact(user_inputs, distributions, draws, percentiles, seed, chunk_size)
+    return {
+        'years': list(user_inputs['years']),
+        'scenarios': list(user_inputs['pe_ratios']),
+        'draws': draws,
+        'method': method,
+        'percentiles': list(percentiles),
+        **bands,
+        'mean_stock_price': mean_stock_price,
+        'sketches': None,
+    }
@@ -0,0 +1,193 @@
+import numpy as np
+
+from .engine import evaluate, result_columns, segment_kind, year_result
+from .formatting import format_columns
+
+# Display formats for the per-year tables: ('human', scale back to dollars) or ('integer',)
+TABLE_FORMATS = {
+    'product': {
+        'Units Sold': ('integer',),
+        'Sale Price ($)': ('integer',),
+        'Revenue ($M)': ('human', 1e6),
+        'Gross Profit ($M)': ('human', 1e6),
+        'Operating Expenses ($M)': ('human', 1e6),
+    },
+    'robotaxi': {
+        'Network Vehicles': ('integer',),
+        'Miles per Car (Utilized)': ('integer',),
+        'Miles per Car': ('integer',),
+        'Gross Revenue ($M)': ('human', 1e6),
+        'Car Owner Earnings ($M)': ('human', 1e6),
+        'Tesla Gross Earnings ($M)': ('human', 1e6),
+        'Operating Costs ($M)': ('human', 1e6),
+        'Tesla Net Earnings ($M)': ('human', 1e6),
+        'Tesla Earnings per Year ($M)': ('human', 1e6),
+    },
+    'revenue': {
+        'Revenue ($M)': ('human', 1e6),
+    },
+    'market': {
+        'Net Income ($M)': ('human', 1e6),
+        'Market Cap ($B)': ('human', 1e9),
+        'Stock Price ($)': ('human', 1),
+    },
+}
+
+
+class ValuationResult:
+    """Columnar valuation output for one scenario.
+
+    Wraps the evaluate() arrays, indexed by year, product and P/E scenario, so tables,
+    charts and exports read them directly. The legacy nested yearly_results payload is
+    only built, one year at a time and on demand, for JSON consumers.
+    """
+
+    def __init__(self, user_inputs, arrays):
+        self.user_inputs = user_inputs
+        self.arrays = arrays
+        self._columns = None
+        self._year_results = {}
+        self._formatted = {}
+        self._exports = {}
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    @property
+    def years(self):
+        return [int(year) for year in self.arrays['years']]
+
+    @property
+    def products(self):
+        return list(self.arrays['products'])
+
+    @property
+    def scenarios(self):
+        return list(self.arrays['scenarios'])
+
+    def year_index(self, year):
+        return self.years.index(year)
+
+    # Legacy nested payload, built lazily
+
+    def year_result(self, y):
+        """The legacy yearly_results entry for year index y."""
+        y = range(len(self.arrays['years']))[y]
+        if y not in self._year_results:
+            if self._columns is None:
+                self._columns = result_columns(self.arrays)
+            self._year_results[y] = year_result(self.user_inputs, self._columns, y)
+        return self._year_results[y]
+
+    @property
+    def yearly_results(self):
+        return [self.year_result(y) for y in range(len(self.arrays['years']))]
+
+    def to_dict(self):
+        return {'yearly_results': self.yearly_results}
+
+    # Per-year tables as {column: values}, in the units the UI shows
+
+    def product_table(self, y):
+        products = self.user_inputs['products']
+        toggles = self.user_inputs['toggles']
+        table = {
+            'Product': self.products,
+            'Units Sold': self.arrays['units_sold'][:, y],
+            'Sale Price ($)': np.array([data['sale_price'] if segment_kind(data) == 'units' else np.nan for data in products.values()], dtype=float),
+            'Gross Margin (%)': np.array([data['gross_margin'] for data in products.values()], dtype=float) * 100,
+            'Revenue ($M)': self.arrays['net_revenue'][:, y] / 1e6,
+            'Gross Profit ($M)': self.arrays['gross_profit'][:, y] / 1e6,
+        }
+        if any(toggles[product] for product in products):
+            table['Operating Expenses ($M)'] = self.arrays['op_expenses'][:, y] / 1e6
+        return table
+
+    def robotaxi_table(self, y):
+        network = self.user_inputs.get('robotaxi_network')
+        a = self.arrays
+        if not network:
+            return {}
+        if self.user_inputs['toggles'].get('Robotaxi Network', False):
+            row = {
+                'Network Vehicles': a['network_vehicles'][y],
+                'Miles per Car (Utilized)': a['utilized_miles_per_car'][y],
+                'Utilization Rate (%)': a['utilization_rate'][y] * 100,
+                'Rider Pays per Mile ($)': network['rider_pays_per_mile'],
+                'Car Owner Cut per Mile ($)': network['car_owner_cut_per_mile'],
+                'Tesla Cut per Mile ($)': network['tesla_cut_per_mile'],
+                'Operating Cost per Mile ($)': a['operating_cost_per_mile'][y],
+                'Gross Revenue ($M)': a['gross_revenue'][y] / 1e6,
+                'Car Owner Earnings ($M)': a['car_owner_earnings'][y] / 1e6,
+                'Tesla Gross Earnings ($M)': a['tesla_gross_earnings'][y] / 1e6,
+                'Operating Costs ($M)': a['operating_costs'][y] / 1e6,
+                'Tesla Net Earnings ($M)': a['tesla_earnings'][y] / 1e6,
+            }
+        else:
+            row = {
+                'Network Vehicles': a['network_vehicles'][y],
+                'Miles per Car': network['miles_per_car'],
+                'Rider Pays per Mile ($)': network['rider_pays_per_mile'],
+                'Car Owner Cut per Mile ($)': network['car_owner_cut_per_mile'],
+                'Tesla Cut per Mile ($)': network['tesla_cut_per_mile'],
+                'Tesla Earnings per Year ($M)': a['tesla_earnings'][y] / 1e6,
+            }
+        return {column: [value] for column, value in row.items()}
+
+    def revenue_table(self, y):
+        if not self.user_inputs.get('robotaxi_network'):
+            return {'Category': self.products, 'Revenue ($M)': self.arrays['net_revenue'][:, y] / 1e6}
+        return {
+            'Category': self.products + ['Robotaxi Network'],
+            'Revenue ($M)': np.append(self.arrays['net_revenue'][:, y], self.arrays['tesla_earnings'][y]) / 1e6,
+        }
+
+    def market_table(self, y):
+        n_scenarios = len(self.arrays['scenarios'])
+        return {
+            'Scenario': self.scenarios,
+            'P/E Ratio': list(self.user_inputs['pe_ratios'].values()),
+            'Net Income ($M)': np.full(n_scenarios, self.arrays['net_income'][y] / 1e6),
+            'Market Cap ($B)': self.arrays['market_cap'][y] / 1e9,
+            'Stock Price ($)': self.arrays['stock_price'][y],
+        }
+
+    def formatted_table(self, name, y):
+        """(table, display) for one of the per-year tables, where display holds the formatted strings
+        of its TABLE_FORMATS columns. The table itself stays numeric so it sorts by value.
+
+        Results are shared per input hash, so each table is formatted once per result.
+        """
+        y = range(len(self.arrays['years']))[y]
+        key = (name, y)
+        if key not in self._formatted:
+            table = getattr(self, f'{name}_table')(y)
+            self._formatted[key] = table, format_columns(table, TABLE_FORMATS[name])
+        return self._formatted[key]
+
+    # Tidy columns for exports
+
+    def export_bytes(self, table, file_format='parquet'):
+        """A Parquet or Arrow IPC file of one export table ('market', 'products' or 'network'), built once per result."""
+        key = (table, file_format)
+        if key not in self._exports:
+            from .export import result_table, table_bytes
+            self._exports[key] = table_bytes(result_table(self.arrays, table), file_format)
+        return self._exports[key]
+
+    def market_columns(self):
+        """One row per (year, P/E scenario): year, scenario, total_revenue, net_income, market_cap, stock_price."""
+        n_years, n_scenarios = self.arrays['market_cap'].shape
+        return {
+            'year': np.repeat(self.arrays['years'], n_scenarios),
+            'scenario': np.tile(np.asarray(self.arrays['scenarios'], dtype=object), n_years),
+            'total_revenue': np.repeat(self.arrays['total_revenue'], n_scenarios),
+            'net_income': np.repeat(self.arrays['net_income'], n_scenarios),
+            'market_cap': self.arrays['market_cap'].reshape(-1),
+            'stock_price': self.arrays['stock_price'].reshape(-1),
+        }
+
+
+def compute_valuation(user_inputs):
+    """Evaluate user_inputs and return a columnar ValuationResult."""
+    return ValuationResult(user_inputs, evaluate(user_inputs))
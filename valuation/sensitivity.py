@@ -0,0 +1,140 @@
+import numpy as np
+
+from .engine import evaluate, flatten_inputs
+
+SENSITIVITY_SECTIONS = ('products.', 'robotaxi_network.', 'fleet_cohorts.', 'pe_ratios.')
+SENSITIVITY_SCALARS = ('net_profit_margin', 'shares_growth_rate', 'base_shares_outstanding')
+
+
+def sensitivity_paths(user_inputs):
+    """Dotted paths of the scalar assumptions the sensitivity analyses perturb by default.
+
+    Every assumption is included, P/E ratios and the base share count among them; a
+    P/E ratio only moves the price of its own scenario. Per-year override values and
+    points are edits of single years rather than assumptions and are left out.
+    """
+    return [
+        path for path in flatten_inputs(user_inputs)
+        if path.startswith(SENSITIVITY_SECTIONS) or path in SENSITIVITY_SCALARS
+    ]
+
+
+def one_at_a_time(user_inputs, pct=0.10, paths=None):
+    """Perturb each assumption by -pct and +pct and measure the final-year stock price per P/E scenario.
+
+    All 2 * len(paths) perturbed models plus the base case are stacked into one batch
+    and evaluated with a single engine call. Returns the base prices (scenarios,), the
+    low/high prices (paths, scenarios) and each scenario's ranking of paths by swing.
+    """
+    flat = flatten_inputs(user_inputs)
+    paths = list(paths) if paths is not None else sensitivity_paths(user_inputs)
+    size = 2 * len(paths) + 1
+    params = {}
+    for i, path in enumerate(paths):
+        values = np.full(size, float(flat[path]))
+        values[2 * i + 1] *= 1 - pct
+        values[2 * i + 2] *= 1 + pct
+        params[path] = values
+    final_price = evaluate(user_inputs, params)['stock_price'][:, -1, :]
+    low = final_price[1::2]
+    high = final_price[2::2]
+    swing = np.abs(high - low)
+    return {
+        'paths': paths,
+        'scenarios': list(user_inputs['pe_ratios']),
+        'pct': pct,
+        'base': final_price[0],
+        'low': low,
+        'high': high,
+        'swing': swing,
+        'ranking': np.argsort(-swing, axis=0, kind='stable'),
+    }
+
+
+def elasticities(user_inputs, paths=None):
+    """Exact derivatives and elasticities of the final-year stock price per P/E scenario.
+
+    One evaluate(..., jacobian=paths) call replaces the 2 * len(paths) perturbed runs of
+    one_at_a_time. gradient[i, s] is d price / d input i, elasticity[i, s] the percent
+    change in price per percent change in input i (NaN where the input or price is 0).
+    """
+    flat = flatten_inputs(user_inputs)
+    paths = list(paths) if paths is not None else sensitivity_paths(user_inputs)
+    arrays = evaluate(user_inputs, jacobian=paths)
+    price = arrays['stock_price'][-1]
+    gradient = arrays['stock_price_jacobian'][:, -1, :]
+    x = np.array([float(flat[path]) for path in paths])[:, np.newaxis]
+    elasticity = np.divide(gradient * x, price, out=np.full(gradient.shape, np.nan), where=(x != 0) & (price != 0))
+    return {
+        'paths': paths,
+        'scenarios': list(user_inputs['pe_ratios']),
+        'base': price,
+        'gradient': gradient,
+        'elasticity': elasticity,
+        'ranking': np.argsort(-np.nan_to_num(np.abs(elasticity), nan=-np.inf), axis=0, kind='stable'),
+    }
+
+
+def _unit_samples(n, dims, seed):
+    """n points in [0, 1)^dims: scrambled Sobol when SciPy is installed, else pseudo-random."""
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        return np.random.default_rng(seed).random((n, dims)), 'random'
+    # Sobol points keep their balance properties for powers of two
+    return qmc.Sobol(dims, scramble=True, seed=seed).random_base2(int(np.ceil(np.log2(n)))), 'sobol'
+
+
+def sobol_indices(user_inputs, ranges=None, pct=0.10, n=1024, paths=None, seed=None, chunk_size=50_000):
+    """First-order and total Sobol indices of the final-year stock price per P/E scenario.
+
+    Each input varies uniformly over ranges[path] = (low, high), by default +/-pct around
+    its current value. Uses Saltelli's scheme: base matrices A and B from a 2k-dimensional
+    low-discrepancy sequence plus one A-with-column-i-from-B matrix per input, so
+    n * (k + 2) model runs, evaluated as batches through the engine. n is rounded up to a
+    power of two. first_order and total have shape (paths, scenarios); first_order
+    estimates are Saltelli (2010), total ones Jansen (1999).
+    """
+    flat = flatten_inputs(user_inputs)
+    paths = list(paths) if paths is not None else sensitivity_paths(user_inputs)
+    if ranges is None:
+        ranges = {path: sorted((flat[path] * (1 - pct), flat[path] * (1 + pct))) for path in paths}
+    low = np.array([ranges[path][0] for path in paths], dtype=float)
+    high = np.array([ranges[path][1] for path in paths], dtype=float)
+    k = len(paths)
+    samples, sampler = _unit_samples(n, 2 * k, seed)
+    n = len(samples)
+    a = low + samples[:, :k] * (high - low)
+    b = low + samples[:, k:] * (high - low)
+
+    # Runs are laid out as blocks of n rows: A, B, then AB_i for each input i
+    total_runs = n * (k + 2)
+    outputs = []
+    for start in range(0, total_runs, chunk_size):
+        rows = np.arange(start, min(start + chunk_size, total_runs))
+        block, j = rows // n, rows % n
+        params = {
+            path: np.where((block == 1) | (block == i + 2), b[j, i], a[j, i])
+            for i, path in enumerate(paths)
+        }
+        outputs.append(evaluate(user_inputs, params)['stock_price'][:, -1, :])
+    y = np.concatenate(outputs).reshape(k + 2, n, -1)
+    f_a, f_b, f_ab = y[0], y[1], y[2:]
+
+    variance = np.var(np.concatenate([f_a, f_b]), axis=0)
+    first_order = np.mean(f_b * (f_ab - f_a), axis=1)
+    total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1)
+    defined = variance > 0
+    first_order = np.divide(first_order, variance, out=np.full(first_order.shape, np.nan), where=defined)
+    total = np.divide(total, variance, out=np.full(total.shape, np.nan), where=defined)
+    return {
+        'paths': paths,
+        'scenarios': list(user_inputs['pe_ratios']),
+        'ranges': {path: (float(lo), float(hi)) for path, lo, hi in zip(paths, low, high)},
+        'first_order': first_order,
+        'total': total,
+        'ranking': np.argsort(-np.nan_to_num(total, nan=-np.inf), axis=0, kind='stable'),
+        'n': n,
+        'evaluations': total_runs,
+        'sampler': sampler,
+    }
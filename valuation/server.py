@@ -0,0 +1,330 @@
+"""Standalone asyncio HTTP JSON API serving valuations, no Streamlit involved.
+
+    python -m valuation.server --port 8000
+    curl -s -X POST --data @user_inputs.json http://127.0.0.1:8000/valuation
+    python -m valuation.server --load-test 5000 --concurrency 64 --url http://127.0.0.1:8000
+
+POST /valuation takes one user_inputs dict and returns its {'yearly_results': [...]}
+payload, or a JSON list of user_inputs and returns a list of payloads (an entry that
+fails holds {'error': ...} instead). Identical requests in flight at the same time share
+one evaluation, and results are kept in an LRU cache keyed by canonical_hash.
+GET /stats reports cache counters and latency percentiles; GET /metrics serves the
+request latency histograms in the Prometheus text format.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .cache import ResultCache, canonical_hash
+from .defaults import default_user_inputs
+from .engine import to_yearly_results
+from .timing import StageMetrics
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+LATENCY_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode_results(scenarios):
+    """Serialized yearly_results payloads (bytes, or the exception) for a list of user_inputs.
+
+    Runs in an executor thread. Scenarios of the same structure are evaluated as one batch;
+    a scenario that fails holds its own exception and leaves the rest of its batch intact.
+    """
+    from .batch import _evaluate_grouped
+    encoded = [None] * len(scenarios)
+    for index, _, user_inputs, arrays in _evaluate_grouped((i, None, s) for i, s in enumerate(scenarios)):
+        try:
+            if isinstance(arrays, Exception):
+                raise arrays
+            encoded[index] = json.dumps(to_yearly_results(user_inputs, arrays)).encode('utf-8')
+        except Exception as exc:
+            encoded[index] = exc
+    return encoded
+
+
+def _error_body(exc):
+    message = str(exc) if isinstance(exc, RequestError) else f"{type(exc).__name__}: {exc}"
+    return json.dumps({'error': message}).encode('utf-8')
+
+
+class ValuationServer:
+    """The API's state: result cache, in-flight requests, latency window and executor."""
+
+    def __init__(self, workers=None, cache_size=4096, cache_ttl=6 * 3600, max_body=16 * 1024 * 1024, latency_window=10_000):
+        self.cache = ResultCache(maxsize=cache_size, ttl=cache_ttl)
+        self.max_body = max_body
+        self.metrics = StageMetrics(prefix='valuation_request_seconds')
+        self.requests = 0
+        self.scenarios = 0
+        self.coalesced = 0
+        self.started = time.time()
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._in_flight = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix='valuation')
+
+    # Results
+
+    async def results(self, scenarios):
+        """Encoded payloads (or exceptions) for a list of user_inputs, from the cache, from an
+        identical request already in flight, or from one executor call for all the rest."""
+        loop = asyncio.get_running_loop()
+        keys = [canonical_hash(user_inputs) for user_inputs in scenarios]
+        results = [self.cache.get(key) for key in keys]
+        waiting = {}
+        owned = {}
+        for index, key in enumerate(keys):
+            if results[index] is not None:
+                continue
+            if key in waiting:
+                waiting[key][1].append(index)
+            elif key in self._in_flight:
+                # Keep the future itself: its owner removes it from _in_flight when it finishes
+                self.coalesced += 1
+                waiting[key] = (self._in_flight[key], [index])
+            else:
+                self._in_flight[key] = owned[key] = loop.create_future()
+                waiting[key] = (owned[key], [index])
+
+        if owned:
+            # Each distinct new scenario is evaluated once, even if it repeats within the request
+            misses = [scenarios[waiting[key][1][0]] for key in owned]
+            try:
+                encoded = await loop.run_in_executor(self._executor, _encode_results, misses)
+            except Exception as exc:
+                encoded = [exc] * len(misses)
+            for (key, future), value in zip(owned.items(), encoded):
+                del self._in_flight[key]
+                if not isinstance(value, Exception):
+                    self.cache.put(key, value)
+                future.set_result(value)
+
+        for future, indexes in waiting.values():
+            value = await asyncio.shield(future)
+            for index in indexes:
+                results[index] = value
+        return results
+
+    # HTTP
+
+    async def route(self, method, path, body):
+        if path == '/valuation':
+            if method != 'POST':
+                raise RequestError(405, "Use POST with a user_inputs JSON body")
+            try:
+                payload = json.loads(body)
+            except ValueError as exc:
+                raise RequestError(400, f"Invalid JSON: {exc}")
+            if isinstance(payload, dict):
+                self.scenarios += 1
+                (result,) = await self.results([payload])
+                if isinstance(result, Exception):
+                    raise RequestError(400, f"{type(result).__name__}: {result}")
+                return 'valuation', result
+            if isinstance(payload, list) and all(isinstance(item, dict) for item in payload):
+                self.scenarios += len(payload)
+                results = await self.results(payload)
+                return 'batch', b'[' + b','.join(_error_body(r) if isinstance(r, Exception) else r for r in results) + b']'
+            raise RequestError(400, "Expected a user_inputs object or a list of them")
+        if method != 'GET':
+            raise RequestError(405, "Use GET")
+        if path == '/health':
+            return None, b'{"status":"ok"}'
+        if path == '/stats':
+            return None, json.dumps(self.stats()).encode('utf-8')
+        if path == '/defaults':
+            return None, json.dumps(default_user_inputs()).encode('utf-8')
+        if path == '/metrics':
+            return None, self.metrics.render().encode('utf-8')
+        raise RequestError(404, f"No route {path}")
+
+    async def handle(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection, keeping it alive between them."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body:
+                    self._respond(writer, 413, _error_body(RequestError(413, f"Bodies are limited to {self.max_body} bytes")), False)
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b''
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+                started = time.perf_counter()
+                path = urlsplit(target).path
+                try:
+                    stage, payload = await self.route(method, path, body)
+                    status = 200
+                except RequestError as exc:
+                    stage, status, payload = 'error', exc.status, _error_body(exc)
+                except Exception as exc:
+                    # A bug must not drop the connection without a response
+                    stage, status, payload = 'error', 500, _error_body(exc)
+                content_type = 'text/plain; version=0.0.4' if path == '/metrics' else 'application/json'
+                self._respond(writer, status, payload, keep_alive, content_type)
+                await writer.drain()
+                if stage is not None:
+                    elapsed = time.perf_counter() - started
+                    self.requests += 1
+                    self._latencies.append(elapsed)
+                    self.metrics.observe({stage: elapsed})
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, status, payload, keep_alive, content_type='application/json'):
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + payload
+        )
+
+    def stats(self):
+        """Request counts, cache counters and latency percentiles (ms) over the recent window."""
+        latencies = np.array(self._latencies) * 1000
+        percentiles = np.percentile(latencies, LATENCY_PERCENTILES) if len(latencies) else [None] * len(LATENCY_PERCENTILES)
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'requests': self.requests,
+            'scenarios': self.scenarios,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+            'cache': self.cache.stats(),
+            'latency_ms': {
+                'window': len(latencies),
+                **{f'p{p:g}': None if value is None else float(value) for p, value in zip(LATENCY_PERCENTILES, percentiles)},
+                'max': float(latencies.max()) if len(latencies) else None,
+            },
+        }
+
+    async def serve(self, host='127.0.0.1', port=8000):
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Serving valuations on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Load test client
+
+async def _request(reader, writer, host, body):
+    writer.write(
+        f"POST /valuation HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def load_test(url, bodies, requests, concurrency):
+    """POST bodies round-robin to url over concurrency keep-alive connections; returns a summary."""
+    parts = urlsplit(url)
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            for i in counter:
+                started = time.perf_counter()
+                if await _request(reader, writer, parts.netloc, bodies[i % len(bodies)]) != 200:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        **{f'p{p:g}_ms': float(value) for p, value in zip(LATENCY_PERCENTILES, np.percentile(latencies, LATENCY_PERCENTILES))},
+    }
+
+
+def _load_test_bodies(distinct, seed=0):
+    """distinct default scenarios with jittered net profit margins, so some requests hit the cache."""
+    rng = np.random.default_rng(seed)
+    bodies = []
+    for margin in rng.uniform(0.1, 0.3, distinct):
+        user_inputs = default_user_inputs()
+        user_inputs['net_profit_margin'] = float(margin)
+        bodies.append(json.dumps(user_inputs).encode('utf-8'))
+    return bodies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m valuation.server', description="Serve valuations over HTTP, or load-test a running server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=None, help="evaluation threads (default: CPU count)")
+    parser.add_argument('--cache-size', type=int, default=4096, help="results kept in the LRU cache")
+    parser.add_argument('--load-test', type=int, metavar='REQUESTS', help="send REQUESTS requests to --url instead of serving")
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--distinct', type=int, default=200, help="distinct scenarios the load test cycles through")
+    args = parser.parse_args(argv)
+
+    if args.load_test:
+        summary = asyncio.run(load_test(args.url, _load_test_bodies(args.distinct), args.load_test, args.concurrency))
+        print(json.dumps(summary, indent=2))
+        return 1 if summary['errors'] else 0
+
+    server = ValuationServer(workers=args.workers, cache_size=args.cache_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
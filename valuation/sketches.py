@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class QuantileSketch:
+    """Streaming, mergeable quantiles and moments for an array of cells (e.g. years x scenarios).
+
+    Values are counted in logarithmic buckets (as in DDSketch), so every quantile is
+    returned within relative_accuracy of a value of the right rank, and memory depends
+    only on the cell shape and the [min_value, max_value] magnitude range, not on how
+    many values were added. Magnitudes below min_value count as zero; above max_value
+    they fall in the top bucket. Sketches built with the same settings merge exactly,
+    so workers can each sketch a slice of the draws and the parent merges them.
+    """
+
+    def __init__(self, shape, relative_accuracy=0.01, min_value=1e-6, max_value=1e18):
+        self.shape = tuple(shape)
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_value = max_value
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self._gamma)
+        self._offset = int(np.floor(np.log(min_value) / self._log_gamma))
+        self._buckets = int(np.ceil(np.log(max_value) / self._log_gamma)) - self._offset + 1
+        cells = int(np.prod(self.shape, dtype=np.int64))
+        # Bucket counts per cell for negative, zero (bucket 0 only) and positive values
+        self.counts = np.zeros((cells, 3, self._buckets), dtype=np.int64)
+        self.count = np.zeros(cells, dtype=np.int64)
+        self._mean = np.zeros(cells)
+        self._m2 = np.zeros(cells)
+        self._min = np.full(cells, np.inf)
+        self._max = np.full(cells, -np.inf)
+
+    def _compatible(self, other):
+        return (
+            self.shape == other.shape
+            and self.relative_accuracy == other.relative_accuracy
+            and self.min_value == other.min_value
+            and self.max_value == other.max_value
+        )
+
+    def add(self, values):
+        """Add a batch of values with shape (n,) + shape. NaNs are skipped."""
+        values = np.asarray(values, dtype=float).reshape(-1, len(self.count))
+        valid = ~np.isnan(values)
+        complete = valid.all()
+        n = np.full(len(self.count), len(values)) if complete else valid.sum(axis=0)
+        if not n.any():
+            return
+
+        magnitude = np.abs(values)
+        small = magnitude < self.min_value
+        keys = np.ceil(np.log(np.maximum(magnitude, self.min_value)) / self._log_gamma) - self._offset
+        keys = np.clip(np.nan_to_num(keys), 0, self._buckets - 1).astype(np.int64)
+        keys[small] = 0
+        row = np.where(small, 1, np.where(values > 0, 2, 0))
+        flat = (np.arange(len(self.count)) * 3 + row) * self._buckets + keys
+        if not complete:
+            flat = flat[valid]
+        self.counts += np.bincount(flat.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+
+        # Batch moments, combined with the running ones (Chan et al.)
+        if complete:
+            mean = values.mean(axis=0)
+            m2 = ((values - mean) ** 2).sum(axis=0)
+            low, high = values.min(axis=0), values.max(axis=0)
+        else:
+            filled = np.where(valid, values, 0.0)
+            mean = np.divide(filled.sum(axis=0), n, out=np.zeros(len(n)), where=n > 0)
+            m2 = (np.where(valid, values - mean, 0.0) ** 2).sum(axis=0)
+            low = np.where(valid, values, np.inf).min(axis=0)
+            high = np.where(valid, values, -np.inf).max(axis=0)
+        self._combine(n, mean, m2)
+        self._min = np.minimum(self._min, low)
+        self._max = np.maximum(self._max, high)
+
+    def _combine(self, n, mean, m2):
+        total = self.count + n
+        seen = total > 0
+        delta = mean - self._mean
+        weight = np.divide(n, total, out=np.zeros(len(n)), where=seen)
+        self._m2 = self._m2 + m2 + delta ** 2 * self.count * weight
+        self._mean = self._mean + delta * weight
+        self.count = total
+
+    def merge(self, other):
+        """Fold another sketch with the same settings into this one; returns self."""
+        if not self._compatible(other):
+            raise ValueError("Only sketches with the same shape, accuracy and value range can be merged")
+        self.counts += other.counts
+        self._combine(other.count, other._mean, other._m2)
+        self._min = np.minimum(self._min, other._min)
+        self._max = np.maximum(self._max, other._max)
+        return self
+
+    def quantile(self, q):
+        """Quantiles q in [0, 1]; returns shape (len(q),) + shape, NaN for empty cells."""
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        keys = np.arange(self._buckets) + self._offset
+        representative = 2 * self._gamma ** keys / (self._gamma + 1)
+        # Every cell's buckets in ascending value order: negatives (largest magnitude first), zero, positives
+        counts = np.concatenate([self.counts[:, 0, ::-1], self.counts[:, 1, :1], self.counts[:, 2]], axis=1)
+        values = np.concatenate([-representative[::-1], [0.0], representative])
+        cumulative = np.cumsum(counts, axis=1)
+        rank = q[:, np.newaxis] * (self.count - 1)
+        index = np.minimum((cumulative[np.newaxis, :, :] <= rank[:, :, np.newaxis]).sum(axis=2), len(values) - 1)
+        result = np.clip(values[index], self._min, self._max)
+        result = np.where(self.count > 0, result, np.nan)
+        return result.reshape((len(q),) + self.shape)
+
+    def percentile(self, p):
+        return self.quantile(np.asarray(p, dtype=float) / 100)
+
+    @property
+    def mean(self):
+        return np.where(self.count > 0, self._mean, np.nan).reshape(self.shape)
+
+    @property
+    def variance(self):
+        return np.where(self.count > 1, self._m2 / np.maximum(self.count - 1, 1), np.nan).reshape(self.shape)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def min(self):
+        return np.where(self.count > 0, self._min, np.nan).reshape(self.shape)
+
+    @property
+    def max(self):
+        return np.where(self.count > 0, self._max, np.nan).reshape(self.shape)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.counts, self.count, self._mean, self._m2, self._min, self._max))
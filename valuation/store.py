@@ -0,0 +1,202 @@
+import io
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .cache import _json_default, canonical_hash
+from .engine import evaluate, result_columns, year_result
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    hash TEXT PRIMARY KEY,
+    user_inputs TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    hash TEXT PRIMARY KEY REFERENCES scenarios(hash),
+    yearly_results TEXT NOT NULL,
+    arrays BLOB NOT NULL,
+    computed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    hash TEXT NOT NULL REFERENCES scenarios(hash),
+    scenario TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    stock_price REAL,
+    market_cap REAL,
+    PRIMARY KEY (hash, scenario, year)
+);
+CREATE INDEX IF NOT EXISTS prices_by_price ON prices (scenario, year, stock_price);
+CREATE TABLE IF NOT EXISTS names (
+    name TEXT PRIMARY KEY,
+    hash TEXT NOT NULL REFERENCES scenarios(hash),
+    saved_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS names_by_date ON names (saved_at);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    hash TEXT NOT NULL REFERENCES scenarios(hash),
+    PRIMARY KEY (tag, hash)
+);
+"""
+
+LABEL_KEYS = ('products', 'scenarios')
+
+
+def _pack(arrays):
+    """evaluate() arrays as .npz bytes; float values round-trip exactly."""
+    buffer = io.BytesIO()
+    np.savez(buffer, **{key: np.asarray(value, dtype=str) if key in LABEL_KEYS else value for key, value in arrays.items()})
+    return buffer.getvalue()
+
+
+def _unpack(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        return {key: tuple(data[key].tolist()) if key in LABEL_KEYS else data[key] for key in data.files}
+
+
+class ScenarioStore:
+    """A local SQLite library of scenarios, addressed by canonical_hash(user_inputs).
+
+    Identical inputs are stored once however many names or tags point at them. Each
+    computed scenario keeps its legacy yearly_results payload, its evaluate() arrays and an
+    index of stock price and market cap per year and P/E scenario, so rankings such as
+    top() are answered without recomputing anything.
+    """
+
+    def __init__(self, path='scenarios.db'):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.executescript(SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def put(self, user_inputs, arrays=None, name=None, tags=()):
+        """Store user_inputs (and its unbatched evaluate() arrays, if given); returns its hash."""
+        key = canonical_hash(user_inputs)
+        now = time.time()
+        with self._lock, self._connection as db:
+            db.execute('INSERT OR IGNORE INTO scenarios VALUES (?, ?, ?)', (key, json.dumps(user_inputs, default=_json_default), now))
+            if arrays is not None:
+                yearly_results = [year_result(user_inputs, result_columns(arrays), y) for y in range(len(arrays['years']))]
+                db.execute(
+                    'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                    (key, json.dumps({'yearly_results': yearly_results}), _pack(arrays), now),
+                )
+                db.executemany(
+                    'INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?)',
+                    [
+                        (key, scenario, int(year), float(arrays['stock_price'][y, s]), float(arrays['market_cap'][y, s]))
+                        for y, year in enumerate(arrays['years'])
+                        for s, scenario in enumerate(arrays['scenarios'])
+                    ],
+                )
+            if name is not None:
+                db.execute('INSERT OR REPLACE INTO names VALUES (?, ?, ?)', (name, key, now))
+            db.executemany('INSERT OR IGNORE INTO tags VALUES (?, ?)', [(tag, key) for tag in tags])
+        return key
+
+    def _key(self, scenario):
+        return scenario if isinstance(scenario, str) else canonical_hash(scenario)
+
+    def has_result(self, scenario):
+        with self._lock:
+            return self._connection.execute('SELECT 1 FROM results WHERE hash = ?', (self._key(scenario),)).fetchone() is not None
+
+    def yearly_results(self, scenario):
+        """The stored {'yearly_results': [...]} for user_inputs or a hash, or None."""
+        with self._lock:
+            row = self._connection.execute('SELECT yearly_results FROM results WHERE hash = ?', (self._key(scenario),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def arrays(self, scenario):
+        """The stored evaluate() arrays for user_inputs or a hash, or None."""
+        with self._lock:
+            row = self._connection.execute('SELECT arrays FROM results WHERE hash = ?', (self._key(scenario),)).fetchone()
+        return _unpack(row[0]) if row else None
+
+    def get_or_compute(self, user_inputs):
+        """The yearly_results for user_inputs, evaluating and storing them only if they are not stored yet."""
+        stored = self.yearly_results(user_inputs)
+        if stored is None:
+            self.put(user_inputs, evaluate(user_inputs))
+            stored = self.yearly_results(user_inputs)
+        return stored
+
+    def load(self, name):
+        """The user_inputs saved under name; KeyError if there is none."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT s.user_inputs FROM names n JOIN scenarios s ON s.hash = n.hash WHERE n.name = ?', (name,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(f"No saved scenario named '{name}'")
+        return json.loads(row[0])
+
+    def delete(self, name):
+        """Forget a name; the scenario and its results stay available by hash."""
+        with self._lock, self._connection as db:
+            db.execute('DELETE FROM names WHERE name = ?', (name,))
+
+    def tag(self, scenario, *tags):
+        key = self._key(scenario)
+        with self._lock, self._connection as db:
+            db.executemany('INSERT OR IGNORE INTO tags VALUES (?, ?)', [(tag, key) for tag in tags])
+
+    def saved(self, tag=None, since=None):
+        """Saved names, newest first, as dicts of name, hash, saved_at and tags."""
+        query = 'SELECT n.name, n.hash, n.saved_at, GROUP_CONCAT(t.tag) FROM names n LEFT JOIN tags t ON t.hash = n.hash'
+        where, params = [], []
+        if tag is not None:
+            where.append('n.hash IN (SELECT hash FROM tags WHERE tag = ?)')
+            params.append(tag)
+        if since is not None:
+            where.append('n.saved_at >= ?')
+            params.append(since)
+        if where:
+            query += ' WHERE ' + ' AND '.join(where)
+        query += ' GROUP BY n.name ORDER BY n.saved_at DESC'
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [{'name': name, 'hash': key, 'saved_at': saved_at, 'tags': sorted(tags.split(',')) if tags else []} for name, key, saved_at, tags in rows]
+
+    def top(self, scenario='Current', year=None, limit=50, tag=None, ascending=False):
+        """Stored scenarios ranked by their stock price in one year under one P/E scenario, from the index.
+
+        year defaults to the latest year stored. Rows hold hash, name (if saved),
+        year, stock_price and market_cap.
+        """
+        with self._lock:
+            if year is None:
+                row = self._connection.execute('SELECT MAX(year) FROM prices WHERE scenario = ?', (scenario,)).fetchone()
+                year = row[0]
+            query = (
+                'SELECT p.hash, (SELECT name FROM names n WHERE n.hash = p.hash ORDER BY saved_at DESC LIMIT 1), '
+                'p.year, p.stock_price, p.market_cap FROM prices p WHERE p.scenario = ? AND p.year = ?'
+            )
+            params = [scenario, year]
+            if tag is not None:
+                query += ' AND p.hash IN (SELECT hash FROM tags WHERE tag = ?)'
+                params.append(tag)
+            query += f" ORDER BY p.stock_price {'ASC' if ascending else 'DESC'} LIMIT ?"
+            params.append(limit)
+            rows = self._connection.execute(query, params).fetchall()
+        return [
+            {'hash': key, 'name': name, 'year': year, 'stock_price': price, 'market_cap': market_cap}
+            for key, name, year, price, market_cap in rows
+        ]
+
+    def stats(self):
+        with self._lock:
+            scenarios, results, names = (
+                self._connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                for table in ('scenarios', 'results', 'names')
+            )
+        return {'scenarios': scenarios, 'results': results, 'names': names}
@@ -0,0 +1,87 @@
+import itertools
+import time
+
+import numpy as np
+
+from .engine import evaluate, expand_inputs, flatten_inputs
+
+SURFACE_METRICS = ('stock_price', 'market_cap')
+
+
+def preview_paths(user_inputs):
+    """The inputs a preview surface spans by default: every growth rate and the net profit margin."""
+    return [path for path in flatten_inputs(user_inputs) if path.endswith('growth_rate') and not path.startswith('overrides.')] + ['net_profit_margin']
+
+
+def fixed_inputs(user_inputs, paths=None):
+    """user_inputs with the surface paths blanked out: what every scenario one surface previews shares."""
+    paths = paths if paths is not None else preview_paths(user_inputs)
+    return expand_inputs(user_inputs, dict.fromkeys(paths, 0.0))
+
+
+def timed_evaluate(user_inputs):
+    """(evaluate(user_inputs), seconds it took), for running the exact valuation on a worker."""
+    started = time.perf_counter()
+    arrays = evaluate(user_inputs)
+    return arrays, time.perf_counter() - started
+
+
+class ResponseSurface:
+    """Final-year stock price and market cap precomputed on a grid around one scenario.
+
+    The grid spans each path over +/-pct of its current value (at least +/-min_width),
+    with points values per axis, evaluated as one chunked engine batch. predict()
+    interpolates multilinearly between grid points, so a preview costs 2**len(paths)
+    lookups instead of a model run. Every other input is fixed at build time; covers()
+    says whether a scenario can be previewed.
+
+    A lookup costs about as much as evaluating one annual scenario, so a surface only
+    saves time when the exact valuation is slow, and a build costs points**len(paths)
+    model runs: build it off the thread that shows the preview.
+    """
+
+    def __init__(self, user_inputs, paths=None, pct=0.5, min_width=0.02, points=3, chunk_size=50_000):
+        self.paths = list(paths) if paths is not None else preview_paths(user_inputs)
+        flat = flatten_inputs(user_inputs)
+        self.anchor = {path: float(flat[path]) for path in self.paths}
+        self.axes = []
+        for path in self.paths:
+            width = max(abs(self.anchor[path]) * pct, min_width)
+            self.axes.append(np.linspace(self.anchor[path] - width, self.anchor[path] + width, points))
+        self.user_inputs = user_inputs
+        self.scenarios = list(user_inputs['pe_ratios'])
+        self.year = user_inputs['years'][-1]
+
+        shape = tuple(len(axis) for axis in self.axes)
+        size = int(np.prod(shape))
+        self.values = {metric: np.empty((size, len(self.scenarios))) for metric in SURFACE_METRICS}
+        for start in range(0, size, chunk_size):
+            index = np.unravel_index(np.arange(start, min(start + chunk_size, size)), shape)
+            arrays = evaluate(user_inputs, {path: axis[i] for path, axis, i in zip(self.paths, self.axes, index)})
+            for metric in SURFACE_METRICS:
+                self.values[metric][start:start + len(index[0])] = arrays[metric][:, -1, :]
+        self.values = {metric: values.reshape(shape + (len(self.scenarios),)) for metric, values in self.values.items()}
+        self.evaluations = size
+        self._fixed = fixed_inputs(user_inputs, self.paths)
+        self._corners = np.array(list(itertools.product((0, 1), repeat=len(self.paths))))
+
+    def covers(self, user_inputs):
+        """True if user_inputs differs from the build scenario only in the surface paths, within the grid."""
+        flat = flatten_inputs(user_inputs)
+        if any(path not in flat or not axis[0] <= flat[path] <= axis[-1] for path, axis in zip(self.paths, self.axes)):
+            return False
+        return fixed_inputs(user_inputs, self.paths) == self._fixed
+
+    def predict(self, user_inputs):
+        """Interpolated {metric: values per P/E scenario} for a scenario the surface covers."""
+        flat = flatten_inputs(user_inputs)
+        cells, weights = [], []
+        for path, axis in zip(self.paths, self.axes):
+            i = int(np.clip(np.searchsorted(axis, flat[path], side='right') - 1, 0, len(axis) - 2))
+            cells.append(i)
+            weights.append((flat[path] - axis[i]) / (axis[i + 1] - axis[i]))
+        # All 2**d cell corners at once: index offsets (corners, d) and their product weights
+        corners = self._corners
+        weight = np.prod(np.where(corners == 1, weights, 1 - np.asarray(weights)), axis=1)
+        index = tuple((np.asarray(cells) + corners).T)
+        return {metric: weight @ self.values[metric][index] for metric in SURFACE_METRICS}
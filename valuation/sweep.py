@@ -0,0 +1,60 @@
+import numpy as np
+
+from .engine import evaluate, flatten_inputs
+
+SWEEP_METRICS = ('stock_price', 'market_cap')
+
+
+def sweep_2d(user_inputs, x_path, x_values, y_path, y_values, metric='stock_price', year_index=-1, chunk_size=50_000):
+    """Evaluate metric in one year over the Cartesian grid of two inputs.
+
+    The grid is flattened and evaluated in chunks of chunk_size points, so peak memory
+    depends on chunk_size rather than on the grid size. Returns values with shape
+    (len(y_values), len(x_values), scenarios).
+    """
+    if metric not in SWEEP_METRICS:
+        raise ValueError(f"Unknown sweep metric '{metric}', expected one of {SWEEP_METRICS}")
+    if x_path == y_path:
+        raise ValueError("Sweep inputs must be two different assumptions")
+    flat = flatten_inputs(user_inputs)
+    unknown = sorted({x_path, y_path} - set(flat))
+    if unknown:
+        raise KeyError(f"Unknown input path(s): {', '.join(unknown)}")
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    scenarios = list(user_inputs['pe_ratios'])
+    size = x_values.size * y_values.size
+    values = np.empty((size, len(scenarios)))
+    for start in range(0, size, chunk_size):
+        index = np.arange(start, min(start + chunk_size, size))
+        params = {x_path: x_values[index % x_values.size], y_path: y_values[index // x_values.size]}
+        values[index] = evaluate(user_inputs, params)[metric][:, year_index, :]
+    return {
+        'x_path': x_path,
+        'x_values': x_values,
+        'y_path': y_path,
+        'y_values': y_values,
+        'metric': metric,
+        'year': user_inputs['years'][year_index],
+        'scenarios': scenarios,
+        'values': values.reshape(y_values.size, x_values.size, len(scenarios)),
+    }
+
+
+def merge_sweeps(parts):
+    """Join sweep_2d results over consecutive slices of the same y_values into one sweep."""
+    merged = dict(parts[0])
+    merged['y_values'] = np.concatenate([part['y_values'] for part in parts])
+    merged['values'] = np.concatenate([part['values'] for part in parts])
+    return merged
+
+
+def sweep_table(sweep):
+    """Flatten a sweep_2d result into tidy columns (one row per grid point and P/E scenario)."""
+    ny, nx, ns = sweep['values'].shape
+    return {
+        sweep['x_path']: np.tile(np.repeat(sweep['x_values'], ns), ny),
+        sweep['y_path']: np.repeat(sweep['y_values'], nx * ns),
+        'scenario': np.tile(np.asarray(sweep['scenarios'], dtype=object), nx * ny),
+        sweep['metric']: sweep['values'].reshape(-1),
+    }
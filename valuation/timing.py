@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StageTimer:
+    """Wall-clock durations of the named stages of one run; repeated stages accumulate."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._open = {}
+
+    def start(self, name):
+        self._open[name] = time.perf_counter()
+
+    def stop(self, name):
+        elapsed = time.perf_counter() - self._open.pop(name)
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+        return elapsed
+
+    @contextmanager
+    def stage(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def record(self, **extra):
+        """A JSON-serializable snapshot of the stage timings."""
+        return {
+            'timestamp': time.time(),
+            'total_seconds': self.total(),
+            'stages': dict(self.stages),
+            **extra,
+        }
+
+
+class TimingLog:
+    """Append timing records to a JSON-lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record)
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line + '\n')
+
+
+class StageMetrics:
+    """Per-stage duration histograms, rendered in the Prometheus text exposition format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='valuation_stage_seconds'):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def observe(self, stages):
+        with self._lock:
+            for name, seconds in stages.items():
+                counts, totals = self._stages.setdefault(name, ([0] * (len(self.buckets) + 1), [0.0]))
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        counts[i] += 1
+                counts[-1] += 1
+                totals[0] += seconds
+
+    def render(self):
+        lines = [
+            f"# HELP {self.prefix} Time spent in each stage of a valuation run.",
+            f"# TYPE {self.prefix} histogram",
+        ]
+        with self._lock:
+            for name, (counts, totals) in sorted(self._stages.items()):
+                for bound, count in zip(self.buckets, counts):
+                    lines.append(f'{self.prefix}_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'{self.prefix}_bucket{{stage="{name}",le="+Inf"}} {counts[-1]}')
+                lines.append(f'{self.prefix}_sum{{stage="{name}"}} {totals[0]}')
+                lines.append(f'{self.prefix}_count{{stage="{name}"}} {counts[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def serve_metrics(metrics, port, host='127.0.0.1'):
+    """Serve metrics.render() at http://host:port/metrics from a daemon thread; returns the server."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name='valuation-metrics').start()
+    return server
@@ -0,0 +1,203 @@
+"""Value a universe of companies with the segment-based method in one batch.
+
+Each company is a user_inputs dict (see defaults.default_user_inputs) with its own
+products, which are unit- or revenue-based segments by their fields (SEGMENT_FIELDS),
+an optional per-mile network segment (robotaxi_network, absent or None for companies
+without one, which evaluate() treats as zero), toggles, margin, share count and P/E scenarios. Companies may have
+different numbers of segments and scenarios: inputs are padded to
+companies x segments and companies x scenarios arrays, and every company, segment, year
+and scenario is evaluated together. Results match evaluate() company by company (see
+select_company). Overrides, the cohort fleet model and sub-annual periods are
+per-company features of evaluate() and are not supported here.
+"""
+import numpy as np
+
+from .engine import (
+    NETWORK_KEYS,
+    PRODUCT_KEYS,
+    SEGMENT_FIELDS,
+    _company_totals,
+    _compound,
+    _fleet_lines,
+    _network_earnings,
+    _power,
+    _segment_lines,
+    segment_kind,
+)
+
+SEGMENT_COLUMNS = ('growth_rate', 'sale_price', 'gross_margin', 'op_expense_ratio')
+
+
+def _check(name, user_inputs, years):
+    if list(user_inputs['years']) != list(years):
+        raise ValueError(f"Company {name!r}: every company in a universe must use the same years")
+    if int(user_inputs.get('periods_per_year', 1)) != 1:
+        raise ValueError(f"Company {name!r}: universes are annual, use evaluate() for sub-annual periods")
+    if user_inputs.get('fleet_cohorts') or any(user_inputs.get('override_flags', {}).values()) or any(
+        points.get('values') or points.get('growth_rates') for points in user_inputs.get('overrides', {}).values()
+    ):
+        raise ValueError(f"Company {name!r}: overrides and fleet cohorts are not supported in a universe, use evaluate()")
+
+
+def _pad(rows, width, fill=np.nan):
+    """A len(rows) x width float array from ragged rows, padded with fill."""
+    padded = np.full((len(rows), width), fill)
+    for i, row in enumerate(rows):
+        padded[i, :len(row)] = row
+    return padded
+
+
+def pack_universe(companies):
+    """The padded input arrays for a universe; companies is {name: user_inputs} or a list of user_inputs."""
+    if isinstance(companies, dict):
+        names, companies = tuple(companies), list(companies.values())
+    else:
+        companies = list(companies)
+        names = tuple(range(len(companies)))
+    if not companies:
+        raise ValueError("A universe needs at least one company")
+    years = list(companies[0]['years'])
+    segments, kinds, scenarios = [], [], []
+    columns = {field: [] for field in ('base', 'toggle') + SEGMENT_COLUMNS}
+    network = {field: [] for field in SEGMENT_FIELDS['network']}
+    company = {field: [] for field in ('net_profit_margin', 'base_shares_outstanding', 'shares_growth_rate', 'has_network', 'network_enabled')}
+    pe_ratios = []
+    for name, user_inputs in zip(names, companies):
+        _check(name, user_inputs, years)
+        products = user_inputs['products']
+        toggles = user_inputs['toggles']
+        segments.append(tuple(products))
+        kinds.append(tuple(segment_kind(data) for data in products.values()))
+        columns['base'].append([data['units_sold'] if kind == 'units' else data['revenue'] for kind, data in zip(kinds[-1], products.values())])
+        columns['toggle'].append([toggles[product] for product in products])
+        for field in SEGMENT_COLUMNS:
+            columns[field].append([data.get(field, np.nan) for data in products.values()])
+        robotaxi_network = user_inputs.get('robotaxi_network')
+        for field in SEGMENT_FIELDS['network']:
+            network[field].append(robotaxi_network[field] if robotaxi_network else 0.0)
+        for field in ('net_profit_margin', 'base_shares_outstanding', 'shares_growth_rate'):
+            company[field].append(user_inputs[field])
+        company['has_network'].append(bool(robotaxi_network))
+        company['network_enabled'].append(bool(robotaxi_network) and toggles.get('Robotaxi Network', False))
+        scenarios.append(tuple(user_inputs['pe_ratios']))
+        pe_ratios.append(list(user_inputs['pe_ratios'].values()))
+
+    width = max(len(row) for row in segments)
+    packed = {field: _pad(rows, width) for field, rows in columns.items()}
+    packed['toggle'] = packed['toggle'] == 1
+    packed['units'] = _pad([[kind == 'units' for kind in row] for row in kinds], width, 0) == 1
+    packed['mask'] = _pad([[1] * len(row) for row in segments], width, 0) == 1
+    packed.update({f'network.{field}': np.array(values, dtype=float) for field, values in network.items()})
+    packed.update({field: np.array(values, dtype=bool if field in ('has_network', 'network_enabled') else float) for field, values in company.items()})
+    packed['pe_ratios'] = _pad(pe_ratios, max(len(row) for row in scenarios))
+    return {'companies': names, 'years': np.asarray(years), 'segments': tuple(segments), 'kinds': tuple(kinds), 'scenarios': tuple(scenarios), **packed}
+
+
+def evaluate_packed(packed):
+    """Evaluate pack_universe() arrays: per-segment outputs are companies x segments x years,
+    per-company ones companies x years and per-scenario ones companies x years x scenarios,
+    with NaN in the padding."""
+    years = packed['years']
+    t = (years - years[0]).astype(float)
+    mask = packed['mask'][..., np.newaxis]
+    units = packed['units'][..., np.newaxis]
+
+    def segment(field):
+        return packed[field][..., np.newaxis]
+
+    def value(path):
+        """The engine's reader over the packed per-company columns (companies + (1,))."""
+        section, _, field = path.partition('.')
+        return packed[f'network.{field}' if section == 'robotaxi_network' else path][:, np.newaxis]
+
+    # Segment lines, with the engine's helpers so results agree bit for bit
+    level = segment('base') * _power(1 + segment('growth_rate'), t)
+    revenue = np.where(units, level * segment('sale_price'), level * 1e6)
+    lines = _segment_lines(np.where(units & mask, level, np.nan), revenue, packed['toggle'][..., np.newaxis], segment('op_expense_ratio'), segment('gross_margin'))
+
+    # Network segment of each company; zero for companies without one, as in the engine
+    enabled = packed['network_enabled'][:, np.newaxis]
+    network_vehicles = _compound({}, value, None, 'robotaxi_network.network_vehicles', 'robotaxi_network.vehicle_growth_rate', years, 0)
+    network = _network_earnings(value, enabled, **_fleet_lines(value, network_vehicles, t, enabled))
+    network = {key: np.where(packed['has_network'][:, np.newaxis], line, 0.0) for key, line in network.items()}
+
+    # Company totals: padded segments add nothing
+    shares_outstanding = value('base_shares_outstanding') * _power(1 + value('shares_growth_rate'), t)
+    totals = _company_totals(
+        value('net_profit_margin'),
+        [np.where(mask[:, s], lines['net_revenue'][:, s], 0.0) for s in range(mask.shape[1])],
+        network['tesla_earnings'],
+        shares_outstanding,
+        packed['pe_ratios'],
+    )
+    return {
+        'companies': packed['companies'],
+        'years': years,
+        'segments': packed['segments'],
+        'kinds': packed['kinds'],
+        'scenarios': packed['scenarios'],
+        'segment_mask': packed['mask'],
+        **{key: np.where(mask, line, np.nan) for key, line in lines.items()},
+        **network,
+        'total_revenue': totals['total_revenue'],
+        'net_income': totals['net_income'],
+        'shares_outstanding': shares_outstanding,
+        'pe_ratios': packed['pe_ratios'],
+        'market_cap': totals['market_cap'],
+        'stock_price': totals['stock_price'],
+    }
+
+
+def evaluate_universe(companies):
+    """Value every company of a universe ({name: user_inputs} or a list) in one batch; see evaluate_packed."""
+    return evaluate_packed(pack_universe(companies))
+
+
+def select_company(universe, index):
+    """One company's results out of evaluate_universe() output, unpadded and shaped like evaluate()."""
+    n_segments = len(universe['segments'][index])
+    n_scenarios = len(universe['scenarios'][index])
+    arrays = {
+        'years': universe['years'],
+        'products': universe['segments'][index],
+        'scenarios': universe['scenarios'][index],
+        **{key: universe[key][index, :n_segments] for key in PRODUCT_KEYS},
+        **{key: universe[key][index] for key in NETWORK_KEYS + ('total_revenue', 'net_income', 'shares_outstanding')},
+        'pe_ratios': universe['pe_ratios'][index, :n_scenarios],
+    }
+    for key in ('market_cap', 'stock_price'):
+        arrays[key] = universe[key][index, :, :n_scenarios]
+    return arrays
+
+
+def ranking(universe, year=None, scenario=0):
+    """Company indexes sorted by stock price (highest first) in year (default: the last) under
+    each company's scenario-th P/E scenario; companies without that scenario come last."""
+    y = -1 if year is None else list(universe['years']).index(year)
+    prices = universe['stock_price'][:, y, scenario]
+    return np.argsort(-np.nan_to_num(prices, nan=-np.inf), kind='stable')
+
+
+def synthetic_universe(n, seed=0, years=None):
+    """n random companies of two to six segments each, around the default assumptions, for demos and benchmarks."""
+    from .defaults import DEFAULT_PRODUCTS, default_user_inputs
+
+    rng = np.random.default_rng(seed)
+    templates = list(DEFAULT_PRODUCTS.values())
+    companies = {}
+    for i in range(n):
+        user_inputs = default_user_inputs(years)
+        count = int(rng.integers(2, 7))
+        user_inputs['products'] = {
+            f'Segment {s + 1}': {field: float(value * rng.uniform(0.5, 1.5)) for field, value in templates[int(rng.integers(len(templates)))].items()}
+            for s in range(count)
+        }
+        user_inputs['toggles'] = {**{product: bool(rng.random() < 0.3) for product in user_inputs['products']}, 'Robotaxi Network': True}
+        user_inputs['override_flags'] = {}
+        if rng.random() < 0.5:
+            user_inputs['robotaxi_network'] = None
+        user_inputs['net_profit_margin'] = float(rng.uniform(0.05, 0.25))
+        user_inputs['base_shares_outstanding'] = float(rng.uniform(100, 5000))
+        user_inputs['pe_ratios'] = dict(list(user_inputs['pe_ratios'].items())[:int(rng.integers(2, 5))])
+        companies[f'Company {i + 1:04d}'] = user_inputs
+    return companies